@@ -1,3 +1,6 @@
+import os
+import threading
+import time
 import uuid
 
 from django import forms
@@ -13,10 +16,59 @@ from django.utils.module_loading import import_string
 from django.utils.translation import gettext_lazy as _
 
 
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7():
+    """
+    Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits hold the Unix time in milliseconds, followed by a 42
+    bit counter, randomly seeded every millisecond and incremented for
+    every UUID generated within it, and 32 random bits. UUIDs generated by
+    a process are thus strictly increasing.
+    """
+    with _uuid7_lock:
+        global _uuid7_last
+        timestamp_ms = time.time_ns() // 1_000_000
+        last_timestamp_ms, counter = _uuid7_last
+        if timestamp_ms > last_timestamp_ms:
+            # Leave the most significant bit of the counter clear, so that
+            # it can not overflow within a millisecond
+            counter = int.from_bytes(os.urandom(6)) >> 7
+        else:
+            timestamp_ms = last_timestamp_ms
+            counter += 1
+            if counter >> 42:
+                timestamp_ms += 1
+                counter = 0
+        _uuid7_last = (timestamp_ms, counter)
+
+    value = (
+        (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (counter >> 30) << 64
+        | 0b10 << 62
+        | (counter & 0x3FFF_FFFF) << 32
+        | int.from_bytes(os.urandom(4))
+    )
+    return uuid.UUID(int=value)
+
+
 class UUIDAutoField(UUIDField):
-    def __init__(self, *args, **kwargs):
+    """
+    UUID primary key, generated on the application side.
+
+    Keys are random (version 4) by default. Models with a high insert rate
+    should pass ``time_ordered=True`` to generate version 7 UUIDs, which are
+    appended to the right of the primary key index instead of landing at a
+    random position in it.
+    """
+
+    def __init__(self, *args, time_ordered=False, **kwargs):
         kwargs.setdefault("primary_key", True)
-        kwargs.setdefault("default", uuid.uuid4)
+        kwargs.setdefault("default", uuid7 if time_ordered else uuid.uuid4)
         kwargs.setdefault("editable", False)
         super().__init__(*args, **kwargs)
 
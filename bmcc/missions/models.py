@@ -81,9 +81,9 @@ class LaunchSite(models.Model):
         )
         predictions = kml.Folder(kml.name("Predictions"))
         folder.append(predictions)
-        for prediction in self.prediction_history.filter(
-            prediction__isnull=False
-        ):
-            predictions.append(prediction.__kml__())
+        # Filtered in Python so that a prefetched history is reused
+        for prediction in self.prediction_history.all():
+            if prediction.trajectory_kml:
+                predictions.append(prediction.__kml__())
 
         return folder
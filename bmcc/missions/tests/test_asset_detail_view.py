@@ -0,0 +1,83 @@
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.models import Asset, Beacon, Ping
+
+
+SERIES = [
+    "altitude_series",
+    "speed_series",
+    "horizontal_speed_series",
+    "downrange_series",
+]
+
+
+@pytest.fixture()
+def asset():
+    now = timezone.now()
+    mission = Mission.objects.create(name="Asset Detail Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon A",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacon = Beacon.objects.create(
+        asset=asset,
+        identifier="detail-a",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+    for i in range(3):
+        Ping.objects.create(
+            mission=mission,
+            asset=asset,
+            beacon=beacon,
+            reported_at=now - timezone.timedelta(minutes=3 - i),
+            position=Coordinate(7.0 + i / 100, 46.0),
+            altitude=1000 + 100 * i,
+        )
+    return asset
+
+
+def asset_url(asset):
+    return reverse("missions:asset_detail", args=[asset.mission_id, asset.pk])
+
+
+@pytest.mark.django_db()
+def test_full_page_computes_every_section(client, asset):
+    response = client.get(asset_url(asset))
+
+    assert response.status_code == 200
+    for name in [*SERIES, "pings", "path_points"]:
+        assert name in response.context
+    assert len(response.context["path_points"]) == 3
+
+
+@pytest.mark.django_db()
+def test_partial_computes_only_its_section(client, asset):
+    response = client.get(
+        asset_url(asset),
+        headers={"HX-Request": "true", "HX-Section": "speed"},
+    )
+
+    assert response.status_code == 200
+    assert [t.name for t in response.templates][0] == (
+        "tracking/partials/asset_speed_chart.html"
+    )
+    assert len(response.context["speed_series"]["detail-a"]) == 2
+    for name in [*SERIES, "pings", "path_points"]:
+        if name != "speed_series":
+            assert name not in response.context
+
+
+@pytest.mark.django_db()
+def test_partial_defaults_to_pings_table(client, asset):
+    response = client.get(asset_url(asset), headers={"HX-Request": "true"})
+
+    assert len(response.context["pings"]) == 3
+    for name in SERIES:
+        assert name not in response.context
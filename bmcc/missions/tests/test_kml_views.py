@@ -1,19 +1,37 @@
+import io
+import re
+import uuid
 import xml.etree.ElementTree as ET
+import zipfile
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 import pytest
+from asgiref.sync import async_to_sync
 
 from bmcc.fields import Coordinate
 from bmcc.missions.models import LaunchSite, Mission
+from bmcc.predictions.backends.tawhiri import TawhiriBackend
+from bmcc.predictions.models import Prediction
 from bmcc.tracking import constants
 from bmcc.tracking.models import Asset, Beacon, Ping
+from bmcc.utils.kml import TRACK_SEGMENT_SIZE
 
 
 NS = {"kml": "http://www.opengis.net/kml/2.2"}
 
 
+# Link to the live updates of a full document, with a cursor of its own
+LIVE_UPDATES = re.compile(rb"<NetworkLink>.*?</NetworkLink>", re.DOTALL)
+
+
+def without_live_updates(content):
+    return LIVE_UPDATES.sub(b"", content)
+
+
 def find_folder(parent, name):
     for folder in parent.findall("kml:Folder", NS):
         folder_name = folder.find("kml:name", NS)
@@ -49,7 +67,9 @@ def test_kml_entrypoint_links_to_update(client):
     assert "NetworkLink" in content
     assert f"http://testserver{update_url}" in content
     assert "<refreshMode>onInterval</refreshMode>" in content
-    assert "<refreshInterval>10</refreshInterval>" in content
+    assert "<refreshInterval>600</refreshInterval>" in content
+    # Live updates are linked from the full document, with its cursor
+    assert "incremental" not in content
 
 
 @pytest.mark.django_db()
@@ -107,7 +127,7 @@ def test_kml_update_builds_folder_hierarchy_with_tracks_and_positions(client):
     )
 
     assert response.status_code == 200
-    root = ET.fromstring(response.content)
+    root = ET.fromstring(b"".join(response.streaming_content))
     document = root.find("kml:Document", NS)
     assert document is not None
 
@@ -152,3 +172,388 @@ def test_kml_update_builds_folder_hierarchy_with_tracks_and_positions(client):
         first_placemark(field_alpha), "Point"
     )
     assert all(len(c) == 2 for c in launch_point_coords)
+
+
+def kml_update_query_count(client, mission):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(
+            reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+        )
+        b"".join(response.streaming_content)
+    return len(queries)
+
+
+def add_tracked_asset(mission, index):
+    now = timezone.now()
+    asset = Asset.objects.create(
+        mission=mission,
+        name=f"Balloon {index}",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    LaunchSite.objects.create(
+        mission=mission,
+        name=f"Field {index}",
+        location=Coordinate(30.0, 40.0),
+    )
+    for beacon_index in range(2):
+        beacon = Beacon.objects.create(
+            asset=asset,
+            identifier=f"bal-{index}-{beacon_index}",
+            backend_class_path=constants.BeaconBackendClass.BMCC_API,
+        )
+        for minutes in range(3):
+            Ping.objects.create(
+                beacon=beacon,
+                reported_at=now - timezone.timedelta(minutes=minutes),
+                position=Coordinate(1.0, 2.0),
+                altitude=100,
+            )
+
+
+@pytest.mark.django_db()
+def test_kml_update_query_count_does_not_depend_on_mission_size(
+    client, django_capture_on_commit_callbacks
+):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    baseline = kml_update_query_count(client, mission)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for index in range(1, 5):
+            add_tracked_asset(mission, index)
+
+    assert kml_update_query_count(client, mission) == baseline
+
+
+@pytest.mark.django_db()
+def test_kml_update_answers_unchanged_missions_with_not_modified(
+    client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    url = reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+
+    response = client.get(url)
+    etag = response["ETag"]
+    assert response.status_code == 200
+    # Validated by the version alone: a Last-Modified header has a one
+    # second resolution, and would hide changes made within that second.
+    assert not response.has_header("Last-Modified")
+
+    with django_assert_num_queries(0):
+        response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Versions are bumped once the change is committed
+    with django_capture_on_commit_callbacks(execute=True):
+        Ping.objects.create(
+            beacon=Beacon.objects.get(identifier="bal-0-0"),
+            reported_at=timezone.now(),
+            position=Coordinate(1.5, 2.5),
+            altitude=200,
+        )
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def live_updates_url(client, mission):
+    """
+    URL of the live updates link of the full document, with its cursor.
+    """
+    response = client.get(
+        reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+    )
+    root = ET.fromstring(b"".join(response.streaming_content))
+    (link,) = root.findall("kml:Document/kml:NetworkLink/kml:Link", NS)
+    assert link.find("kml:refreshInterval", NS).text == "10"
+    return link.find("kml:href", NS).text
+
+
+@pytest.mark.django_db()
+def test_kml_incremental_appends_pings_after_cursor(client):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    beacon = Beacon.objects.get(identifier="bal-0-0")
+    url = live_updates_url(client, mission)
+
+    # Starts from the pings of the full document
+    root = ET.fromstring(client.get(url).content)
+    control = root.find("kml:NetworkLinkControl", NS)
+    cookie = control.find("kml:cookie", NS).text
+    assert control.find("kml:Update/kml:Create", NS) is None
+
+    Ping.objects.create(
+        beacon=beacon,
+        reported_at=timezone.now() + timezone.timedelta(minutes=1),
+        position=Coordinate(5.0, 6.0),
+        altitude=300,
+    )
+    # Google Earth appends the cookie to the link
+    root = ET.fromstring(client.get(f"{url}&{cookie}").content)
+    control = root.find("kml:NetworkLinkControl", NS)
+    assert control.find("kml:cookie", NS).text != cookie
+    update = control.find("kml:Update", NS)
+    assert update.find("kml:targetHref", NS).text.endswith(
+        reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+    )
+
+    (folder,) = update.findall("kml:Create/kml:Folder", NS)
+    assert folder.get("targetId") == beacon.kml_id
+    segment = placemark_coordinates(first_placemark(folder), "LineString")
+    # Continues from the last ping already sent
+    assert segment == [
+        ("1.000000", "2.000000", "100"),
+        ("5.000000", "6.000000", "300"),
+    ]
+
+    point = update.find("kml:Change/kml:Point", NS)
+    assert point.get("targetId") == f"{beacon.kml_id}-position"
+    assert point.find("kml:coordinates", NS).text == "5.000000,6.000000,300"
+
+
+@pytest.mark.django_db()
+def test_kml_incremental_sends_pings_stored_late(client):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    beacon = Beacon.objects.get(identifier="bal-0-0")
+    url = live_updates_url(client, mission)
+    root = ET.fromstring(client.get(url).content)
+    cookie = root.find("kml:NetworkLinkControl/kml:cookie", NS).text
+
+    # Stored after the cursor, but reported before the latest ping sent
+    Ping.objects.create(
+        beacon=beacon,
+        reported_at=timezone.now() - timezone.timedelta(minutes=10),
+        position=Coordinate(5.0, 6.0),
+        altitude=300,
+    )
+    root = ET.fromstring(client.get(f"{url}&{cookie}").content)
+    control = root.find("kml:NetworkLinkControl", NS)
+    (folder,) = control.findall("kml:Update/kml:Create/kml:Folder", NS)
+    assert folder.get("targetId") == beacon.kml_id
+    segment = placemark_coordinates(first_placemark(folder), "LineString")
+    assert segment == [("5.000000", "6.000000", "300")]
+    # The position stays on the latest ping
+    assert control.find("kml:Update/kml:Change", NS) is None
+
+    next_cookie = control.find("kml:cookie", NS).text
+    root = ET.fromstring(client.get(f"{url}&{next_cookie}").content)
+    control = root.find("kml:NetworkLinkControl", NS)
+    assert control.find("kml:Update/kml:Create", NS) is None
+
+
+@pytest.mark.django_db()
+def test_kml_incremental_sends_pings_ingested_after_the_full_document(
+    client,
+):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    beacon = Beacon.objects.get(identifier="bal-0-0")
+    url = live_updates_url(client, mission)
+
+    # Ingested before the first update
+    Ping.objects.create(
+        beacon=beacon,
+        reported_at=timezone.now() + timezone.timedelta(minutes=1),
+        position=Coordinate(5.0, 6.0),
+        altitude=300,
+    )
+    root = ET.fromstring(client.get(url).content)
+    (folder,) = root.findall(
+        "kml:NetworkLinkControl/kml:Update/kml:Create/kml:Folder", NS
+    )
+    assert folder.get("targetId") == beacon.kml_id
+
+    # Links saved without a cursor leave the updates to the full document
+    incremental = reverse(
+        "missions:incremental_kml", kwargs={"mission_id": mission.pk}
+    )
+    root = ET.fromstring(client.get(incremental).content)
+    control = root.find("kml:NetworkLinkControl", NS)
+    assert control.find("kml:cookie", NS) is None
+    assert control.find("kml:Update", NS) is None
+
+
+@pytest.mark.django_db()
+def test_kml_incremental_follows_pings_with_legacy_ids(client):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    beacon = Beacon.objects.get(identifier="bal-0-0")
+    url = live_updates_url(client, mission)
+
+    def created_folders(cookie):
+        root = ET.fromstring(client.get(f"{url}&{cookie}").content)
+        control = root.find("kml:NetworkLinkControl", NS)
+        folders = control.findall("kml:Update/kml:Create/kml:Folder", NS)
+        return folders, control.find("kml:cookie", NS).text
+
+    _, cookie = created_folders("")
+    # Random (version 4) id, sorting after the time ordered ones
+    Ping.objects.create(
+        id=uuid.UUID("ffffffff-ffff-4fff-bfff-ffffffffffff"),
+        beacon=beacon,
+        reported_at=timezone.now() + timezone.timedelta(minutes=1),
+        position=Coordinate(5.0, 6.0),
+        altitude=300,
+    )
+    folders, cookie = created_folders(cookie)
+    assert len(folders) == 1
+    folders, cookie = created_folders(cookie)
+    assert folders == []
+
+    Ping.objects.create(
+        beacon=beacon,
+        reported_at=timezone.now() + timezone.timedelta(minutes=2),
+        position=Coordinate(7.0, 8.0),
+        altitude=400,
+    )
+    folders, cookie = created_folders(cookie)
+    assert len(folders) == 1
+    segment = placemark_coordinates(first_placemark(folders[0]), "LineString")
+    assert segment[-1] == ("7.000000", "8.000000", "400")
+
+
+@pytest.mark.django_db()
+def test_kml_update_is_available_as_kmz(client):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    kwargs = {"mission_id": mission.pk}
+
+    kml = client.get(reverse("missions:updating_kml", kwargs=kwargs))
+    kmz = client.get(reverse("missions:updating_kmz", kwargs=kwargs))
+
+    assert kmz["Content-Type"] == "application/vnd.google-earth.kmz"
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(kmz.streaming_content)))
+    assert without_live_updates(archive.read("doc.kml")) == (
+        without_live_updates(b"".join(kml.streaming_content))
+    )
+
+    entrypoint = client.get(reverse("missions:kmz_entrypoint", kwargs=kwargs))
+    content = zipfile.ZipFile(io.BytesIO(entrypoint.content)).read("doc.kml")
+    assert reverse("missions:updating_kmz", kwargs=kwargs) in content.decode()
+
+
+@pytest.mark.django_db()
+def test_kml_update_streams_asynchronously_under_asgi(client, async_client):
+    mission = Mission.objects.create(name="Mission KML")
+    add_tracked_asset(mission, 0)
+    kwargs = {"mission_id": mission.pk}
+
+    async def fetch(name):
+        response = await async_client.get(reverse(name, kwargs=kwargs))
+        assert response.is_async
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    kml = without_live_updates(
+        b"".join(
+            client.get(
+                reverse("missions:updating_kml", kwargs=kwargs)
+            ).streaming_content
+        )
+    )
+    content = async_to_sync(fetch)("missions:updating_kml")
+    assert without_live_updates(content) == kml
+    kmz = async_to_sync(fetch)("missions:updating_kmz")
+    content = zipfile.ZipFile(io.BytesIO(kmz)).read("doc.kml")
+    assert without_live_updates(content) == kml
+
+
+@pytest.mark.django_db()
+def test_kml_update_splits_long_tracks_into_regions(client):
+    now = timezone.now()
+    mission = Mission.objects.create(name="Mission KML")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacon = Beacon.objects.create(
+        asset=asset,
+        identifier="bal-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+    count = 2 * TRACK_SEGMENT_SIZE + 1
+    Ping.objects.bulk_create(
+        Ping(
+            mission=mission,
+            asset=asset,
+            beacon=beacon,
+            reported_at=now - timezone.timedelta(seconds=count - i),
+            position=Coordinate(i / 1000, 46.0),
+            altitude=i,
+        )
+        for i in range(count)
+    )
+
+    response = client.get(
+        reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+    )
+
+    root = ET.fromstring(b"".join(response.streaming_content))
+    folder = root.find(".//kml:Folder[@id='{}']".format(beacon.kml_id), NS)
+    overview = placemark_coordinates(
+        folder.findall("kml:Placemark", NS)[1], "LineString"
+    )
+    assert len(overview) < count
+    segments = find_folder(folder, "Detail").findall("kml:Document", NS)
+    assert len(segments) == 3
+    for segment in segments:
+        box = segment.find("kml:Region/kml:LatLonAltBox", NS)
+        assert float(box.find("kml:west", NS).text) < float(
+            box.find("kml:east", NS).text
+        )
+    # Segments overlap by one point, so the detailed track is continuous
+    assert sum(
+        len(placemark_coordinates(first_placemark(s), "LineString"))
+        for s in segments
+    ) == count + len(segments) - 1
+
+
+@pytest.mark.django_db()
+def test_kml_update_renders_stored_prediction_trajectory(client):
+    now = timezone.now()
+    mission = Mission.objects.create(name="Mission KML")
+    site = LaunchSite.objects.create(
+        mission=mission, name="Field Alpha", location=Coordinate(7.0, 46.0)
+    )
+    prediction = Prediction.objects.create(
+        launch_at=now,
+        launch_location=site.location,
+        additional_parameters={"ascent_rate": 5, "descent_rate": 6},
+    )
+
+    def point(minutes, longitude, altitude):
+        at = now + timezone.timedelta(minutes=minutes)
+        return {
+            "datetime": at.isoformat(),
+            "latitude": 46.0,
+            "longitude": longitude,
+            "altitude": altitude,
+        }
+
+    TawhiriBackend()._apply_results(
+        prediction,
+        {
+            "prediction": [
+                {"trajectory": [point(0, 7.0, 500), point(90, 7.5, 30000)]},
+                {"trajectory": [point(91, 7.6, 29000), point(120, 8.0, 400)]},
+            ]
+        },
+    )
+    prediction.save()
+    site.prediction_history.add(prediction)
+    assert prediction.trajectory.coords[-1] == (8.0, 46.0, 400)
+
+    response = client.get(
+        reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+    )
+
+    root = ET.fromstring(b"".join(response.streaming_content))
+    trajectory = root.find(".//kml:Placemark[kml:name='Trajectory']", NS)
+    assert placemark_coordinates(trajectory, "LineString") == [
+        ("7.0", "46.0", "500"),
+        ("7.5", "46.0", "30000"),
+        ("7.6", "46.0", "29000"),
+        ("8.0", "46.0", "400"),
+    ]
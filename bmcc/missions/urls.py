@@ -66,4 +66,27 @@ urlpatterns = [
     path(
         "<uuid:mission_id>-update.kml", views.kml_update, name="updating_kml"
     ),
+    path(
+        "<uuid:mission_id>-changes.kml",
+        views.kml_incremental,
+        name="incremental_kml",
+    ),
+    path(
+        "<uuid:mission_id>.kmz",
+        views.kml_entrypoint,
+        {"kmz": True},
+        name="kmz_entrypoint",
+    ),
+    path(
+        "<uuid:mission_id>-update.kmz",
+        views.kml_update,
+        {"kmz": True},
+        name="updating_kmz",
+    ),
+    path(
+        "<uuid:mission_id>-changes.kmz",
+        views.kml_incremental,
+        {"kmz": True},
+        name="incremental_kmz",
+    ),
 ]
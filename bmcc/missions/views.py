@@ -1,16 +1,33 @@
+import math
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
-from django.db.models import OuterRef, Prefetch, Subquery
-from django.http import HttpResponse, HttpResponseRedirect
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Prefetch
+from django.http import (
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 from django.views.generic import DetailView, FormView, ListView
 
+from lxml import etree
+
 from bmcc.predictions.models import Prediction
+from bmcc.utils.cache import single_flight
 
 from ..tracking import constants as tracking_constants
+from ..tracking.archive import archived_pings, load_beacons
+from ..tracking.buffer import buffered_pings, latest_pings
+from ..tracking.fragments import beacon_fragments, refresh_fragments
 from ..tracking.models import Asset, Beacon, Ping
+from ..tracking.tracks import PingCursor, mission_track_updates
+from ..tracking.versions import mission_version
 from . import models
 from .forms import (
     LaunchSiteForm,
@@ -20,6 +37,14 @@ from .forms import (
 from .models import LaunchSite
 
 
+# Refresh intervals (in seconds) of the Google Earth network links
+KML_UPDATE_INTERVAL = 10
+KML_RESYNC_INTERVAL = 600
+
+# Lifetime of renderings shared by the clients polling a mission version
+ASSET_LIST_TIMEOUT = 60
+KML_FRAGMENTS_TIMEOUT = 60
+
 ICON_BY_ASSET_TYPE = {
     tracking_constants.AssetType.BALLOON: (
         "http://maps.google.com/mapfiles/kml/paddle/purple-blank.png"
@@ -45,21 +70,34 @@ class MissionDetailView(DetailView):
                     "beacons",
                     queryset=Beacon.objects.order_by(
                         "identifier"
-                    ).prefetch_related(
-                        Prefetch(
-                            "pings",
-                            queryset=Ping.objects.filter(
-                                mission=self.object
-                            ).order_by("-reported_at", "-created_at")[:1],
-                            to_attr="latest_ping",
-                        )
-                    ),
+                    ).select_related("latest_ping__ping"),
                 )
             )
         )
 
     def get_context_data(self, **kwargs):
         assets = self.get_assets()
+        extra = latest_pings(
+            archived_pings(self.object.pk)
+            + buffered_pings(mission_id=self.object.pk),
+            "beacon_id",
+        )
+        for asset in assets:
+            for beacon in asset.beacons.all():
+                latest = getattr(beacon, "latest_ping", None)
+                # Beacons reused on a later mission only show the pings
+                # reported for this one.
+                ping = (
+                    latest.ping
+                    if latest and latest.ping.mission_id == self.object.pk
+                    else None
+                )
+                other = extra.get(beacon.pk)
+                if other and (
+                    not ping or other.reported_at > ping.reported_at
+                ):
+                    ping = other
+                beacon.last_mission_ping = ping
         kwargs.update(
             {
                 "assets": assets,
@@ -76,29 +114,51 @@ class MissionAssetListView(ListView):
 
     def get_queryset(self):
         self.mission = models.Mission.objects.get(pk=self.kwargs["mission_id"])
-        latest_ping = Ping.objects.filter(asset=OuterRef("pk")).order_by(
-            "-reported_at", "-created_at"
+        # Polled by every open mission page, the rows are only computed once
+        # per mission version and shared by all of them.
+        return single_flight(
+            f"missions:asset-list:{self.mission.pk}:"
+            f"{mission_version(self.mission.pk)}",
+            self.get_assets,
+            timeout=ASSET_LIST_TIMEOUT,
         )
-        return (
+
+    def get_assets(self):
+        assets = list(
             Asset.objects.filter(mission=self.mission)
             .select_related("mission")
             .annotate(
-                last_ping_reported_at=Subquery(
-                    latest_ping.values("reported_at")[:1]
-                ),
-                last_ping_position=Subquery(
-                    latest_ping.values("position")[:1]
-                ),
-                last_ping_altitude=Subquery(
-                    latest_ping.values("altitude")[:1]
-                ),
-                last_ping_beacon=Subquery(
-                    latest_ping.values("beacon__identifier")[:1]
-                ),
-                last_ping_id=Subquery(latest_ping.values("id")[:1]),
+                last_ping_reported_at=F("latest_ping__reported_at"),
+                last_ping_position=F("latest_ping__ping__position"),
+                last_ping_altitude=F("latest_ping__ping__altitude"),
+                last_ping_beacon=F("latest_ping__ping__beacon__identifier"),
+                last_ping_id=F("latest_ping__ping_id"),
             )
             .order_by("name")
         )
+        extra = latest_pings(
+            archived_pings(self.mission.pk)
+            + buffered_pings(mission_id=self.mission.pk),
+            "asset_id",
+        )
+        if extra:
+            identifiers = dict(
+                Beacon.objects.filter(
+                    pk__in={p.beacon_id for p in extra.values()}
+                ).values_list("pk", "identifier")
+            )
+            for asset in assets:
+                ping = extra.get(asset.pk)
+                if ping and (
+                    not asset.last_ping_reported_at
+                    or ping.reported_at > asset.last_ping_reported_at
+                ):
+                    asset.last_ping_reported_at = ping.reported_at
+                    asset.last_ping_position = ping.position
+                    asset.last_ping_altitude = ping.altitude
+                    asset.last_ping_beacon = identifiers.get(ping.beacon_id)
+                    asset.last_ping_id = ping.pk
+        return assets
 
     def get_context_data(self, **kwargs):
         context = {
@@ -135,22 +195,78 @@ class MissionAssetListView(ListView):
         return super().render_to_response(context, **response_kwargs)
 
 
+def haversine_meters(p1, p2):
+    lat1, lon1 = math.radians(p1.y), math.radians(p1.x)
+    lat2, lon2 = math.radians(p2.y), math.radians(p2.x)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return 6371000 * c
+
+
 class AssetDetailView(DetailView):
     model = Asset
     template_name = "tracking/asset_detail.html"
     context_object_name = "asset"
     pk_url_kwarg = "asset_id"
 
+    # Template and context of each htmx partial, the full page needs all of
+    # them and the path points.
+    sections = {
+        "altitude": (
+            "tracking/partials/asset_altitude_chart.html",
+            ["altitude_series"],
+        ),
+        "speed": (
+            "tracking/partials/asset_speed_chart.html",
+            ["speed_series"],
+        ),
+        "horizontal_speed": (
+            "tracking/partials/asset_horizontal_speed_chart.html",
+            ["horizontal_speed_series"],
+        ),
+        "downrange": (
+            "tracking/partials/asset_downrange_chart.html",
+            ["downrange_series"],
+        ),
+        "pings": (
+            "tracking/partials/asset_pings_table.html",
+            ["pings"],
+        ),
+    }
+
     def get_queryset(self):
         return (
             Asset.objects.select_related("mission", "launch_site")
-            .prefetch_related("beacons", "beacons__pings")
+            .prefetch_related("beacons")
             .filter(mission__pk=self.kwargs["mission_id"])
         )
 
-    def get_context_data(self, **kwargs):
+    def get_section(self):
+        """
+        Section requested by htmx, or ``None`` for the full page.
+        """
+        if not getattr(self.request, "htmx", False):
+            return None
+        section = self.request.headers.get(
+            "HX-Section"
+        ) or self.request.GET.get("hx_section")
+        return section if section in self.sections else "pings"
+
+    def in_window(self, ping):
+        window = self.object.mission.mission_window
+        return not window or (
+            (not window.lower or ping.reported_at >= window.lower)
+            and (not window.upper or ping.reported_at <= window.upper)
+        )
+
+    @cached_property
+    def ping_queryset(self):
         mission = self.object.mission
-        kwargs["mission"] = mission
         ping_qs = Ping.objects.filter(asset=self.object)
         if mission.mission_window:
             if mission.mission_window.lower:
@@ -161,128 +277,162 @@ class AssetDetailView(DetailView):
                 ping_qs = ping_qs.filter(
                     reported_at__lte=mission.mission_window.upper
                 )
-        kwargs["pings"] = ping_qs.order_by(
-            "-reported_at", "-created_at"
-        ).select_related("beacon")[:10]
-        altitude_series = {}
-        speed_series = {}
-        kwargs["chart_bounds"] = {
-            "start": mission.mission_window.lower
-            if mission.mission_window
-            else None,
-            "end": mission.mission_window.upper
-            if mission.mission_window
-            else None,
-        }
-        beacon_data = list(
-            ping_qs.order_by("reported_at").values_list(
+        return ping_qs
+
+    @cached_property
+    def extra_pings(self):
+        """
+        Archived and buffered pings of the asset within the mission window.
+        """
+        return [
+            p
+            for p in archived_pings(
+                self.object.mission_id, asset_id=self.object.pk
+            )
+            + buffered_pings(asset_id=self.object.pk)
+            if self.in_window(p)
+        ]
+
+    @cached_property
+    def track(self):
+        """
+        ``(beacon identifier, reported_at, altitude, position)`` rows of the
+        asset, oldest first, shared by all charts.
+        """
+        track = list(
+            self.ping_queryset.order_by("reported_at").values_list(
                 "beacon__identifier", "reported_at", "altitude", "position"
             )
         )
-        horizontal_series = {}
-        downrange_series = {}
-        launch_point = (
-            self.object.launch_site.location
-            if self.object.launch_site_id
-            else None
-        )
-        for beacon_id, reported_at, altitude, position in beacon_data:
-            altitude_series.setdefault(beacon_id, []).append(
-                (reported_at, altitude)
+        if self.extra_pings:
+            identifiers = {
+                b.pk: b.identifier for b in self.object.beacons.all()
+            }
+            track = sorted(
+                track
+                + [
+                    (
+                        identifiers.get(p.beacon_id),
+                        p.reported_at,
+                        p.altitude,
+                        p.position,
+                    )
+                    for p in self.extra_pings
+                ],
+                key=lambda row: row[1],
             )
-            history = speed_series.setdefault(beacon_id, [])
-            history.append((reported_at, altitude, position))
-            horizontal_series.setdefault(beacon_id, []).append(
-                (reported_at, position)
+        return track
+
+    def track_by_beacon(self):
+        by_beacon = {}
+        for row in self.track:
+            by_beacon.setdefault(row[0], []).append(row)
+        return by_beacon
+
+    def get_pings(self):
+        pings = list(
+            self.ping_queryset.order_by(
+                "-reported_at", "-created_at"
+            ).select_related("beacon")[:10]
+        )
+        if self.extra_pings:
+            pings = load_beacons(
+                sorted(
+                    pings + self.extra_pings,
+                    key=lambda p: p.reported_at,
+                    reverse=True,
+                )[:10]
             )
-            if launch_point and position:
-                downrange_series.setdefault(beacon_id, []).append(
-                    (reported_at, launch_point, position)
-                )
+        return pings
+
+    def get_altitude_series(self):
+        return {
+            beacon_id: [(row[1], row[2]) for row in rows]
+            for beacon_id, rows in self.track_by_beacon().items()
+        }
 
-        speed_chart_data = {}
-        for beacon_id, points in speed_series.items():
+    def get_speed_series(self):
+        series = {}
+        for beacon_id, rows in self.track_by_beacon().items():
             derived = []
-            for idx in range(1, len(points)):
-                prev_t, prev_alt, _ = points[idx - 1]
-                curr_t, curr_alt, _ = points[idx]
+            for (_, prev_t, prev_alt, _), (_, curr_t, curr_alt, _) in zip(
+                rows, rows[1:]
+            ):
                 if prev_alt is None or curr_alt is None:
                     continue
-                delta_alt = curr_alt - prev_alt
                 delta_t = (curr_t - prev_t).total_seconds()
                 if delta_t <= 0:
                     continue
-                derived.append((curr_t, delta_alt / delta_t))
-            speed_chart_data[beacon_id] = derived
-
-        def haversine_meters(p1, p2):
-            import math
-
-            lat1, lon1 = math.radians(p1.y), math.radians(p1.x)
-            lat2, lon2 = math.radians(p2.y), math.radians(p2.x)
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = (
-                math.sin(dlat / 2) ** 2
-                + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-            )
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            return 6371000 * c
+                derived.append((curr_t, (curr_alt - prev_alt) / delta_t))
+            series[beacon_id] = derived
+        return series
 
-        horizontal_chart_data = {}
-        for beacon_id, points in horizontal_series.items():
+    def get_horizontal_speed_series(self):
+        series = {}
+        for beacon_id, rows in self.track_by_beacon().items():
             derived = []
-            for idx in range(1, len(points)):
-                prev_t, prev_pos = points[idx - 1]
-                curr_t, curr_pos = points[idx]
+            for (_, prev_t, _, prev_pos), (_, curr_t, _, curr_pos) in zip(
+                rows, rows[1:]
+            ):
                 delta_t = (curr_t - prev_t).total_seconds()
                 if delta_t <= 0 or not prev_pos or not curr_pos:
                     continue
                 distance = haversine_meters(prev_pos, curr_pos)
                 derived.append((curr_t, distance / delta_t))
-            horizontal_chart_data[beacon_id] = derived
-
-        downrange_chart_data = {}
-        if launch_point:
-            for beacon_id, points in downrange_series.items():
-                distances = []
-                for reported_at, origin, dest in points:
-                    distances.append(
-                        (reported_at, haversine_meters(origin, dest))
-                    )
-                downrange_chart_data[beacon_id] = distances
-
-        kwargs["altitude_series"] = altitude_series
-        kwargs["speed_series"] = speed_chart_data
-        kwargs["horizontal_speed_series"] = horizontal_chart_data
-        kwargs["downrange_series"] = downrange_chart_data
-        kwargs["refreshed_at"] = timezone.now()
-        path_points = []
-        for _, reported_at, _, position in beacon_data:
+            series[beacon_id] = derived
+        return series
+
+    def get_downrange_series(self):
+        if not self.object.launch_site_id:
+            return {}
+        launch_point = self.object.launch_site.location
+        series = {}
+        for beacon_id, reported_at, _, position in self.track:
             if position:
-                path_points.append(
-                    [reported_at.isoformat(), position.y, position.x]
+                series.setdefault(beacon_id, []).append(
+                    (reported_at, haversine_meters(launch_point, position))
                 )
-        kwargs["path_points"] = path_points
+        return series
+
+    def get_path_points(self):
+        return [
+            [reported_at.isoformat(), position.y, position.x]
+            for _, reported_at, _, position in self.track
+            if position
+        ]
+
+    def get_context_data(self, **kwargs):
+        mission = self.object.mission
+        window = mission.mission_window
+        kwargs["mission"] = mission
+        kwargs["chart_bounds"] = {
+            "start": window.lower if window else None,
+            "end": window.upper if window else None,
+        }
+        kwargs["refreshed_at"] = timezone.now()
+
+        # Only the data of the requested section is computed, from the
+        # track read once on first use.
+        section = self.get_section()
+        if section is None:
+            names = [
+                name
+                for _, section_names in self.sections.values()
+                for name in section_names
+            ]
+            names.append("path_points")
+        else:
+            _, names = self.sections[section]
+        for name in names:
+            kwargs[name] = getattr(self, f"get_{name}")()
         return super().get_context_data(**kwargs)
 
     def get_template_names(self):
-        if getattr(self.request, "htmx", False):
-            section = self.request.headers.get(
-                "HX-Section"
-            ) or self.request.GET.get("hx_section")
-            if section == "altitude":
-                return ["tracking/partials/asset_altitude_chart.html"]
-            if section == "speed":
-                return ["tracking/partials/asset_speed_chart.html"]
-            if section == "horizontal_speed":
-                return ["tracking/partials/asset_horizontal_speed_chart.html"]
-            if section == "downrange":
-                return ["tracking/partials/asset_downrange_chart.html"]
-            if section == "pings":
-                return ["tracking/partials/asset_pings_table.html"]
-            return ["tracking/partials/asset_pings_table.html"]
-        return [self.template_name]
+        section = self.get_section()
+        if section is None:
+            return [self.template_name]
+        template_name, _ = self.sections[section]
+        return [template_name]
 
 
 class LaunchSiteListView(ListView):
@@ -436,75 +586,153 @@ class MissionParametersUpdateView(DetailView, FormView):
         )
 
 
-def kml_entrypoint(request, mission_id):
+def kml_response(request, content, filename, kmz=False):
+    """
+    Serve a KML document, given as bytes or as an iterator of chunks of
+    bytes, either as is or compressed into a KMZ archive.
+
+    Under ASGI, streamed documents are served as an asynchronous iterator,
+    which Django would otherwise consume whole before sending it.
+    """
+    from bmcc.utils.kml import KMZ_CONTENT_TYPE, astream, stream_kmz
+
+    streaming = not isinstance(content, bytes)
+    if kmz:
+        if streaming:
+            content = stream_kmz(content)
+        else:
+            content = b"".join(stream_kmz([content]))
+        content_type = KMZ_CONTENT_TYPE
+        filename = f"{filename}.kmz"
+    else:
+        content_type = "application/vnd.google-earth.kml+xml"
+        filename = f"{filename}.kml"
+    if streaming and isinstance(request, ASGIRequest):
+        content = astream(content)
+    response_class = StreamingHttpResponse if streaming else HttpResponse
+    response = response_class(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def kml_entrypoint(request, mission_id, kmz=False):
     mission = models.Mission.objects.get(pk=mission_id)
+    suffix = "kmz" if kmz else "kml"
 
     ns = {"kml": "http://www.opengis.net/kml/2.2"}
     ET.register_namespace("", ns["kml"])
     root = ET.Element("{http://www.opengis.net/kml/2.2}kml")
     document = ET.SubElement(root, "Document")
+
+    # The full document is only reloaded occasionally, in between the link
+    # it contains appends new pings to it with <Update> documents.
     netlink = ET.SubElement(document, "NetworkLink")
     ET.SubElement(netlink, "name").text = mission.name
     link = ET.SubElement(netlink, "Link")
     ET.SubElement(link, "href").text = request.build_absolute_uri(
-        reverse("missions:updating_kml", kwargs={"mission_id": mission.pk})
+        reverse(
+            f"missions:updating_{suffix}", kwargs={"mission_id": mission.pk}
+        )
     )
     ET.SubElement(link, "refreshMode").text = "onInterval"
-    ET.SubElement(link, "refreshInterval").text = "10"
+    ET.SubElement(link, "refreshInterval").text = str(KML_RESYNC_INTERVAL)
 
-    response = HttpResponse(
+    return kml_response(
+        request,
         ET.tostring(root, encoding="utf-8", xml_declaration=True),
-        content_type="application/vnd.google-earth.kml+xml",
+        f"{mission.pk}",
+        kmz=kmz,
     )
-    filename = f"{mission.pk}.kml"
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return response
 
 
-def kml_update(request, mission_id):
-    mission = models.Mission.objects.prefetch_related(
-        "launch_site_candidates"
-    ).get(pk=mission_id)
-
-    from bmcc.utils.kml import KML
-
-    kml = KML()
-    doc = kml.document(kml.root, mission.name)
-
-    launch_sites_folder = kml.folder(doc, "Launch Sites")
-    for launch_site in mission.launch_site_candidates.all():
-        launch_sites_folder.append(launch_site.__kml__())
-
-    assets = (
-        Asset.objects.filter(mission=mission)
-        .select_related("mission")
-        # .prefetch_related(
-        #    Prefetch(
-        #        "beacons",
-        #        queryset=Beacon.objects.active().prefetch_related(
-        #            Prefetch(
-        #                "pings",
-        #                queryset=Ping.objects.filter(mission=mission).order_by(
-        #                    "reported_at"
-        #                ),
-        #            )
-        #        ),
-        #    )
-        # )
-        .order_by("asset_type", "name")
-    )
+def kml_update_etag(request, mission_id, **kwargs):
+    return str(mission_version(mission_id))
 
-    assets_folder = kml.folder(doc, "Assets")
-    for asset in assets.iterator(chunk_size=1000):
-        assets_folder.append(asset.__kml__())
 
-    response = HttpResponse(
-        str(kml),
-        content_type="application/vnd.google-earth.kml+xml",
+# Google Earth polls the update every few seconds; unchanged missions are
+# answered with a 304 from the cached version alone, without any query. There
+# is no Last-Modified: with its one second resolution, a change made within
+# the second of the previous response would be answered with a 304.
+@condition(etag_func=kml_update_etag)
+def kml_update(request, mission_id, kmz=False):
+    # Taken before anything is read: pings ingested since are sent by the
+    # live updates link, at worst again.
+    cursor = PingCursor.at(timezone.now())
+    version = mission_version(mission_id)
+    mission = models.Mission.objects.get(pk=mission_id)
+
+    from bmcc.utils.kml import E as kml
+    from bmcc.utils.kml import stream_document
+
+    def live_updates():
+        suffix = "kmz" if kmz else "kml"
+        url = reverse(
+            f"missions:incremental_{suffix}", kwargs={"mission_id": mission.pk}
+        )
+        return kml.NetworkLink(
+            kml.name("Live updates"),
+            kml.Link(
+                kml.href(
+                    request.build_absolute_uri(
+                        f"{url}?{urlencode({'cursor': str(cursor)})}"
+                    )
+                ),
+                kml.refreshMode("onInterval"),
+                kml.refreshInterval(str(KML_UPDATE_INTERVAL)),
+            ),
+        )
+
+    # A fixed number of queries, however many sites, assets and beacons the
+    # mission has: launch sites with their predictions, assets with their
+    # beacons, and a single scan of the mission's pings not yet in the
+    # cached beacon folders.
+    def launch_sites():
+        launch_sites = mission.launch_site_candidates.prefetch_related(
+            Prefetch(
+                "prediction_history",
+                # Rendered from the stored trajectory alone
+                queryset=Prediction.objects.defer("prediction", "trajectory"),
+            )
+        )
+        for launch_site in launch_sites:
+            yield launch_site.__kml__()
+
+    def assets():
+        assets = (
+            Asset.objects.filter(mission=mission)
+            .prefetch_related("beacons")
+            .order_by("asset_type", "name")
+        )
+        beacons = [b for a in assets for b in a.beacons.all()]
+        # Only one of the clients polling the same mission version reads the
+        # new pings into the cached fragments, the others reuse them.
+        single_flight(
+            f"missions:kml-fragments:{mission.pk}:{version}",
+            lambda: refresh_fragments(mission.pk, beacons),
+            timeout=KML_FRAGMENTS_TIMEOUT,
+        )
+        fragments = beacon_fragments(mission.pk, beacons)
+        for asset in assets:
+            yield (
+                asset.name,
+                [fragments[b.pk] for b in asset.beacons.all()],
+            )
+
+    # Folders are rendered while the response is sent, one element at a
+    # time, instead of building the whole document first.
+    return kml_response(
+        request,
+        stream_document(
+            mission.name,
+            [
+                live_updates(),
+                ("Launch Sites", launch_sites()),
+                ("Assets", assets()),
+            ],
+        ),
+        f"{mission.pk}-update",
+        kmz=kmz,
     )
-    filename = f"{mission.pk}-update.kml"
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return response
 
     # type_folders = {}
 
@@ -592,3 +820,90 @@ def kml_update(request, mission_id):
     #         )
 
     #         make_point(positions_folder, beacon.identifier, coords[-1])
+
+
+def kml_cursor(request):
+    try:
+        return PingCursor.parse(request.GET["cursor"])
+    except (KeyError, ValueError, OverflowError):
+        return None
+
+
+def kml_incremental_etag(request, mission_id, **kwargs):
+    cursor = request.GET.get("cursor", "")
+    return f"{mission_version(mission_id)}-{cursor}"
+
+
+@condition(etag_func=kml_incremental_etag)
+def kml_incremental(request, mission_id, kmz=False):
+    """
+    Pings ingested after the client's cursor, as a ``<NetworkLinkControl>``
+    adding them to the tracks of the full document and moving the position
+    placemarks. The link is part of the full document, with the cursor it was
+    rendered at; the next cursor, following the last ping sent, is handed to
+    the client as the link cookie.
+    """
+    mission = models.Mission.objects.get(pk=mission_id)
+
+    from bmcc.utils.kml import E as kml
+    from bmcc.utils.kml import TrackPoint
+
+    cursor = kml_cursor(request)
+    if cursor is None:
+        # Linked from an entrypoint saved before the link was part of the
+        # full document, whose own link updates the client already
+        return kml_response(
+            request,
+            etree.tostring(
+                kml.kml(kml.NetworkLinkControl()),
+                xml_declaration=True,
+                encoding="utf-8",
+            ),
+            f"{mission.pk}-changes",
+            kmz=kmz,
+        )
+    target = "missions:updating_kmz" if kmz else "missions:updating_kml"
+    tracks, previous, latest = mission_track_updates(mission.pk, cursor)
+
+    update = kml.Update(
+        kml.targetHref(
+            request.build_absolute_uri(
+                reverse(target, kwargs={"mission_id": mission.pk})
+            )
+        )
+    )
+    beacons = Beacon.objects.filter(pk__in=tracks).select_related("asset")
+    for beacon in beacons:
+        pings = tracks[beacon.pk]
+        cursor = max(cursor, *(PingCursor.of(p) for p in pings))
+        points = [TrackPoint.from_ping(p) for p in pings]
+        shown = latest.get(beacon.pk)
+        if shown is None:
+            placemarks = beacon.kml_placemarks(points)
+        else:
+            start = previous.get(beacon.pk)
+            if start is not None:
+                points.insert(0, TrackPoint.from_ping(start))
+            segment_id = f"{beacon.kml_id}-{pings[0].pk}"
+            placemarks = [beacon.kml_track(points, id=segment_id)]
+            # Pings stored late may all be older than the position shown
+            if points[-1].reported_at > shown.reported_at:
+                update.append(
+                    kml.Change(beacon.kml_position_change(points[-1]))
+                )
+        update.append(
+            kml.Create(kml.Folder(*placemarks, targetId=beacon.kml_id))
+        )
+
+    root = kml.kml(
+        kml.NetworkLinkControl(
+            kml.cookie(f"cursor={cursor}"),
+            update,
+        )
+    )
+    return kml_response(
+        request,
+        etree.tostring(root, xml_declaration=True, encoding="utf-8"),
+        f"{mission.pk}-changes",
+        kmz=kmz,
+    )
@@ -2,6 +2,7 @@ import logging
 from typing import Any
 
 from django.conf import settings
+from django.contrib.gis.geos import LineString
 from django.utils.dateparse import parse_datetime
 
 import requests
@@ -13,6 +14,28 @@ from bmcc.predictions.models import Prediction
 logger = logging.getLogger(__name__)
 
 
+def parse_trajectory(data: dict[str, Any]) -> tuple[LineString, str]:
+    """
+    Return the trajectory of all stages of a Tawhiri result as a 3D line and
+    as KML coordinates, to be stored along with the raw result.
+    """
+    points = [
+        point for stage in data["prediction"] for point in stage["trajectory"]
+    ]
+    line = LineString(
+        [
+            # Tawhiri longitudes are in [0, 360)
+            ((p["longitude"] + 180) % 360 - 180, p["latitude"], p["altitude"])
+            for p in points
+        ],
+        srid=4326,
+    )
+    coordinates = " ".join(
+        f"{p['longitude']},{p['latitude']},{p['altitude']}" for p in points
+    )
+    return line, coordinates
+
+
 class TawhiriBackend:
     """
     Tawhiri API v2 client.
@@ -52,6 +75,8 @@ class TawhiriBackend:
                 "landing_location",
                 "landing_altitude",
                 "prediction",
+                "trajectory",
+                "trajectory_kml",
                 "updated_at",
             ]
         )
@@ -77,6 +102,9 @@ class TawhiriBackend:
 
     def _apply_results(self, prediction: Prediction, data: dict[str, Any]):
         prediction.prediction = data
+        prediction.trajectory, prediction.trajectory_kml = parse_trajectory(
+            data
+        )
 
         ascent, descent = data["prediction"]
         burst = ascent["trajectory"][-1]
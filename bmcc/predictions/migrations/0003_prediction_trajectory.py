@@ -0,0 +1,73 @@
+import logging
+
+import django.contrib.gis.db.models.fields
+from django.contrib.gis.geos import GEOSException, LineString
+from django.db import migrations, models
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_trajectory(data):
+    # Frozen copy of `bmcc.predictions.backends.tawhiri.parse_trajectory`
+    points = [
+        point for stage in data["prediction"] for point in stage["trajectory"]
+    ]
+    line = LineString(
+        [
+            # Tawhiri longitudes are in [0, 360)
+            ((p["longitude"] + 180) % 360 - 180, p["latitude"], p["altitude"])
+            for p in points
+        ],
+        srid=4326,
+    )
+    coordinates = " ".join(
+        f"{p['longitude']},{p['latitude']},{p['altitude']}" for p in points
+    )
+    return line, coordinates
+
+
+def parse_trajectories(apps, schema_editor):
+    Prediction = apps.get_model("predictions", "Prediction")
+    predictions = (
+        Prediction.objects.using(schema_editor.connection.alias)
+        .filter(prediction__isnull=False)
+        .only("prediction")
+    )
+    for prediction in predictions.iterator(chunk_size=100):
+        try:
+            trajectory, trajectory_kml = parse_trajectory(
+                prediction.prediction
+            )
+        except (KeyError, TypeError, ValueError, GEOSException):
+            logger.warning(
+                "Could not parse the trajectory of a prediction, skipping",
+                extra={"prediction_id": str(prediction.pk)},
+                exc_info=True,
+            )
+            continue
+        prediction.trajectory = trajectory
+        prediction.trajectory_kml = trajectory_kml
+        prediction.save(update_fields=["trajectory", "trajectory_kml"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("predictions", "0002_use_coordinate_field"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="prediction",
+            name="trajectory",
+            field=django.contrib.gis.db.models.fields.LineStringField(
+                blank=True, dim=3, geography=True, null=True, srid=4326
+            ),
+        ),
+        migrations.AddField(
+            model_name="prediction",
+            name="trajectory_kml",
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(parse_trajectories, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.gis.db.models import LineStringField
 from django.db import models
 
 from bmcc.fields import CoordinateField, UUIDAutoField
@@ -19,6 +20,9 @@ class Prediction(models.Model):
     landing_altitude = models.FloatField(null=True, blank=True)
 
     prediction = models.JSONField(null=True, blank=True)
+    # Ascent and descent, parsed once from the raw prediction
+    trajectory = LineStringField(dim=3, geography=True, null=True, blank=True)
+    trajectory_kml = models.TextField(blank=True)
 
     additional_parameters = models.JSONField(default=dict, blank=True)
 
@@ -34,14 +38,6 @@ class Prediction(models.Model):
     def __kml__(self):
         from bmcc.utils.kml import E as kml
 
-        coords = [
-            f"{c['longitude']},{c['latitude']},{c['altitude']}"
-            for c in (
-                self.prediction["prediction"][0]["trajectory"]
-                + self.prediction["prediction"][1]["trajectory"]
-            )
-        ]
-
         return kml.Folder(
             kml.name(self.created_at.isoformat()),
             kml.Placemark(
@@ -55,7 +51,7 @@ class Prediction(models.Model):
                     kml.extrude("1"),
                     kml.tessellate("1"),
                     kml.altitudeMode("absolute"),
-                    kml.coordinates(" ".join(coords)),
+                    kml.coordinates(self.trajectory_kml),
                 ),
                 kml.Style(
                     kml.LineStyle(
@@ -199,6 +199,50 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 SECURE_SSL_REDIRECT = True
 
 
+###############################################################################
+# Ping ingestion
+
+# When enabled, OwnTracks and API pings are queued in the cache and bulk
+# inserted by the `flush_ping_buffer` task (see `bmcc.tracking.buffer`). The
+# cache must support atomic increments across processes (Redis, Memcached).
+TRACKING_PING_BUFFER_ENABLED = (
+    os.environ.get("TRACKING_PING_BUFFER_ENABLED", "").lower() == "true"
+)
+TRACKING_PING_BUFFER_CACHE = os.environ.get(
+    "TRACKING_PING_BUFFER_CACHE", "default"
+)
+TRACKING_PING_BUFFER_FLUSH_INTERVAL = timedelta(
+    milliseconds=int(
+        os.environ.get("TRACKING_PING_BUFFER_FLUSH_INTERVAL_MS", "1000")
+    )
+)
+TRACKING_PING_BUFFER_FLUSH_SIZE = int(
+    os.environ.get("TRACKING_PING_BUFFER_FLUSH_SIZE", "500")
+)
+
+# Pings are stored in monthly partitions (see `bmcc.tracking.partitions`).
+# Partitions are created this many months ahead, and partitions older than
+# the retention (in months, unset to keep everything) are detached, after
+# archiving the missions with pings in them.
+TRACKING_PING_PARTITIONS_AHEAD = int(
+    os.environ.get("TRACKING_PING_PARTITIONS_AHEAD", "3")
+)
+TRACKING_PING_PARTITIONS_RETENTION = (
+    int(os.environ["TRACKING_PING_PARTITIONS_RETENTION"])
+    if os.environ.get("TRACKING_PING_PARTITIONS_RETENTION")
+    else None
+)
+
+# Pings of missions whose window ended this many days ago are moved to
+# archives on the default storage (see `bmcc.tracking.archive`). Unset to
+# only archive missions manually.
+TRACKING_PING_ARCHIVE_AFTER = (
+    timedelta(days=int(os.environ["TRACKING_PING_ARCHIVE_AFTER_DAYS"]))
+    if os.environ.get("TRACKING_PING_ARCHIVE_AFTER_DAYS")
+    else None
+)
+
+
 ###############################################################################
 # Celery configuration
 
@@ -222,6 +266,18 @@ CELERY_BEAT_SCHEDULE = {
         "task": "bmcc.missions.tasks.generate_predictions_for_future_launches",
         "schedule": timedelta(minutes=5),
     },
+    "flush_ping_buffer": {
+        "task": "bmcc.tracking.tasks.flush_ping_buffer",
+        "schedule": TRACKING_PING_BUFFER_FLUSH_INTERVAL,
+    },
+    "maintain_ping_partitions": {
+        "task": "bmcc.tracking.tasks.maintain_ping_partitions",
+        "schedule": timedelta(days=1),
+    },
+    "archive_finished_missions": {
+        "task": "bmcc.tracking.tasks.archive_finished_missions",
+        "schedule": timedelta(hours=1),
+    },
 }
 if ENVIRONMENT == "live":
     keep_tasks = CELERY_BEAT_SCHEDULE.keys()
@@ -229,11 +285,18 @@ elif ENVIRONMENT == "local":
     keep_tasks = [
         "update_beacon_locations_spot",
         "generate_future_launch_predictions",
+        "flush_ping_buffer",
+        "maintain_ping_partitions",
     ]
 else:
     # Unknown environment, do not run any beat tasks
     keep_tasks = []
 
+if not TRACKING_PING_BUFFER_ENABLED:
+    keep_tasks = [k for k in keep_tasks if k != "flush_ping_buffer"]
+if TRACKING_PING_ARCHIVE_AFTER is None:
+    keep_tasks = [k for k in keep_tasks if k != "archive_finished_missions"]
+
 CELERY_BEAT_SCHEDULE = {k: CELERY_BEAT_SCHEDULE[k] for k in keep_tasks}
 
 ###############################################################################
@@ -349,10 +412,14 @@ if sentry_dsn:
 ###############################################################################
 # SPOT backend
 
-if EXECUTION_MODE == "build":
-    SPOT_FEED_ID = ""
-else:
-    SPOT_FEED_ID = os.environ["SPOT_FEED_ID"]
+# Default feed for SPOT beacons which do not configure their own `feed_id`
+SPOT_FEED_ID = os.environ.get("SPOT_FEED_ID", "")
+# Message feed endpoint, formatted with the feed id
+SPOT_API_URL = os.environ.get(
+    "SPOT_API_URL",
+    "https://api.findmespot.com/spot-main-web/consumer/rest-api/2.0/public"
+    "/feed/{feed_id}/message.json",
+)
 
 
 ###############################################################################
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from bmcc.utils.cache import single_flight
+
+
+def test_single_flight_renders_once_for_concurrent_callers():
+    cache = LocMemCache("single-flight", {})
+    calls = []
+    results = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"rendered"
+
+    def request():
+        results.append(
+            single_flight("doc:1", render, timeout=60, cache=cache)
+        )
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [b"rendered"] * 5
+    assert single_flight("doc:1", render, timeout=60, cache=cache)
+    assert len(calls) == 1
+
+
+def test_single_flight_renders_when_waiting_times_out():
+    cache = LocMemCache("single-flight-timeout", {})
+    cache.add("doc:1:lock", 1)
+
+    value = single_flight(
+        "doc:1", lambda: "fallback", timeout=60, wait=0.1, cache=cache
+    )
+
+    assert value == "fallback"
+    assert cache.get("doc:1") is None
+
+
+def test_single_flight_without_wait_renders_right_away(monkeypatch):
+    cache = LocMemCache("single-flight-no-wait", {})
+    cache.add("doc:1:lock", 1)
+
+    def sleep(seconds):
+        raise AssertionError("Waited for the lock")
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    value = single_flight(
+        "doc:1", lambda: "rendered", timeout=60, wait=0, cache=cache
+    )
+
+    assert value == "rendered"
@@ -0,0 +1,16 @@
+import uuid
+
+from bmcc.fields import UUIDAutoField, uuid7
+
+
+def test_uuid7_is_time_ordered():
+    values = [uuid7() for _ in range(10_000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    assert {(v.version, v.variant) for v in values} == {(7, uuid.RFC_4122)}
+
+
+def test_uuid_auto_field_generator():
+    assert UUIDAutoField().default is uuid.uuid4
+    assert UUIDAutoField(time_ordered=True).default is uuid7
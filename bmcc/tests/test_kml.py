@@ -0,0 +1,29 @@
+from datetime import UTC, datetime, timedelta
+
+from bmcc.utils.kml import (
+    TRACK_OVERVIEW_SIZE,
+    TRACK_SEGMENT_SIZE,
+    TrackPoint,
+    split_track,
+)
+
+
+def test_split_track_keeps_the_last_point_in_the_overview():
+    start = datetime(2025, 6, 1, tzinfo=UTC)
+    points = tuple(
+        TrackPoint(
+            reported_at=start + timedelta(seconds=i),
+            longitude=i / 1000,
+            latitude=46.0,
+            altitude=None,
+            coordinates=f"{i / 1000:.6f},46.000000",
+        )
+        for i in range(2 * TRACK_SEGMENT_SIZE + 1)
+    )
+
+    overview, segments = split_track(points)
+
+    assert len(overview) <= TRACK_OVERVIEW_SIZE + 1
+    assert overview[0] is points[0]
+    assert overview[-1] is points[-1]
+    assert [len(s) for s in segments] == [500, 501, 2]
@@ -45,9 +45,14 @@ class BeaconAdmin(ModelAdmin):
         "asset",
         "backend_class_path",
     ]
+    list_select_related = [
+        "asset__mission",
+        "latest_ping__ping",
+    ]
 
     def last_ping_timestamp(self, obj):
-        ping = obj.last_ping()
+        latest = getattr(obj, "latest_ping", None)
+        ping = latest.ping if latest else None
         return (
             admin_detail_link(ping, timezone.localtime(ping.reported_at))
             if ping
@@ -62,6 +67,7 @@ class PingResource(resources.ModelResource):
     mission_name = resources.Field()
     latitude = resources.Field()
     longitude = resources.Field()
+    payload = resources.Field()
 
     class Meta:
         model = models.Ping
@@ -81,7 +87,11 @@ class PingResource(resources.ModelResource):
             "accuracy",
             "speed",
             "course",
-            "metadata",
+            "battery",
+            "satellites",
+            "rssi",
+            "snr",
+            "payload",
         )
         export_order = fields
 
@@ -103,6 +113,10 @@ class PingResource(resources.ModelResource):
     def dehydrate_longitude(self, obj):
         return obj.longitude
 
+    def dehydrate_payload(self, obj):
+        payload = getattr(obj, "payload", None)
+        return payload.data if payload else None
+
 
 @admin.register(models.Ping)
 class PingAdmin(ExportMixin, ModelAdmin):
@@ -124,8 +138,26 @@ class PingAdmin(ExportMixin, ModelAdmin):
         CoordinateField: {"form_class": CoordinateFormField}
     }
 
+    def get_export_queryset(self, request):
+        return (
+            super()
+            .get_export_queryset(request)
+            .select_related("beacon", "asset", "mission", "payload")
+        )
+
+
+@admin.register(models.PingArchive)
+class PingArchiveAdmin(ModelAdmin):
+    list_display = ["mission", "ping_count", "created_at"]
+    readonly_fields = ["mission", "file", "ping_count", "created_at"]
+
 
 @admin.register(models.OwnTracksMessage)
 class OwnTracksMessageAdmin(ModelAdmin):
     list_display = ["beacon", "sent_at", "created_at"]
     list_filter = ["beacon", "sent_at"]
+
+
+@admin.register(models.SpotFeedCursor)
+class SpotFeedCursorAdmin(ModelAdmin):
+    list_display = ["feed_id", "last_message_at", "last_polled_at"]
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class TrackingConfig(AppConfig):
+    name = "bmcc.tracking"
+    verbose_name = "Tracking"
+
+    def ready(self):
+        from . import signals  # noqa: F401
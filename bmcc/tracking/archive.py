@@ -0,0 +1,275 @@
+"""
+Cold storage of the pings of finished missions.
+
+`archive_mission` writes all pings of a mission to a single gzip-compressed,
+column-oriented JSON file on the default (``PUBLIC_STORAGE_DSN``) storage,
+records it as a `PingArchive`, and deletes the pings from the ping table.
+Columns of similar values (timestamps, coordinates, repeated beacon ids)
+compress far better than row-wise records.
+
+Views read archived pings through `archived_pings`, which returns unsaved
+`Ping` instances just like `bmcc.tracking.buffer.buffered_pings`, so that
+they can be merged with the pings still in the table.
+"""
+
+import copy
+import gzip
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import UTC, datetime
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from bmcc.fields import Coordinate
+
+from . import models
+from .latest import refresh_latest_pings
+
+
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_NAME_TIMEOUT = 24 * 3600
+# Archives are immutable, the most recently read ones are kept in memory by
+# each process, up to this many pings in total.
+ARCHIVE_CACHE_MAX_PINGS = 50_000
+
+# Ping attributes stored as-is, in addition to the mission (implied by the
+# archive), timestamps, position and payload.
+PLAIN_COLUMNS = [
+    "beacon_id",
+    "asset_id",
+    "prediction_id",
+    "altitude",
+    "accuracy",
+    "speed",
+    "course",
+    "battery",
+    "satellites",
+    "rssi",
+    "snr",
+]
+
+
+def to_micros(value):
+    return round(value.timestamp() * 1_000_000)
+
+
+def from_micros(value):
+    return datetime.fromtimestamp(value / 1_000_000, tz=UTC)
+
+
+def dump_pings(pings):
+    """
+    Serialize pings, and return the compressed archive and the ping count.
+    """
+    columns = {
+        "id": [],
+        "reported_at": [],
+        "created_at": [],
+        "longitude": [],
+        "latitude": [],
+        "payload": [],
+        **{name: [] for name in PLAIN_COLUMNS},
+    }
+    for ping in pings:
+        columns["id"].append(ping.id.hex)
+        columns["reported_at"].append(to_micros(ping.reported_at))
+        columns["created_at"].append(to_micros(ping.created_at))
+        columns["longitude"].append(ping.position.longitude)
+        columns["latitude"].append(ping.position.latitude)
+        payload = getattr(ping, "payload", None)
+        columns["payload"].append(payload.data if payload else None)
+        for name in PLAIN_COLUMNS:
+            value = getattr(ping, name)
+            if name.endswith("_id") and value is not None:
+                value = value.hex
+            columns[name].append(value)
+    count = len(columns["id"])
+    document = {
+        "version": ARCHIVE_FORMAT_VERSION,
+        "count": count,
+        "columns": columns,
+    }
+    data = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(data), count
+
+
+def load_pings(data, mission_id):
+    document = json.loads(gzip.decompress(data))
+    if document["version"] != ARCHIVE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported ping archive version: {document['version']}"
+        )
+    columns = document["columns"]
+    for name in ["id", *PLAIN_COLUMNS]:
+        if name == "id" or name.endswith("_id"):
+            columns[name] = [
+                uuid.UUID(value) if value else None
+                for value in columns[name]
+            ]
+    pings = []
+    for i in range(document["count"]):
+        values = {name: columns[name][i] for name in PLAIN_COLUMNS}
+        pings.append(
+            models.Ping(
+                id=columns["id"][i],
+                mission_id=mission_id,
+                reported_at=from_micros(columns["reported_at"][i]),
+                created_at=from_micros(columns["created_at"][i]),
+                position=Coordinate(
+                    columns["longitude"][i], columns["latitude"][i]
+                ),
+                raw_payload=columns["payload"][i],
+                **values,
+            )
+        )
+    return pings
+
+
+def archive_name_key(mission_id):
+    return f"tracking:ping-archive:{mission_id}"
+
+
+def get_archive_name(mission_id):
+    """
+    Storage name of the ping archive of the mission, or an empty string.
+    """
+    key = archive_name_key(mission_id)
+    name = cache.get(key)
+    if name is None:
+        name = (
+            models.PingArchive.objects.filter(mission_id=mission_id)
+            .values_list("file", flat=True)
+            .first()
+        ) or ""
+        cache.set(key, name, timeout=ARCHIVE_NAME_TIMEOUT)
+    return name
+
+
+class ArchiveCache:
+    """
+    Least recently used archives, bounded by their total number of pings.
+    """
+
+    def __init__(self, max_pings):
+        self.max_pings = max_pings
+        self.archives = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            pings = self.archives.get(key)
+            if pings is not None:
+                self.archives.move_to_end(key)
+            return pings
+
+    def set(self, key, pings):
+        if len(pings) > self.max_pings:
+            return
+        with self.lock:
+            self.archives[key] = pings
+            self.archives.move_to_end(key)
+            total = sum(len(p) for p in self.archives.values())
+            while total > self.max_pings:
+                _, evicted = self.archives.popitem(last=False)
+                total -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.archives.clear()
+
+
+archive_cache = ArchiveCache(ARCHIVE_CACHE_MAX_PINGS)
+
+
+def read_archive(name, mission_id):
+    pings = archive_cache.get((name, mission_id))
+    if pings is None:
+        field = models.PingArchive._meta.get_field("file")
+        with field.storage.open(name, "rb") as f:
+            pings = tuple(load_pings(f.read(), mission_id))
+        archive_cache.set((name, mission_id), pings)
+    return pings
+
+
+def archived_pings(mission_id, **filters):
+    """
+    Archived pings of the mission matching the given field values, ordered
+    by beacon and time.
+    """
+    name = get_archive_name(mission_id)
+    if not name:
+        return []
+    return [
+        ping
+        for ping in read_archive(name, mission_id)
+        if all(getattr(ping, k) == v for k, v in filters.items())
+    ]
+
+
+def load_beacons(pings):
+    """
+    Return the given pings with their beacon loaded, fetching the beacons
+    of archived and buffered pings in a single query. Those are copied
+    rather than modified, as archived pings are shared by the process.
+    """
+    field = models.Ping._meta.get_field("beacon")
+    missing = {p.beacon_id for p in pings if not field.is_cached(p)}
+    if not missing:
+        return list(pings)
+    beacons = models.Beacon.objects.in_bulk(missing)
+    loaded = []
+    for ping in pings:
+        if not field.is_cached(ping) and ping.beacon_id in beacons:
+            ping = copy.copy(ping)
+            ping.beacon = beacons[ping.beacon_id]
+        loaded.append(ping)
+    return loaded
+
+
+def archive_mission(mission):
+    """
+    Move all pings of the mission to a new archive, and return it.
+    """
+    with transaction.atomic():
+        # Pings are dumped and deleted from the same snapshot, pings stored
+        # meanwhile are left in the table.
+        if models.PingArchive.objects.filter(mission=mission).exists():
+            raise ValueError(f"Pings of {mission} are already archived")
+
+        pings = models.Ping.objects.filter(mission=mission)
+        ids = list(
+            pings.order_by().values_list("beacon_id", "asset_id").distinct()
+        )
+        data, count = dump_pings(
+            pings.select_related("payload")
+            .order_by("beacon_id", "reported_at")
+            .iterator(chunk_size=2000)
+        )
+        archive = models.PingArchive(mission=mission, ping_count=count)
+        archive.file.save(
+            f"{mission.pk}.json.gz", ContentFile(data), save=False
+        )
+        archive.save()
+
+        # Side tables first, then the pings themselves; see
+        # `bmcc.tracking.changes.delete_ping_side_rows`.
+        models.PingPayload.objects.filter(ping__mission=mission).delete()
+        models.BeaconLatestPing.objects.filter(ping__mission=mission).delete()
+        models.AssetLatestPing.objects.filter(ping__mission=mission).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {models.Ping._meta.db_table} "
+                "WHERE mission_id = %s",
+                [mission.pk],
+            )
+        # Reused beacons may have pings from other missions
+        refresh_latest_pings(
+            beacon_ids={beacon_id for beacon_id, _ in ids},
+            asset_ids={asset_id for _, asset_id in ids},
+        )
+    # Mission versions are bumped by the archive's post_save signal
+    return archive
@@ -0,0 +1,213 @@
+import math
+from datetime import UTC, datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+import attrs
+from asgiref.sync import sync_to_async
+
+from bmcc.fields import Coordinate
+
+from .. import models
+from ..archive import archived_pings
+from ..buffer import astore_pings, buffered_pings, store_pings
+
+
+# Bounds of the integer columns of pings
+INTEGER_RANGE = (-(2**31), 2**31 - 1)
+SMALL_INTEGER_RANGE = (-(2**15), 2**15 - 1)
+POSITIVE_SMALL_INTEGER_RANGE = (0, 2**15 - 1)
+
+# Epoch values above this are assumed to be expressed in milliseconds
+# (10^11 seconds is in the year 5138).
+EPOCH_MILLISECONDS_THRESHOLD = 10**11
+
+
+def parse_reported_at(value):
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if isinstance(value, (int, float)):
+        if abs(value) >= EPOCH_MILLISECONDS_THRESHOLD:
+            value = value / 1000
+        try:
+            return datetime.fromtimestamp(value, tz=UTC)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError(f"Invalid timestamp: {value!r}") from None
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    reported_at = parse_datetime(value)
+    if reported_at is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if timezone.is_naive(reported_at):
+        reported_at = timezone.make_aware(reported_at, UTC)
+    return reported_at
+
+
+def parse_float(data, key, *, required=False):
+    value = data.get(key)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"Missing field: {key}")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Invalid value for {key}: {value!r}") from None
+    # Rejects NaN and values overflowing to infinity (e.g. 1e999)
+    if not math.isfinite(number):
+        raise ValueError(f"Invalid value for {key}: {value!r}")
+    return number
+
+
+def parse_int(data, key, low=None, high=None):
+    value = parse_float(data, key)
+    if value is None:
+        return None
+    value = round(value)
+    if (low is not None and value < low) or (
+        high is not None and value > high
+    ):
+        raise ValueError(f"Value for {key} out of range: {value}")
+    return value
+
+
+@attrs.frozen
+class ApiBackend:
+    """
+    Backend for trackers posting fixes to the BMCC HTTP API.
+
+    Payloads carry ``latitude``/``longitude`` in decimal degrees, and
+    optionally ``altitude`` (m), ``accuracy`` (m), ``speed`` (km/h, as for
+    OwnTracks), ``course`` (degrees), ``battery`` (%), ``satellites``,
+    ``rssi`` (dBm), ``snr`` (dB) and ``reported_at`` (ISO 8601 or
+    seconds/milliseconds since the epoch). Fixes without ``reported_at``
+    are timestamped on receipt.
+    """
+
+    beacon: models.Beacon
+
+    def parse_ping(self, data, *, reported_at=None):
+        if not isinstance(data, dict):
+            raise ValueError("Ping payload must be an object")
+
+        latitude = parse_float(data, "latitude", required=True)
+        longitude = parse_float(data, "longitude", required=True)
+        if not -90 <= latitude <= 90:
+            raise ValueError(f"Latitude out of range: {latitude}")
+        if not -180 <= longitude <= 360:
+            raise ValueError(f"Longitude out of range: {longitude}")
+        if longitude > 180:
+            longitude -= 360
+
+        if data.get("reported_at") is not None:
+            reported_at = parse_reported_at(data["reported_at"])
+        elif reported_at is None:
+            raise ValueError("Missing field: reported_at")
+
+        course = parse_float(data, "course")
+        if course is not None:
+            course %= 360
+
+        return models.Ping(
+            mission_id=self.beacon.asset.mission_id,
+            asset_id=self.beacon.asset_id,
+            beacon=self.beacon,
+            reported_at=reported_at,
+            position=Coordinate(longitude, latitude),
+            altitude=parse_int(data, "altitude", *INTEGER_RANGE),
+            accuracy=parse_int(data, "accuracy", *INTEGER_RANGE),
+            speed=parse_int(data, "speed", *INTEGER_RANGE),
+            course=course,
+            battery=parse_int(data, "battery", 0, 100),
+            satellites=parse_int(
+                data, "satellites", *POSITIVE_SMALL_INTEGER_RANGE
+            ),
+            rssi=parse_int(data, "rssi", *SMALL_INTEGER_RANGE),
+            snr=parse_float(data, "snr"),
+            raw_payload=data,
+        )
+
+    def handle_ping(self, data):
+        ping = self.parse_ping(data, reported_at=timezone.now())
+        # Retried requests for an already stored fix are no-ops
+        store_pings([ping])
+        return ping
+
+    async def ahandle_ping(self, data):
+        """
+        Async variant of `handle_ping`; expects `beacon.asset` to be loaded.
+        """
+        ping = self.parse_ping(data, reported_at=timezone.now())
+        await astore_pings([ping])
+        return ping
+
+    def parse_batch(self, items):
+        results = []
+        candidates = {}
+        for index, item in enumerate(items):
+            try:
+                ping = self.parse_ping(item)
+            except (ValueError, OverflowError, OSError) as e:
+                results.append({"status": "invalid", "error": str(e)})
+                continue
+            if ping.reported_at in candidates:
+                results.append({"status": "duplicate"})
+                continue
+            candidates[ping.reported_at] = (index, ping)
+            results.append(None)
+        return results, candidates
+
+    def resolve_batch(self, results, candidates, existing):
+        pings = []
+        for reported_at, (index, ping) in candidates.items():
+            if reported_at in existing:
+                results[index] = {"status": "duplicate"}
+            else:
+                results[index] = {"status": "created", "ping": ping.pk}
+                pings.append(ping)
+        return pings
+
+    def existing_times(self, reported_ats):
+        """
+        Return the given times of fixes of the beacon already stored, still
+        buffered or archived, which a bulk insert would silently skip.
+        """
+        reported_ats = set(reported_ats)
+        existing = set(
+            self.beacon.pings.filter(
+                reported_at__in=list(reported_ats)
+            ).values_list("reported_at", flat=True)
+        )
+        others = [
+            *buffered_pings(beacon_id=self.beacon.pk),
+            *archived_pings(
+                self.beacon.asset.mission_id, beacon_id=self.beacon.pk
+            ),
+        ]
+        existing.update(
+            p.reported_at for p in others if p.reported_at in reported_ats
+        )
+        return existing
+
+    def handle_batch(self, items):
+        """
+        Validate and store a list of fixes with a single bulk insert.
+
+        Returns one result dict per item, in order, with a ``status`` of
+        ``created``, ``duplicate`` (same timestamp as a stored, buffered or
+        archived fix, or an earlier item) or ``invalid``.
+        """
+        results, candidates = self.parse_batch(items)
+        existing = self.existing_times(candidates)
+        store_pings(self.resolve_batch(results, candidates, existing))
+        return results
+
+    async def ahandle_batch(self, items):
+        """
+        Async variant of `handle_batch`; expects `beacon.asset` to be loaded.
+        """
+        results, candidates = self.parse_batch(items)
+        existing = await sync_to_async(self.existing_times)(candidates)
+        await astore_pings(self.resolve_batch(results, candidates, existing))
+        return results
@@ -1,15 +1,76 @@
+import hashlib
+import json
 from datetime import UTC, datetime
 from urllib.parse import urljoin
 
 from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 
 import attrs
+from asgiref.sync import sync_to_async
 
 from bmcc.fields import Coordinate
+from bmcc.utils.cache import single_flight
 
 from .. import models
+from ..buffer import astore_pings, store_pings
+from ..versions import mission_version
+
+
+FRIENDS_SNAPSHOT_TIMEOUT = 60 * 60
+# Devices get a full friends list again this long after the last one, in
+# case a response was lost or the app was reset.
+DEVICE_FULL_RESEND_INTERVAL = 10 * 60
+
+
+def build_friends_snapshot(mission_id):
+    """
+    Card and latest location of every active beacon of the mission which
+    reported at least once, read from the latest ping rows in a single query,
+    plus a hash of the cards to detect roster changes.
+    """
+    latest_pings = models.BeaconLatestPing.objects.filter(
+        beacon__active=True,
+        beacon__asset__mission_id=mission_id,
+    ).select_related("beacon__asset", "ping")
+    friends = []
+    for latest in sorted(latest_pings, key=lambda r: r.beacon.identifier):
+        ping = latest.ping
+        ping.beacon = latest.beacon
+        friends.append(
+            {
+                "beacon_id": str(latest.beacon_id),
+                "card": OwnTracksBackend.prepare_card_message(latest.beacon),
+                "location": OwnTracksBackend.prepare_location_message(ping),
+            }
+        )
+    roster = hashlib.sha1(
+        json.dumps(
+            [[f["beacon_id"], f["card"]] for f in friends], sort_keys=True
+        ).encode("utf-8")
+    ).hexdigest()
+    return {"roster": roster, "friends": friends}
+
+
+def get_friends_snapshot(mission_id):
+    """
+    Friends snapshot of the mission, built once and shared by the responses
+    to every device until tracking data of the mission changes.
+    """
+    key = (
+        f"tracking:owntracks-snapshot:{mission_id}:"
+        f"{mission_version(mission_id)}"
+    )
+    # Built right away while another worker holds the lock, rather than
+    # waiting for it: the async endpoint would tie up its thread meanwhile.
+    return single_flight(
+        key,
+        lambda: build_friends_snapshot(mission_id),
+        timeout=FRIENDS_SNAPSHOT_TIMEOUT,
+        wait=0,
+    )
 
 
 @attrs.frozen()
@@ -17,52 +78,128 @@ class OwnTracksBackend:
     beacon: models.Beacon
     show_all: bool = False
 
-    def handle_ping(self, data):
+    def build_ping(self, data):
         if data["_type"] != "location":
             raise ValueError("Not a location message")
 
-        ping = self.beacon.pings.create(
+        return models.Ping(
+            mission_id=self.beacon.asset.mission_id,
+            asset_id=self.beacon.asset_id,
+            beacon=self.beacon,
             position=Coordinate(data["lon"], data["lat"]),
             altitude=data.get("alt", None),
             accuracy=data.get("acc", None),
             speed=data.get("vel", None),
+            battery=data.get("batt", None),
             reported_at=datetime.fromtimestamp(data["tst"], tz=UTC),
-            metadata=data,
+            raw_payload=data,
         )
 
+    def mark_sent(self, pending):
+        now = timezone.now()
+        for msg in pending:
+            msg.sent_at = now
+        return [msg.message for msg in pending]
+
+    def handle_ping(self, data):
+        ping = self.build_ping(data)
+        # Clients resend messages they did not get a response for, the ones
+        # we already stored are ignored.
+        store_pings([ping])
+
         pending = list(
             self.beacon.owntracks_messages.filter(sent_at__isnull=True)
         )
-        now = timezone.now()
-        outbound = []
+        outbound = self.mark_sent(pending)
         if pending:
-            for msg in pending:
-                outbound.append(msg.message)
-                msg.sent_at = now
             models.OwnTracksMessage.objects.bulk_update(pending, ["sent_at"])
 
         if not self.show_all:
             return ping, outbound
-
-        friends = (
-            models.Beacon.objects.active()
-            .filter(
-                asset__mission_id=self.beacon.asset.mission_id,
-                pings__isnull=False,
+        return ping, outbound + self.get_friends_messages()
+
+    async def ahandle_ping(self, data, *, check_pending=True):
+        """
+        Async variant of `handle_ping`; expects `beacon.asset` to be loaded.
+
+        Pass ``check_pending=False`` when the beacon is known to have no
+        pending messages to skip looking them up.
+        """
+        ping = self.build_ping(data)
+        await astore_pings([ping])
+
+        pending = []
+        if check_pending:
+            pending = [
+                msg
+                async for msg in self.beacon.owntracks_messages.filter(
+                    sent_at__isnull=True
+                )
+            ]
+        outbound = self.mark_sent(pending)
+        if pending:
+            await models.OwnTracksMessage.objects.abulk_update(
+                pending, ["sent_at"]
             )
-            .exclude(pk=self.beacon.pk)
+
+        if not self.show_all:
+            return ping, outbound
+        friends = await sync_to_async(self.get_friends_messages)()
+        return ping, outbound + friends
+
+    def get_friends_messages(self):
+        """
+        Messages updating the friends shown on the device: cards (after
+        clearing waypoints) only when the roster changed since the device's
+        last request, and locations only for friends which moved since.
+        Everything is sent again every ``DEVICE_FULL_RESEND_INTERVAL``.
+        """
+        beacon_id = str(self.beacon.pk)
+        snapshot = get_friends_snapshot(self.beacon.asset.mission_id)
+        friends = [
+            friend
+            for friend in snapshot["friends"]
+            if friend["beacon_id"] != beacon_id
+        ]
+
+        state_key = f"tracking:owntracks-device:{beacon_id}"
+        state = cache.get(state_key) or {}
+        now = timezone.now().timestamp()
+        # The state is rewritten on every request, so its expiry alone would
+        # never trigger a full resend for an active device.
+        full_sent_at = state.get("full_sent_at", 0)
+        messages = []
+        if (
+            state.get("roster") == snapshot["roster"]
+            and now - full_sent_at < DEVICE_FULL_RESEND_INTERVAL
+        ):
+            sent_locations = state["locations"]
+        else:
+            full_sent_at = now
+            sent_locations = {}
+            messages.append({"_type": "cmd", "action": "clearWaypoints"})
+            messages.extend(friend["card"] for friend in friends)
+
+        messages.extend(
+            friend["location"]
+            for friend in friends
+            if sent_locations.get(friend["beacon_id"])
+            != friend["location"]["tst"]
         )
-        return ping, (
-            outbound
-            + [
-                {"_type": "cmd", "action": "clearWaypoints"},
-            ]
-            + [self.prepare_card_message(beacon) for beacon in friends]
-            + [
-                self.prepare_location_message(beacon.last_ping())
-                for beacon in friends
-            ]
+
+        cache.set(
+            state_key,
+            {
+                "roster": snapshot["roster"],
+                "full_sent_at": full_sent_at,
+                "locations": {
+                    friend["beacon_id"]: friend["location"]["tst"]
+                    for friend in friends
+                },
+            },
+            timeout=DEVICE_FULL_RESEND_INTERVAL,
         )
+        return messages
 
         # https://owntracks.org/booklet/tech/json/
         # {
@@ -72,7 +209,8 @@ class OwnTracksBackend:
         #     "created_at": 1763869517,
         # }
 
-    def prepare_location_message(self, ping):
+    @staticmethod
+    def prepare_location_message(ping):
         msg = {
             "_type": "location",
             "lon": ping.longitude,
@@ -90,7 +228,8 @@ class OwnTracksBackend:
 
         return msg
 
-    def prepare_card_message(self, beacon):
+    @staticmethod
+    def prepare_card_message(beacon):
         return {
             "_type": "card",
             "tid": beacon.identifier[:2],
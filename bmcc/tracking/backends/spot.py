@@ -1,6 +1,6 @@
 import enum
 import logging
-from datetime import datetime
+from datetime import UTC, datetime
 
 from django.conf import settings
 
@@ -12,7 +12,12 @@ from bmcc.fields import Coordinate
 from .. import models
 
 
-SPOT_API_URL = "https://api.findmespot.com/spot-main-web/consumer/rest-api/2.0/public/feed/{feed_id}/message.json"
+# The feed returns at most 50 messages per page, newest first
+SPOT_PAGE_SIZE = 50
+SPOT_MAX_PAGES = 20
+SPOT_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S-0000"
+SPOT_NO_MESSAGES_ERROR = "E-0195"
+SPOT_MAX_CONCURRENT_FEEDS = 8
 
 
 class MessageType(enum.StrEnum):
@@ -22,42 +27,139 @@ class MessageType(enum.StrEnum):
 logger = logging.getLogger(__name__)
 
 
+class SpotFeedError(Exception):
+    pass
+
+
+def format_spot_date(value: datetime) -> str:
+    return value.astimezone(UTC).strftime(SPOT_DATE_FORMAT)
+
+
+def parse_spot_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
 @attrs.frozen
 class SpotBackend:
     beacon: models.Beacon
     device_id: str
+    # Falls back to the deployment-wide ``settings.SPOT_FEED_ID``
+    feed_id: str = ""
+
+    def get_feed_id(self) -> str:
+        return self.feed_id or settings.SPOT_FEED_ID
+
+    @staticmethod
+    def create_session() -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_maxsize=SPOT_MAX_CONCURRENT_FEEDS
+        )
+        session.mount("https://", adapter)
+        return session
 
     @staticmethod
-    def retrieve_messages():
-        url = SPOT_API_URL.format(feed_id=settings.SPOT_FEED_ID)
-        response = requests.get(url)
-        response.raise_for_status()
-        payload = response.json()
-        return payload["response"]["feedMessageResponse"]["messages"][
-            "message"
-        ]
-
-    def process_messages(self, messages: list):
+    def retrieve_messages(
+        since: datetime | None = None,
+        *,
+        feed_id: str | None = None,
+        session: requests.Session | None = None,
+    ) -> list:
+        """
+        Retrieve the messages of a feed, following pagination.
+
+        When ``since`` is given, only messages reported at or after it are
+        requested; the overlap of one second is harmless as stored messages
+        are ignored on insert.
+
+        At most ``SPOT_MAX_PAGES`` pages are fetched. When more messages are
+        available, the oldest ones are returned, so that a cursor set to the
+        newest returned message never skips messages that were not fetched;
+        the next polls catch up with the rest.
+        """
+        url = settings.SPOT_API_URL.format(
+            feed_id=feed_id or settings.SPOT_FEED_ID
+        )
+        session = session or SpotBackend.create_session()
+        params = {}
+        if since is not None:
+            params["startDate"] = format_spot_date(since)
+
+        def get_page(start):
+            response = session.get(
+                url, params={**params, "start": start}, timeout=30
+            )
+            response.raise_for_status()
+            payload = response.json()["response"]
+
+            if "errors" in payload:
+                error = payload["errors"]["error"]
+                if error.get("code") == SPOT_NO_MESSAGES_ERROR:
+                    return [], 0
+                raise SpotFeedError(
+                    f"{error.get('code')}: {error.get('description')}"
+                )
+
+            feed = payload["feedMessageResponse"]
+            page = feed["messages"]["message"]
+            if isinstance(page, dict):
+                # Single messages are not wrapped in a list
+                page = [page]
+            return page, feed["totalCount"]
+
+        messages, total = get_page(0)
+        limit = SPOT_MAX_PAGES * SPOT_PAGE_SIZE
+        if total > limit:
+            logger.warning(
+                "SPOT feed pagination limit reached",
+                extra={"feed_id": feed_id, "message_count": total},
+            )
+            # Pages are newest first: fetch the last ones instead. Messages
+            # arriving meanwhile shift them towards older messages, which
+            # only leads to harmless overlaps.
+            messages = []
+            for start in range(total - limit, total, SPOT_PAGE_SIZE):
+                page, _ = get_page(start)
+                if not page:
+                    break
+                messages.extend(page)
+            return messages
+
+        while messages and len(messages) < total:
+            page, _ = get_page(len(messages))
+            if not page:
+                break
+            messages.extend(page)
+        return messages
+
+    @staticmethod
+    def index_messages(messages: list) -> dict[str, list]:
+        by_device = {}
+        for message in messages:
+            by_device.setdefault(message["messengerId"], []).append(message)
+        return by_device
+
+    def build_pings(self, messages: list) -> list[models.Ping]:
+        pings = []
         for message in messages:
-            if message["messengerId"] == self.device_id:
-                if message["messageType"] != MessageType.TRACK:
-                    logging.error(
-                        "Unknown message type: %s", message["messageType"]
-                    )
-                    continue
-                reported_at = datetime.fromisoformat(message["dateTime"])
-                position = Coordinate(
-                    message["longitude"], message["latitude"]
+            if message["messengerId"] != self.device_id:
+                continue
+            if message["messageType"] != MessageType.TRACK:
+                logger.error(
+                    "Unknown message type: %s", message["messageType"]
                 )
-                # altitude = message["altitude"]
-                ping, created = self.beacon.pings.get_or_create(
+                continue
+            pings.append(
+                models.Ping(
+                    mission_id=self.beacon.asset.mission_id,
+                    asset_id=self.beacon.asset_id,
                     beacon=self.beacon,
-                    reported_at=reported_at,
-                    defaults={
-                        "mission": self.beacon.asset.mission,
-                        "asset": self.beacon.asset,
-                        "position": position,
-                        # "altitude": altitude,  # Not supported on SPOT 2
-                        "metadata": message,
-                    },
+                    reported_at=parse_spot_date(message["dateTime"]),
+                    position=Coordinate(
+                        message["longitude"], message["latitude"]
+                    ),
+                    # altitude=message["altitude"],  # Not supported on SPOT 2
+                    raw_payload=message,
                 )
+            )
+        return pings
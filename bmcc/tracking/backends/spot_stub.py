@@ -0,0 +1,124 @@
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+from .spot import (
+    SPOT_NO_MESSAGES_ERROR,
+    SPOT_PAGE_SIZE,
+    parse_spot_date,
+)
+
+
+FEED_PATH_RE = re.compile(r"/feed/(?P<feed_id>[^/]+)/message\.json$")
+
+
+class SpotFeedStub(BaseAdapter):
+    """
+    Offline stand-in for the SPOT public feed API.
+
+    Mount it on a ``requests.Session`` in place of the real API to serve
+    in-memory messages with the same date filters, paging and response
+    shapes (including single-message and "no messages" responses)::
+
+        stub = SpotFeedStub({"feed-id": messages})
+        session = requests.Session()
+        session.mount("https://api.findmespot.com/", stub)
+
+    Every requested URL is recorded in ``requested_urls``.
+    """
+
+    def __init__(self, feeds=None):
+        super().__init__()
+        self.feeds = {k: list(v) for k, v in (feeds or {}).items()}
+        self.requested_urls = []
+
+    def add_messages(self, feed_id, messages):
+        self.feeds.setdefault(feed_id, []).extend(messages)
+
+    def get_page(self, feed_id, start_date=None, end_date=None, start=0):
+        messages = sorted(
+            self.feeds.get(feed_id, []),
+            key=lambda m: parse_spot_date(m["dateTime"]),
+            reverse=True,
+        )
+        if start_date is not None:
+            messages = [
+                m
+                for m in messages
+                if parse_spot_date(m["dateTime"]) >= start_date
+            ]
+        if end_date is not None:
+            messages = [
+                m
+                for m in messages
+                if parse_spot_date(m["dateTime"]) <= end_date
+            ]
+
+        page = messages[start : start + SPOT_PAGE_SIZE]
+        if not page:
+            return {
+                "response": {
+                    "errors": {
+                        "error": {
+                            "code": SPOT_NO_MESSAGES_ERROR,
+                            "text": "No Messages to display",
+                            "description": (
+                                f"No displayable messages found for feed: "
+                                f"{feed_id}"
+                            ),
+                        }
+                    }
+                }
+            }
+        return {
+            "response": {
+                "feedMessageResponse": {
+                    "count": len(page),
+                    "feed": {"id": feed_id},
+                    "totalCount": len(messages),
+                    "activityCount": 0,
+                    "messages": {
+                        "message": page[0] if len(page) == 1 else page
+                    },
+                }
+            }
+        }
+
+    def send(self, request, **kwargs):
+        self.requested_urls.append(request.url)
+        url = urlsplit(request.url)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json"
+
+        match = FEED_PATH_RE.search(url.path)
+        if not match:
+            response.status_code = 404
+            response._content = b""
+            return response
+
+        def parse_date(key):
+            if key not in query:
+                return None
+            return datetime.strptime(query[key], "%Y-%m-%dT%H:%M:%S%z")
+
+        payload = self.get_page(
+            match["feed_id"],
+            start_date=parse_date("startDate"),
+            end_date=parse_date("endDate"),
+            start=int(query.get("start", 0)),
+        )
+        response.status_code = 200
+        response._content = json.dumps(payload).encode("utf-8")
+        return response
+
+    def close(self):
+        pass
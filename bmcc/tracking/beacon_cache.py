@@ -0,0 +1,105 @@
+"""
+In-process cache of resolved beacons for the ingest hot path.
+
+Entries are dropped when the beacon, its asset or its OwnTracks messages are
+saved in this process (see `signals`), and expire after `ttl` seconds to
+bound staleness for changes made by other processes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import Exists, OuterRef
+
+import attrs
+
+from . import constants, models
+
+
+@attrs.frozen
+class ResolvedBeacon:
+    beacon: models.Beacon
+    asset_id: object
+    mission_id: object
+    backend: object
+    has_pending_messages: bool = False
+
+
+class BeaconCache:
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires_at, value = self._entries[key]
+            except KeyError:
+                return None
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *, beacon_id=None, asset_id=None):
+        with self._lock:
+            for key, (_, value) in list(self._entries.items()):
+                if (
+                    value.beacon.pk == beacon_id
+                    or value.asset_id == asset_id
+                ):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+beacon_cache = BeaconCache()
+
+
+def owntracks_beacons():
+    return (
+        models.Beacon.objects.active()
+        .filter(backend_class_path=constants.BeaconBackendClass.OWNTRACKS)
+        .select_related("asset")
+        .annotate(
+            has_pending_messages=Exists(
+                models.OwnTracksMessage.objects.filter(
+                    beacon=OuterRef("pk"), sent_at__isnull=True
+                )
+            )
+        )
+    )
+
+
+async def aresolve_owntracks_beacon(identifier):
+    """
+    Return the `ResolvedBeacon` for an active OwnTracks beacon, or `None`.
+    """
+    key = (constants.BeaconBackendClass.OWNTRACKS, identifier)
+    resolved = beacon_cache.get(key)
+    if resolved is None:
+        beacon = await owntracks_beacons().filter(pk=identifier).afirst()
+        if beacon is None:
+            return None
+        resolved = ResolvedBeacon(
+            beacon=beacon,
+            asset_id=beacon.asset_id,
+            mission_id=beacon.asset.mission_id,
+            backend=beacon.backend,
+            has_pending_messages=beacon.has_pending_messages,
+        )
+        beacon_cache.set(key, resolved)
+    return resolved
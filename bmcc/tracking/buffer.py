@@ -0,0 +1,236 @@
+"""
+Write-behind buffer for ingested pings.
+
+When ``TRACKING_PING_BUFFER_ENABLED`` is set, backends queue validated pings
+in the shared cache instead of inserting them one request at a time, and the
+``flush_ping_buffer`` task bulk inserts them every
+``TRACKING_PING_BUFFER_FLUSH_INTERVAL`` or as soon as
+``TRACKING_PING_BUFFER_FLUSH_SIZE`` pings are waiting.
+
+Pings are stored under consecutive sequence numbers allocated with an atomic
+``incr``, so the configured cache must support atomic increments across
+processes (e.g. Redis or Memcached).
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DataError, IntegrityError, connection, transaction
+
+from asgiref.sync import sync_to_async
+
+from . import models
+from .changes import missions_changed, pings_stored
+from .latest import update_latest_pings
+from .payloads import insert_ping_payloads
+
+
+logger = logging.getLogger(__name__)
+
+
+def insert_pings(pings):
+    """
+    Insert pings along with their payloads and update the latest ping rows.
+    Pings already stored for the same beacon and time are skipped.
+    """
+    with transaction.atomic():
+        models.Ping.objects.bulk_create(pings, ignore_conflicts=True)
+        insert_ping_payloads(pings)
+        update_latest_pings(pings)
+    pings_stored(pings)
+
+
+def insert_checked_pings(pings):
+    """
+    Like `insert_pings`, but raise constraint violations (including deferred
+    foreign keys, e.g. to a deleted beacon) right away rather than on commit.
+    """
+    with transaction.atomic():
+        insert_pings(pings)
+        connection.check_constraints()
+
+
+class PingBuffer:
+    lock_timeout = 60
+
+    def __init__(self, cache=None, prefix="tracking:ping-buffer"):
+        self.cache = cache or caches[settings.TRACKING_PING_BUFFER_CACHE]
+        self.head_key = f"{prefix}:head"
+        self.tail_key = f"{prefix}:tail"
+        self.gap_key = f"{prefix}:gap"
+        self.lock_key = f"{prefix}:lock"
+        self.item_key_prefix = f"{prefix}:item"
+
+    def item_key(self, seq):
+        return f"{self.item_key_prefix}:{seq}"
+
+    def push(self, pings):
+        """
+        Queue pings and return the number of pings waiting to be flushed.
+        """
+        if not pings:
+            return 0
+        # Only keep the field values, not cached related objects
+        pings = [
+            models.Ping(
+                **{
+                    f.attname: getattr(ping, f.attname)
+                    for f in models.Ping._meta.concrete_fields
+                },
+                raw_payload=ping.raw_payload,
+            )
+            for ping in pings
+        ]
+        self.cache.add(self.head_key, 0, timeout=None)
+        head = self.cache.incr(self.head_key, len(pings))
+        first = head - len(pings) + 1
+        self.cache.set_many(
+            {self.item_key(first + i): ping for i, ping in enumerate(pings)},
+            timeout=None,
+        )
+        return head - self.cache.get(self.tail_key, 0)
+
+    def pending_range(self):
+        values = self.cache.get_many([self.head_key, self.tail_key])
+        return range(
+            values.get(self.tail_key, 0) + 1, values.get(self.head_key, 0) + 1
+        )
+
+    def pending(self, **filters):
+        """
+        Return the queued pings matching the given field values, oldest
+        first.
+        """
+        items = self.cache.get_many(
+            [self.item_key(seq) for seq in self.pending_range()]
+        )
+        return [
+            ping
+            for ping in items.values()
+            if all(getattr(ping, k) == v for k, v in filters.items())
+        ]
+
+    def insert(self, pings):
+        """
+        Insert pings, one at a time if the batch is rejected, and return the
+        ones stored. Rejected pings are logged and dropped, so that a single
+        invalid row does not hold up the whole buffer.
+        """
+        try:
+            insert_checked_pings(pings)
+            return pings
+        except (DataError, IntegrityError):
+            logger.warning(
+                "Buffered pings rejected, inserting them one at a time",
+                exc_info=True,
+            )
+
+        inserted = []
+        for ping in pings:
+            try:
+                insert_checked_pings([ping])
+            except (DataError, IntegrityError):
+                logger.exception(
+                    "Buffered ping rejected, dropping",
+                    extra={
+                        "ping_id": str(ping.pk),
+                        "beacon_id": str(ping.beacon_id),
+                        "reported_at": ping.reported_at.isoformat(),
+                    },
+                )
+            else:
+                inserted.append(ping)
+        return inserted
+
+    def flush(self, max_rows=None):
+        """
+        Bulk insert queued pings, oldest first, and return how many were
+        taken off the queue (including dropped ones).
+
+        Connection errors propagate and leave the pings queued for the next
+        flush.
+        """
+        if not self.cache.add(self.lock_key, 1, timeout=self.lock_timeout):
+            # Another worker is flushing
+            return 0
+
+        try:
+            seqs = self.pending_range()
+            if max_rows is not None:
+                seqs = seqs[:max_rows]
+            items = self.cache.get_many([self.item_key(s) for s in seqs])
+
+            pings = []
+            flushed = seqs.start - 1
+            for seq in seqs:
+                try:
+                    pings.append(items[self.item_key(seq)])
+                except KeyError:
+                    if self.cache.get(self.gap_key) != seq:
+                        # The writer may not have stored it yet; retry on the
+                        # next flush before giving up on it.
+                        self.cache.set(self.gap_key, seq, timeout=None)
+                        break
+                    logger.error(
+                        "Buffered ping lost, skipping",
+                        extra={"sequence": seq},
+                    )
+                flushed = seq
+
+            self.insert(pings)
+
+            self.cache.set(self.tail_key, flushed, timeout=None)
+            self.cache.delete_many(
+                [self.item_key(s) for s in range(seqs.start, flushed + 1)]
+            )
+            return len(pings)
+        finally:
+            self.cache.delete(self.lock_key)
+
+
+def store_pings(pings):
+    """
+    Persist pings, or queue them in the write-behind buffer when enabled.
+    """
+    if not settings.TRACKING_PING_BUFFER_ENABLED:
+        insert_pings(pings)
+        return
+
+    size = settings.TRACKING_PING_BUFFER_FLUSH_SIZE
+    waiting = PingBuffer().push(pings)
+    # Buffered pings are shown alongside stored ones, so renderings cached
+    # for the current mission versions are stale already.
+    missions_changed({p.mission_id for p in pings})
+    if waiting >= size and waiting - len(pings) < size:
+        from .tasks import flush_ping_buffer
+
+        transaction.on_commit(flush_ping_buffer.delay)
+
+
+async def astore_pings(pings):
+    """
+    Async variant of `store_pings`.
+    """
+    await sync_to_async(store_pings)(pings)
+
+
+def buffered_pings(**filters):
+    """
+    Pings accepted but not yet flushed to the database, oldest first.
+    """
+    if not settings.TRACKING_PING_BUFFER_ENABLED:
+        return []
+    return PingBuffer().pending(**filters)
+
+
+def latest_pings(pings, by):
+    """
+    Newest of the given pings for each distinct value of the ``by`` field.
+    """
+    latest = {}
+    for ping in pings:
+        key = getattr(ping, by)
+        if key not in latest or ping.reported_at > latest[key].reported_at:
+            latest[key] = ping
+    return latest
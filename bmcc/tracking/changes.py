@@ -0,0 +1,110 @@
+"""
+Cache invalidation and latest ping maintenance after tracking data changes.
+
+Changes are collected for the current transaction and handled together once
+it commits (right away outside of a transaction). Mission versions key caches
+of data read from the database: bumping them before the commit (e.g. within
+``ATOMIC_REQUESTS``) would let a concurrent request cache data read before
+the commit under the new version, and serve it until the entry expires.
+
+Pings have no deletion signals, so that deleting a mission, asset or beacon
+removes its pings with a single statement rather than loading each of them.
+Whatever deletes pings calls `delete_ping_side_rows` first instead.
+"""
+
+import threading
+
+from django.db import transaction
+
+import attrs
+
+from . import models
+from .latest import refresh_latest_pings
+from .versions import bump_mission_versions
+
+
+@attrs.define
+class Changes:
+    mission_ids: set = attrs.field(factory=set)
+    # Beacons and assets whose latest ping rows are recomputed
+    latest_beacon_ids: set = attrs.field(factory=set)
+    latest_asset_ids: set = attrs.field(factory=set)
+    # Beacons whose KML fragment is dropped
+    fragment_beacon_ids: set = attrs.field(factory=set)
+    # Stored pings, see `bmcc.tracking.fragments.invalidate_fragments`
+    pings: list = attrs.field(factory=list)
+
+
+_local = threading.local()
+
+
+def pending_changes():
+    """
+    Changes to handle once the current transaction commits.
+    """
+    changes = getattr(_local, "changes", None)
+    if changes is None:
+        changes = _local.changes = Changes()
+    # Registered on every call: the callbacks of a rolled back savepoint are
+    # discarded, while the changes collected so far are kept. The first
+    # callback to run handles all of them, the others find nothing left.
+    transaction.on_commit(apply_changes)
+    return changes
+
+
+def apply_changes():
+    from .fragments import delete_fragments, invalidate_fragments
+
+    changes = getattr(_local, "changes", None)
+    _local.changes = None
+    if changes is None:
+        return
+    refresh_latest_pings(
+        beacon_ids=changes.latest_beacon_ids,
+        asset_ids=changes.latest_asset_ids,
+    )
+    invalidate_fragments(changes.pings)
+    delete_fragments(changes.fragment_beacon_ids)
+    bump_mission_versions(changes.mission_ids)
+
+
+def missions_changed(mission_ids):
+    pending_changes().mission_ids.update(mission_ids)
+
+
+def beacons_changed(beacon_ids, mission_ids):
+    changes = pending_changes()
+    changes.fragment_beacon_ids.update(beacon_ids)
+    changes.mission_ids.update(mission_ids)
+
+
+def pings_stored(pings):
+    changes = pending_changes()
+    changes.pings.extend(pings)
+    changes.mission_ids.update(p.mission_id for p in pings)
+
+
+def delete_ping_side_rows(pings):
+    """
+    Prepare the deletion of the pings of the given queryset: delete their
+    payloads and the latest ping rows pointing to them, which no foreign key
+    constraint cascades to, and refresh what derives from them on commit.
+    """
+    affected = list(
+        pings.order_by()
+        .values_list("beacon_id", "asset_id", "mission_id")
+        .distinct()
+    )
+    if not affected:
+        return
+    ids = pings.order_by().values("pk")
+    models.PingPayload.objects.filter(ping__in=ids).delete()
+    models.BeaconLatestPing.objects.filter(ping__in=ids).delete()
+    models.AssetLatestPing.objects.filter(ping__in=ids).delete()
+
+    changes = pending_changes()
+    for beacon_id, asset_id, mission_id in affected:
+        changes.latest_beacon_ids.add(beacon_id)
+        changes.latest_asset_ids.add(asset_id)
+        changes.fragment_beacon_ids.add(beacon_id)
+        changes.mission_ids.add(mission_id)
@@ -0,0 +1,338 @@
+"""
+Cache of the serialized KML placemarks of each beacon, see
+`Beacon.kml_placemarks`.
+
+Long tracks are drawn as time segments of ``TRACK_SEGMENT_SIZE`` points. Once
+complete, a segment is serialized and cached on its own, along with every
+``OVERVIEW_STRIDE``-th of its points for the overview of the track. The points
+after the last complete segment make up the tail entry of the beacon, which
+also keeps the time up to which the stored pings of the mission were read
+(``until``). When pings reported later are stored, only their points are
+appended to the tail, and segments are sealed as they fill up: every entry
+stays bounded, however long the track.
+
+Pings reported at or before ``until`` (late fixes) would be missed this way, so
+storing or deleting them drops the tail of their beacon instead (see
+`invalidate_fragments`), and with it the segments, keyed by its generation.
+
+Buffered pings are never part of an entry, as they are read once stored;
+they are added on top of it when rendering.
+"""
+
+import heapq
+import itertools
+import logging
+import uuid
+from datetime import UTC, datetime
+
+from django.core.cache import cache
+
+import attrs
+from lxml import etree
+
+from bmcc.utils.kml import TRACK_SEGMENT_SIZE, TrackPoint, track_overview
+from bmcc.utils.kml import E as kml
+
+from . import models
+from .archive import archived_pings
+from .buffer import buffered_pings
+from .tracks import TRACK_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+# Bounds the staleness of an entry rendered while a late ping is stored
+FRAGMENT_TIMEOUT = 600
+# Segments are only read through the tail of their generation, this only
+# bounds how long the segments of a dropped tail are kept.
+SEGMENT_TIMEOUT = 24 * 3600
+# Points of each segment kept for the overview of the track
+OVERVIEW_STRIDE = 10
+# Segments fetched from the cache at once while streaming
+SEGMENT_BATCH_SIZE = 10
+
+
+@attrs.frozen
+class TrackFragment:
+    """
+    Tail of the track of a beacon: its points after the ``sealed`` complete
+    segments, starting with the last point of the last of them.
+    """
+
+    until: datetime
+    generation: str
+    sealed: int
+    points: tuple
+
+
+def fragment_key(beacon_id):
+    return f"tracking:beacon-kml:{beacon_id}"
+
+
+def segment_key(beacon_id, generation, index):
+    return f"tracking:beacon-kml:{beacon_id}:{generation}:{index}"
+
+
+def overview_key(beacon_id, generation, index):
+    return f"{segment_key(beacon_id, generation, index)}:overview"
+
+
+def get_fragments(beacon_ids):
+    keys = {fragment_key(pk): pk for pk in beacon_ids}
+    return {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+
+
+def delete_fragments(beacon_ids):
+    cache.delete_many([fragment_key(pk) for pk in set(beacon_ids)])
+
+
+def invalidate_fragments(pings):
+    """
+    Drop the entries of the beacons of the given (stored or deleted) pings,
+    when they would not be picked up by extending them.
+    """
+    earliest = {}
+    for ping in pings:
+        current = earliest.get(ping.beacon_id)
+        if current is None or ping.reported_at < current:
+            earliest[ping.beacon_id] = ping.reported_at
+    delete_fragments(
+        beacon_id
+        for beacon_id, fragment in get_fragments(earliest).items()
+        if earliest[beacon_id] <= fragment.until
+    )
+
+
+def by_beacon(pings):
+    grouped = {}
+    for ping in pings:
+        grouped.setdefault(ping.beacon_id, []).append(ping)
+    return grouped
+
+
+class TrackBuilder:
+    """
+    Extend the cached tail of the track of a beacon, sealing and caching its
+    segments as they fill up.
+    """
+
+    def __init__(self, beacon, fragment=None):
+        self.beacon = beacon
+        self.fragment = fragment
+        if fragment is None:
+            self.until = datetime.min.replace(tzinfo=UTC)
+            self.generation = uuid.uuid4().hex
+            self.sealed = 0
+            self.points = []
+        else:
+            self.until = fragment.until
+            self.generation = fragment.generation
+            self.sealed = fragment.sealed
+            self.points = list(fragment.points)
+        self.extended = False
+
+    def append(self, point):
+        self.points.append(point)
+        self.extended = True
+        # The first point of the tail belongs to the last sealed segment
+        offset = 1 if self.sealed else 0
+        if len(self.points) <= offset + TRACK_SEGMENT_SIZE:
+            return
+        segment = self.points[: offset + TRACK_SEGMENT_SIZE]
+        key_args = (self.beacon.pk, self.generation, self.sealed)
+        cache.set_many(
+            {
+                segment_key(*key_args): etree.tostring(
+                    self.beacon.kml_segment(segment)
+                ),
+                overview_key(*key_args): tuple(
+                    segment[offset::OVERVIEW_STRIDE]
+                ),
+            },
+            timeout=SEGMENT_TIMEOUT,
+        )
+        self.points = self.points[offset + TRACK_SEGMENT_SIZE - 1 :]
+        self.sealed += 1
+
+    def build(self, until):
+        """
+        Return the extended tail, read up to ``until``, or ``None`` if the
+        cached one is still up to date.
+        """
+        if self.fragment is not None and not self.extended:
+            if self.fragment.until >= until:
+                return None
+        last = self.points[-1].reported_at if self.points else until
+        return TrackFragment(
+            # Also moves the scan start forward for beacons without new
+            # pings, so that idle beacons do not widen every scan.
+            until=max(until, last),
+            generation=self.generation,
+            sealed=self.sealed,
+            points=tuple(self.points),
+        )
+
+
+def refresh_fragments(mission_id, beacons):
+    """
+    Bring the cached entries of the given beacons of the mission up to date
+    with its stored pings, and return the number of pings read.
+
+    Stored pings are read in a single scan of the mission index, starting
+    after the oldest ``until`` of the cached entries, or from the start when
+    any entry is missing.
+    """
+    fragments = get_fragments(b.pk for b in beacons)
+    builders = {b.pk: TrackBuilder(b, fragments.get(b.pk)) for b in beacons}
+    pings = models.Ping.objects.filter(
+        mission_id=mission_id, beacon_id__in=builders
+    )
+    archived = []
+    until = datetime.min.replace(tzinfo=UTC)
+    if len(fragments) == len(beacons) and fragments:
+        until = min(f.until for f in fragments.values())
+        pings = pings.filter(reported_at__gt=until)
+    else:
+        archived = sorted(
+            (
+                p
+                for p in archived_pings(mission_id)
+                if p.beacon_id in builders and p.beacon_id not in fragments
+            ),
+            key=lambda p: p.reported_at,
+        )
+    stored = pings.order_by("reported_at").only(*TRACK_FIELDS).iterator()
+
+    count = 0
+    for ping in heapq.merge(archived, stored, key=lambda p: p.reported_at):
+        count += 1
+        until = max(until, ping.reported_at)
+        builder = builders[ping.beacon_id]
+        if ping.reported_at > builder.until:
+            builder.append(TrackPoint.from_ping(ping))
+
+    updated = {}
+    for beacon_id, builder in builders.items():
+        fragment = builder.build(until)
+        if fragment is not None:
+            updated[fragment_key(beacon_id)] = fragment
+    cache.set_many(updated, timeout=FRAGMENT_TIMEOUT)
+    return count
+
+
+def read_fragment(mission_id, beacon):
+    """
+    Return the cached tail of the beacon and the overview points of its
+    segments, refreshing them once if any is missing, or ``None`` if the
+    cache does not keep them.
+    """
+    for _ in range(2):
+        fragment = get_fragments([beacon.pk]).get(beacon.pk)
+        if fragment is not None:
+            keys = [
+                overview_key(beacon.pk, fragment.generation, index)
+                for index in range(fragment.sealed)
+            ]
+            overviews = cache.get_many(keys)
+            if len(overviews) == len(keys):
+                return fragment, [p for key in keys for p in overviews[key]]
+            delete_fragments([beacon.pk])
+        refresh_fragments(mission_id, [beacon])
+    return None
+
+
+def sealed_segments(beacon, fragment):
+    """
+    Serialized sealed segments of the track, fetched a few at a time.
+    """
+    for start in range(0, fragment.sealed, SEGMENT_BATCH_SIZE):
+        keys = [
+            segment_key(beacon.pk, fragment.generation, index)
+            for index in range(
+                start, min(start + SEGMENT_BATCH_SIZE, fragment.sealed)
+            )
+        ]
+        segments = cache.get_many(keys)
+        for key in keys:
+            if key in segments:
+                yield segments[key]
+            else:
+                logger.warning(
+                    "KML segment evicted while streaming, skipping",
+                    extra={"beacon_id": str(beacon.pk), "key": key},
+                )
+
+
+def uncached_placemarks(mission_id, beacon, buffered):
+    archived = archived_pings(mission_id, beacon_id=beacon.pk)
+    pings = heapq.merge(
+        sorted(archived, key=lambda p: p.reported_at),
+        beacon.pings.order_by("reported_at").only(*TRACK_FIELDS).iterator(),
+        buffered,
+        key=lambda p: p.reported_at,
+    )
+    points = [TrackPoint.from_ping(p) for p in pings]
+    if points:
+        yield from beacon.kml_placemarks(points)
+
+
+def beacon_placemarks(mission_id, beacon, buffered):
+    """
+    Placemarks of the beacon from its cached entries, with the given
+    buffered pings (oldest first) on top.
+    """
+    cached = read_fragment(mission_id, beacon)
+    if cached is None:
+        yield from uncached_placemarks(mission_id, beacon, buffered)
+        return
+    fragment, overview = cached
+    points = list(fragment.points)
+    if buffered:
+        points.extend(TrackPoint.from_ping(p) for p in buffered)
+        points.sort(key=lambda p: p.reported_at)
+    if not points:
+        return
+    if not fragment.sealed:
+        yield from beacon.kml_placemarks(points)
+        return
+
+    overview.extend(points[1::OVERVIEW_STRIDE])
+    if overview[-1] is not points[-1]:
+        overview.append(points[-1])
+    yield beacon.kml_position(points[-1])
+    yield beacon.kml_track(track_overview(overview))
+    # The tail starts with the last point of the last sealed segment, so
+    # that the detailed track is continuous.
+    tail_segments = (
+        beacon.kml_segment(points[start - 1 : start + TRACK_SEGMENT_SIZE])
+        for start in range(1, len(points), TRACK_SEGMENT_SIZE)
+    )
+    yield (
+        kml.Folder(kml.name("Detail")),
+        itertools.chain(sealed_segments(beacon, fragment), tail_segments),
+    )
+
+
+def beacon_fragments(mission_id, beacons):
+    """
+    Folders of the given beacons of the mission, by beacon id, as features
+    for `bmcc.utils.kml.stream_document`.
+
+    Cached entries are read, and missing ones refreshed, only as each folder
+    is written. Up to date entries are expected to have been refreshed with
+    `refresh_fragments` beforehand.
+    """
+    buffered = by_beacon(buffered_pings(mission_id=mission_id))
+    return {
+        beacon.pk: (
+            beacon.kml_folder(),
+            beacon_placemarks(
+                mission_id,
+                beacon,
+                sorted(
+                    buffered.get(beacon.pk, []), key=lambda p: p.reported_at
+                ),
+            ),
+        )
+        for beacon in beacons
+    }
@@ -0,0 +1,124 @@
+"""
+Maintenance of the `BeaconLatestPing` and `AssetLatestPing` tables.
+
+Each ingest path calls `update_latest_pings` with the pings it just inserted;
+a single statement per table picks the newest of them for each beacon/asset
+and upserts it, leaving rows that already point to a newer ping alone. Pings
+are selected back from ``tracking_ping`` rather than taken from the caller,
+so fixes skipped by ``ON CONFLICT DO NOTHING`` are never referenced.
+
+Upserts run in the transaction of the caller, at the ``REPEATABLE READ``
+isolation level: once a concurrent ingest updated the same rows, updating
+them fails for the rest of the transaction. Such upserts are rolled back to a
+savepoint and run again after the commit, in transactions of their own.
+"""
+
+import functools
+import logging
+
+from django.db import OperationalError, connection, transaction
+
+from psycopg2 import errors
+
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+
+LATEST_PING_TABLES = [
+    (models.BeaconLatestPing, "beacon_id"),
+    (models.AssetLatestPing, "asset_id"),
+]
+
+UPSERT_LATEST_PINGS = """
+INSERT INTO {table} ({key}, ping_id, reported_at)
+SELECT DISTINCT ON ({key}) {key}, id, reported_at
+FROM {ping_table}
+WHERE {condition} = ANY(%s::uuid[])
+ORDER BY {key}, reported_at DESC, created_at DESC
+ON CONFLICT ({key}) DO UPDATE
+SET ping_id = EXCLUDED.ping_id, reported_at = EXCLUDED.reported_at
+WHERE EXCLUDED.reported_at > {table}.reported_at
+"""
+
+# Attempts of an upsert deferred after the commit
+LATEST_PING_RETRIES = 3
+
+
+def _upsert(model, key, condition, ids):
+    sql = UPSERT_LATEST_PINGS.format(
+        table=model._meta.db_table,
+        key=key,
+        ping_table=models.Ping._meta.db_table,
+        condition=condition,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [[str(pk) for pk in ids]])
+
+
+def is_serialization_failure(error):
+    return isinstance(error.__cause__, errors.SerializationFailure)
+
+
+def _retry_upserts(upserts):
+    for upsert in upserts:
+        for attempt in range(1, LATEST_PING_RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    _upsert(*upsert)
+            except OperationalError as e:
+                if not is_serialization_failure(e):
+                    raise
+                if attempt == LATEST_PING_RETRIES:
+                    # The pings are stored, only the latest ping rows lag
+                    # behind until the next ping of the beacon or asset.
+                    logger.exception(
+                        "Could not update latest pings",
+                        extra={"table": upsert[0]._meta.db_table},
+                    )
+            else:
+                break
+
+
+def _upsert_all(upserts):
+    failed = []
+    for upsert in upserts:
+        try:
+            with transaction.atomic():
+                _upsert(*upsert)
+        except OperationalError as e:
+            if not is_serialization_failure(e):
+                raise
+            failed.append(upsert)
+    if failed:
+        transaction.on_commit(functools.partial(_retry_upserts, failed))
+
+
+def update_latest_pings(pings):
+    """
+    Point the latest ping rows to any of the given (stored) pings that are
+    newer than the current ones.
+    """
+    ids = {ping.pk for ping in pings}
+    if not ids:
+        return
+    _upsert_all([(model, key, "id", ids) for model, key in LATEST_PING_TABLES])
+
+
+def refresh_latest_pings(*, beacon_ids=(), asset_ids=()):
+    """
+    Recompute the latest ping rows of the given beacons and assets from all
+    of their stored pings, e.g. after pings were deleted.
+    """
+    _upsert_all(
+        [
+            (model, key, key, ids)
+            for (model, key), ids in zip(
+                LATEST_PING_TABLES,
+                [set(beacon_ids), set(asset_ids)],
+                strict=True,
+            )
+            if ids
+        ]
+    )
@@ -0,0 +1,31 @@
+from django.utils import timezone
+
+import djclick as click
+
+from bmcc.missions.models import Mission
+from bmcc.tracking.archive import archive_mission
+
+
+@click.command()
+@click.argument("mission_id", type=click.UUID)
+@click.option(
+    "--force",
+    is_flag=True,
+    help="Archive even if the mission window has not ended yet.",
+)
+def command(mission_id, force):
+    """
+    Move the pings of a finished mission to cold storage.
+    """
+    mission = Mission.objects.get(pk=mission_id)
+    window = mission.mission_window
+    finished = window and window.upper and window.upper < timezone.now()
+    if not finished and not force:
+        raise click.ClickException(
+            f"The window of {mission} has not ended, use --force to archive "
+            "it anyway."
+        )
+    ping_archive = archive_mission(mission)
+    click.echo(
+        f"Archived {ping_archive.ping_count} pings to {ping_archive.file.name}"
+    )
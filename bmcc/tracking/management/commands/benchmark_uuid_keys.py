@@ -0,0 +1,59 @@
+import time
+import uuid
+
+from django.db import connection
+
+import djclick as click
+
+from bmcc.fields import uuid7
+
+
+GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+
+
+def benchmark(cursor, name, generator, rows, batch_size):
+    table = f"benchmark_uuid_keys_{name}"
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {table} ("
+        "id uuid PRIMARY KEY, created_at timestamptz DEFAULT now())"
+    )
+    batches = [
+        [str(generator()) for _ in range(min(batch_size, rows - offset))]
+        for offset in range(0, rows, batch_size)
+    ]
+    start = time.perf_counter()
+    for ids in batches:
+        cursor.execute(
+            f"INSERT INTO {table} (id) SELECT unnest(%s::uuid[])", [ids]
+        )
+    elapsed = time.perf_counter() - start
+    cursor.execute(
+        "SELECT pg_relation_size(%s), pg_relation_size(%s)",
+        [f"{table}_pkey", table],
+    )
+    index_size, table_size = cursor.fetchone()
+    cursor.execute(f"DROP TABLE {table}")
+    return elapsed, index_size, table_size
+
+
+@click.command()
+@click.option("--rows", type=int, default=1_000_000, show_default=True)
+@click.option("--batch-size", type=int, default=500, show_default=True)
+def command(rows, batch_size):
+    """
+    Compare insert rate and primary key index size of random (v4) and
+    time-ordered (v7) UUID keys, on temporary tables.
+    """
+    with connection.cursor() as cursor:
+        for name, generator in GENERATORS.items():
+            elapsed, index_size, table_size = benchmark(
+                cursor, name, generator, rows, batch_size
+            )
+            click.echo(
+                f"{name}: {rows / elapsed:,.0f} rows/s, "
+                f"index {index_size / 2**20:,.1f} MiB "
+                f"({index_size / table_size:.0%} of table)"
+            )
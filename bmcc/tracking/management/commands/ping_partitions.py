@@ -0,0 +1,25 @@
+import djclick as click
+
+from bmcc.tracking.tasks import maintain_ping_partitions
+
+
+@click.command()
+@click.option(
+    "--ahead",
+    type=int,
+    help="Months to create partitions for after the current one.",
+)
+@click.option(
+    "--retention",
+    type=int,
+    help="Detach partitions older than this many months.",
+)
+def command(ahead, retention):
+    """
+    Create upcoming monthly ping partitions and detach old ones.
+    """
+    result = maintain_ping_partitions(ahead=ahead, retention=retention)
+    for name in result["created"]:
+        click.echo(f"Created {name}")
+    for name in result["detached"]:
+        click.echo(f"Detached {name}")
@@ -4,3 +4,11 @@ from django.db import models
 class BeaconQuerySet(models.QuerySet):
     def active(self):
         return self.filter(active=True)
+
+
+class PingQuerySet(models.QuerySet):
+    def delete(self):
+        from .changes import delete_ping_side_rows
+
+        delete_ping_side_rows(self)
+        return super().delete()
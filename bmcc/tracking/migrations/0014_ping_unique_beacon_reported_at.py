@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+# Keep the first stored ping for every (beacon, reported_at) pair
+DELETE_DUPLICATE_PINGS = """
+DELETE FROM tracking_ping AS duplicate
+USING tracking_ping AS original
+WHERE duplicate.beacon_id = original.beacon_id
+  AND duplicate.reported_at = original.reported_at
+  AND (duplicate.created_at, duplicate.id)
+      > (original.created_at, original.id)
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0013_owntracksmessage"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DELETE_DUPLICATE_PINGS,
+            migrations.RunSQL.noop,
+            elidable=True,
+        ),
+        migrations.RemoveIndex(
+            model_name="ping",
+            name="tracking_pi_beacon__9ee39d_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="ping",
+            constraint=models.UniqueConstraint(
+                fields=("beacon", "reported_at"),
+                name="tracking_ping_unique_beacon_reported_at",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+import bmcc.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0014_ping_unique_beacon_reported_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpotFeedCursor",
+            fields=[
+                (
+                    "id",
+                    bmcc.fields.UUIDAutoField(
+                        primary_key=True, serialize=False
+                    ),
+                ),
+                ("feed_id", models.CharField(max_length=64, unique=True)),
+                (
+                    "last_message_at",
+                    models.DateTimeField(blank=True, null=True),
+                ),
+                (
+                    "last_polled_at",
+                    models.DateTimeField(blank=True, null=True),
+                ),
+            ],
+            options={
+                "ordering": ["feed_id"],
+            },
+        ),
+    ]
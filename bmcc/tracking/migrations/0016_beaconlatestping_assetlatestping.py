@@ -0,0 +1,77 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POPULATE_LATEST_PINGS = """
+INSERT INTO tracking_beaconlatestping (beacon_id, ping_id, reported_at)
+SELECT DISTINCT ON (beacon_id) beacon_id, id, reported_at
+FROM tracking_ping
+ORDER BY beacon_id, reported_at DESC, created_at DESC;
+
+INSERT INTO tracking_assetlatestping (asset_id, ping_id, reported_at)
+SELECT DISTINCT ON (asset_id) asset_id, id, reported_at
+FROM tracking_ping
+ORDER BY asset_id, reported_at DESC, created_at DESC;
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0015_spotfeedcursor"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BeaconLatestPing",
+            fields=[
+                (
+                    "beacon",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="latest_ping",
+                        serialize=False,
+                        to="tracking.beacon",
+                    ),
+                ),
+                ("reported_at", models.DateTimeField()),
+                (
+                    "ping",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="tracking.ping",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AssetLatestPing",
+            fields=[
+                (
+                    "asset",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="latest_ping",
+                        serialize=False,
+                        to="tracking.asset",
+                    ),
+                ),
+                ("reported_at", models.DateTimeField()),
+                (
+                    "ping",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="tracking.ping",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            POPULATE_LATEST_PINGS,
+            migrations.RunSQL.noop,
+            elidable=True,
+        ),
+    ]
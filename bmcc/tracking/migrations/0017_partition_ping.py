@@ -0,0 +1,145 @@
+from datetime import UTC, datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Monthly partitions created from the oldest ping up to this many months
+# ahead; later ones are created by `bmcc.tracking.partitions`, which is not
+# imported here so that this migration does not change along with it.
+PARTITIONS_AHEAD = 3
+
+PING_CONSTRAINTS = """
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_unique_beacon_reported_at
+    UNIQUE (beacon_id, reported_at);
+
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_mission_id_fk
+    FOREIGN KEY (mission_id) REFERENCES missions_mission (id)
+    DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_asset_id_fk
+    FOREIGN KEY (asset_id) REFERENCES tracking_asset (id)
+    DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_beacon_id_fk
+    FOREIGN KEY (beacon_id) REFERENCES tracking_beacon (id)
+    DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_prediction_id_fk
+    FOREIGN KEY (prediction_id) REFERENCES predictions_prediction (id)
+    DEFERRABLE INITIALLY DEFERRED;
+
+-- beacon_id is covered by the unique constraint
+CREATE INDEX tracking_ping_mission_id_idx ON tracking_ping (mission_id);
+CREATE INDEX tracking_ping_asset_id_idx ON tracking_ping (asset_id);
+CREATE INDEX tracking_ping_prediction_id_idx
+    ON tracking_ping (prediction_id);
+CREATE INDEX tracking_ping_position_gist
+    ON tracking_ping USING GIST (position);
+"""
+
+# Recreate the ping table partitioned by reported_at. All rows are copied to
+# the default partition first, and then moved to their month by
+# `create_partitions`.
+PARTITION_PING_TABLE = (
+    """
+CREATE TABLE tracking_ping_partitioned (
+    LIKE tracking_ping INCLUDING DEFAULTS INCLUDING STORAGE
+) PARTITION BY RANGE (reported_at);
+CREATE TABLE tracking_ping_default
+    PARTITION OF tracking_ping_partitioned DEFAULT;
+INSERT INTO tracking_ping_partitioned SELECT * FROM tracking_ping;
+DROP TABLE tracking_ping;
+ALTER TABLE tracking_ping_partitioned RENAME TO tracking_ping;
+
+ALTER TABLE tracking_ping
+    ADD CONSTRAINT tracking_ping_pkey PRIMARY KEY (id, reported_at);
+"""
+    + PING_CONSTRAINTS
+)
+
+# Back to a plain table, dropping the partitions (detached ones are left)
+UNPARTITION_PING_TABLE = (
+    """
+CREATE TABLE tracking_ping_plain (
+    LIKE tracking_ping INCLUDING DEFAULTS INCLUDING STORAGE
+);
+INSERT INTO tracking_ping_plain SELECT * FROM tracking_ping;
+DROP TABLE tracking_ping;
+ALTER TABLE tracking_ping_plain RENAME TO tracking_ping;
+
+ALTER TABLE tracking_ping ADD CONSTRAINT tracking_ping_pkey PRIMARY KEY (id);
+"""
+    + PING_CONSTRAINTS
+)
+
+
+def month_start(index):
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=UTC)
+
+
+def create_partitions(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(reported_at) FROM tracking_ping")
+        (oldest,) = cursor.fetchone()
+        now = datetime.now(UTC)
+        oldest = (oldest or now).astimezone(UTC)
+        first = oldest.year * 12 + oldest.month - 1
+        last = now.year * 12 + now.month - 1 + PARTITIONS_AHEAD
+        for index in range(first, last + 1):
+            start, end = month_start(index), month_start(index + 1)
+            name = f"tracking_ping_p{start:%Y%m}"
+            cursor.execute(
+                f"CREATE TABLE {name} (LIKE tracking_ping "
+                "INCLUDING DEFAULTS INCLUDING STORAGE)"
+            )
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM tracking_ping_default
+                    WHERE reported_at >= %s AND reported_at < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                """,
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE tracking_ping ATTACH PARTITION {name} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0016_beaconlatestping_assetlatestping"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="beaconlatestping",
+            name="ping",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="tracking.ping",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="assetlatestping",
+            name="ping",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="tracking.ping",
+            ),
+        ),
+        migrations.RunSQL(PARTITION_PING_TABLE, UNPARTITION_PING_TABLE),
+        # Partitions are dropped along with the table when reversing
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+    ]
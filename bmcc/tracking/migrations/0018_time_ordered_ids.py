@@ -0,0 +1,32 @@
+from django.db import migrations
+
+import bmcc.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0017_partition_ping"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="owntracksmessage",
+            name="id",
+            field=bmcc.fields.UUIDAutoField(
+                default=bmcc.fields.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ping",
+            name="id",
+            field=bmcc.fields.UUIDAutoField(
+                default=bmcc.fields.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0018_time_ordered_ids"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ping",
+            index=models.Index(
+                fields=["asset", "reported_at", "created_at"],
+                include=["beacon", "altitude", "position"],
+                name="tracking_ping_asset_time_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ping",
+            index=models.Index(
+                fields=["mission", "reported_at", "created_at"],
+                name="tracking_ping_mission_time_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ping",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                autosummarize=True,
+                fields=["reported_at"],
+                name="tracking_ping_reported_brin",
+            ),
+        ),
+        # Superseded by the composite indexes above
+        migrations.AlterField(
+            model_name="ping",
+            name="asset",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pings",
+                to="tracking.asset",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ping",
+            name="mission",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pings",
+                to="missions.mission",
+            ),
+        ),
+    ]
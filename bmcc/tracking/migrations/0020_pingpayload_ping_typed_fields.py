@@ -0,0 +1,77 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def json_number(key, low=None, high=None):
+    value = f"(metadata ->> '{key}')::numeric"
+    condition = f"jsonb_typeof(metadata -> '{key}') = 'number'"
+    if low is not None:
+        condition += f" AND {value} BETWEEN {low} AND {high}"
+    return f"CASE WHEN {condition} THEN {value} END"
+
+
+MOVE_PAYLOADS = f"""
+INSERT INTO tracking_pingpayload (ping_id, data)
+SELECT id, metadata FROM tracking_ping WHERE metadata <> '{{}}'::jsonb;
+
+UPDATE tracking_ping SET
+    battery = round(coalesce(
+        {json_number("battery", 0, 32767)},
+        {json_number("batt", 0, 32767)}
+    )),
+    satellites = round({json_number("satellites", 0, 32767)}),
+    rssi = round({json_number("rssi", -32768, 32767)}),
+    snr = {json_number("snr")}
+WHERE metadata ?| array['battery', 'batt', 'satellites', 'rssi', 'snr'];
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0019_ping_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ping",
+            name="battery",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ping",
+            name="satellites",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ping",
+            name="rssi",
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="ping",
+            name="snr",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="PingPayload",
+            fields=[
+                (
+                    "ping",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="payload",
+                        serialize=False,
+                        to="tracking.ping",
+                    ),
+                ),
+                ("data", models.JSONField()),
+            ],
+        ),
+        migrations.RunSQL(MOVE_PAYLOADS, migrations.RunSQL.noop),
+        migrations.RemoveField(
+            model_name="ping",
+            name="metadata",
+        ),
+    ]
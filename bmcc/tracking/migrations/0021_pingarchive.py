@@ -0,0 +1,39 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+import bmcc.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("missions", "0009_alter_launchsite_location"),
+        ("tracking", "0020_pingpayload_ping_typed_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PingArchive",
+            fields=[
+                (
+                    "id",
+                    bmcc.fields.UUIDAutoField(
+                        primary_key=True, serialize=False
+                    ),
+                ),
+                ("file", models.FileField(upload_to="ping-archives/")),
+                ("ping_count", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "mission",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ping_archive",
+                        to="missions.mission",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
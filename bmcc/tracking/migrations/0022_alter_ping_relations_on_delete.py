@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0021_pingarchive"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pingpayload",
+            name="ping",
+            field=models.OneToOneField(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                primary_key=True,
+                related_name="payload",
+                serialize=False,
+                to="tracking.ping",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="beaconlatestping",
+            name="ping",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="tracking.ping",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="assetlatestping",
+            name="ping",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="tracking.ping",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracking", "0022_alter_ping_relations_on_delete"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="ping",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ping",
+            index=models.Index(
+                fields=["mission", "created_at", "id"],
+                name="tracking_ping_mission_ingest_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import BrinIndex
+from django.utils import timezone
 
 from bmcc.fields import (
     ConfigurableInstanceField,
@@ -39,14 +41,6 @@ class Asset(models.Model):
     def __str__(self):
         return self.callsign or self.name
 
-    def __kml__(self):
-        from bmcc.utils.kml import E as kml
-
-        return kml.Folder(
-            kml.name(self.name),
-            *(b.__kml__() for b in self.beacons.all()),
-        )
-
     def clean(self):
         super().clean()
         if self.launch_site and self.launch_site.mission_id != self.mission_id:
@@ -84,119 +78,190 @@ class Beacon(models.Model):
     def __str__(self):
         return self.identifier
 
-    def __kml__(self):
+    @property
+    def kml_id(self):
+        return f"beacon-{self.pk}"
+
+    def kml_folder(self):
+        """
+        Empty folder of the beacon, its placemarks (see `kml_placemarks`) are
+        appended to it.
+        """
         from bmcc.utils.kml import E as kml
 
-        folder = kml.Folder(
+        return kml.Folder(
             kml.name(self.identifier),
+            id=self.kml_id,
         )
 
-        pings = list(self.pings.order_by("reported_at").all())
-        if not pings:
-            return folder
-
-        last_ping = pings[-1]
-        coords = [p.position.kml(p.altitude) for p in pings]
+    def _kml_appearance(self, last_point):
+        """
+        Return whether the track is drawn at its altitude, its style, the
+        position icon, and whether the track is visible by default.
+        """
+        from bmcc.utils.kml import E as kml
 
-        visible = False
-        if (
-            self.asset.asset_type == constants.AssetType.BALLOON
-            and last_ping.altitude is not None
-        ):
-            point = kml.Point(
-                kml.altitudeMode("absolute"),
-                kml.coordinates(last_ping.position.kml(last_ping.altitude)),
-            )
-            icon = (
-                "http://maps.google.com/mapfiles/kml/paddle/purple-blank.png"
-            )
-            track = kml.LineString(
-                kml.extrude("1"),
-                kml.tessellate("1"),
-                kml.altitudeMode("absolute"),
-                kml.coordinates(" ".join(coords)),
-            )
+        if self.asset.asset_type != constants.AssetType.BALLOON:
             style = kml.Style(
                 kml.LineStyle(
-                    kml.color("7f800080"),
+                    kml.color("ff000000"),
                     kml.width("4"),
                 ),
-                kml.PolyStyle(
-                    kml.color("7f800080"),
-                ),
-            )
-            visible = True
-        else:
-            point = kml.Point(
-                kml.altitudeMode("clampToGround"),
-                kml.coordinates(last_ping.position.kml()),
             )
-            track = kml.LineString(
-                kml.altitudeMode("clampToGround"),
-                kml.coordinates(" ".join(coords)),
-            )
-            if self.asset.asset_type == constants.AssetType.BALLOON:
-                style = kml.Style(
-                    kml.LineStyle(
-                        kml.color("7f800080"),
-                        kml.width("4"),
-                    ),
-                    kml.PolyStyle(
-                        kml.color("7f800080"),
-                    ),
-                )
-                icon = "http://maps.google.com/mapfiles/kml/paddle/purple-blank.png"
-                visible = True
-            else:
-                style = kml.Style(
-                    kml.LineStyle(
-                        kml.color("ff000000"),
-                        kml.width("4"),
-                    ),
-                )
-                icon = "http://maps.google.com/mapfiles/kml/shapes/woman.png"
-
-        folder.append(
-            kml.Placemark(
-                kml.name(self.identifier),
-                point,
-                kml.Style(
-                    kml.IconStyle(
-                        kml.Icon(
-                            kml.href(icon),
-                        )
+            icon = "http://maps.google.com/mapfiles/kml/shapes/woman.png"
+            return False, style, icon, False
+
+        style = kml.Style(
+            kml.LineStyle(
+                kml.color("7f800080"),
+                kml.width("4"),
+            ),
+            kml.PolyStyle(
+                kml.color("7f800080"),
+            ),
+        )
+        icon = "http://maps.google.com/mapfiles/kml/paddle/purple-blank.png"
+        return last_point.altitude is not None, style, icon, True
+
+    def _kml_position_coordinates(self, point, absolute):
+        from bmcc.utils.kml import E as kml
+
+        if absolute:
+            return kml.coordinates(point.coordinates)
+        return kml.coordinates(point.ground_coordinates)
+
+    def kml_placemarks(self, points):
+        """
+        Current position and track placemarks for the given track points,
+        oldest first. Long tracks are drawn as an overview, and time segments
+        only drawn in full detail once zoomed in on them.
+        """
+        from bmcc.utils.kml import TRACK_SEGMENT_SIZE, split_track
+        from bmcc.utils.kml import E as kml
+
+        if len(points) <= TRACK_SEGMENT_SIZE:
+            return [self.kml_position(points[-1]), self.kml_track(points)]
+
+        overview, segments = split_track(points)
+        return [
+            self.kml_position(points[-1]),
+            self.kml_track(overview),
+            kml.Folder(
+                kml.name("Detail"),
+                *(self.kml_segment(segment) for segment in segments),
+            ),
+        ]
+
+    def kml_position(self, point):
+        """
+        Current position placemark, at the given track point.
+        """
+        from bmcc.utils.kml import E as kml
+
+        absolute, _, icon, _ = self._kml_appearance(point)
+        return kml.Placemark(
+            kml.name(self.identifier),
+            kml.Point(
+                kml.altitudeMode("absolute" if absolute else "clampToGround"),
+                self._kml_position_coordinates(point, absolute),
+                id=f"{self.kml_id}-position",
+            ),
+            kml.Style(
+                kml.IconStyle(
+                    kml.Icon(
+                        kml.href(icon),
                     )
-                ),
+                )
             ),
         )
-        folder.append(
-            kml.Placemark(
-                kml.name("Track"),
-                track,
-                style,
-                kml.visibility("1" if visible else "0"),
+
+    def kml_segment(self, points):
+        """
+        Full-detail time segment of a long track, only drawn once zoomed in
+        on its region.
+        """
+        from bmcc.utils.kml import region
+        from bmcc.utils.kml import E as kml
+
+        return kml.Document(
+            kml.name(
+                f"{points[0].reported_at:%Y-%m-%d %H:%M} - "
+                f"{points[-1].reported_at:%H:%M}"
             ),
+            region(points),
+            self.kml_track(points),
         )
 
-        return folder
+    def kml_track(self, points, **attrs):
+        """
+        Track placemark through the given track points, oldest first. Extra
+        attributes (e.g. an ``id``) are set on the placemark.
+        """
+        from bmcc.utils.kml import E as kml
+
+        absolute, style, _, visible = self._kml_appearance(points[-1])
+        if absolute:
+            geometry = kml.LineString(
+                kml.extrude("1"),
+                kml.tessellate("1"),
+                kml.altitudeMode("absolute"),
+            )
+        else:
+            geometry = kml.LineString(kml.altitudeMode("clampToGround"))
+        geometry.append(
+            kml.coordinates(" ".join(p.coordinates for p in points))
+        )
+        return kml.Placemark(
+            kml.name("Track"),
+            geometry,
+            style,
+            kml.visibility("1" if visible else "0"),
+            **attrs,
+        )
+
+    def kml_position_change(self, point):
+        """
+        Point moving the position placemark of the beacon to the given track
+        point, for a KML ``<Change>``.
+        """
+        from bmcc.utils.kml import E as kml
+
+        absolute, _, _, _ = self._kml_appearance(point)
+        return kml.Point(
+            self._kml_position_coordinates(point, absolute),
+            targetId=f"{self.kml_id}-position",
+        )
 
     def last_ping(self):
-        return self.pings.order_by("-reported_at").first()
+        latest = (
+            BeaconLatestPing.objects.filter(beacon=self)
+            .select_related("ping")
+            .first()
+        )
+        return latest.ping if latest else None
 
 
 class Ping(models.Model):
-    id = UUIDAutoField()
+    # The table is partitioned by month of `reported_at`, with a primary key
+    # of (id, reported_at) in the database; see `bmcc.tracking.partitions`.
+    # Being partitioned, pings cannot be the target of foreign key
+    # constraints: rows referencing them are deleted along with them by
+    # `bmcc.tracking.changes.delete_ping_side_rows`.
+    id = UUIDAutoField(time_ordered=True)
     # Denormalized mission and asset fields to retain original assignment
     # when a tracker is reused on a different asset/mission
+    # Indexed by the composite indexes in Meta
     mission = models.ForeignKey(
         Mission,
         related_name="pings",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     asset = models.ForeignKey(
         Asset,
         related_name="pings",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     beacon = models.ForeignKey(
         Beacon,
@@ -209,7 +274,12 @@ class Ping(models.Model):
     accuracy = models.IntegerField(null=True, blank=True)
     speed = models.IntegerField(null=True, blank=True)
     course = models.FloatField(null=True, blank=True)
-    metadata = models.JSONField(default=dict, blank=True)
+    # Battery level (%)
+    battery = models.PositiveSmallIntegerField(null=True, blank=True)
+    satellites = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Signal strength (dBm) and signal to noise ratio (dB) of radio links
+    rssi = models.SmallIntegerField(null=True, blank=True)
+    snr = models.FloatField(null=True, blank=True)
     prediction = models.ForeignKey(
         "predictions.Prediction",
         related_name="pings",
@@ -218,17 +288,63 @@ class Ping(models.Model):
         blank=True,
     )
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Time of ingest rather than of insert, kept by buffered pings; with the
+    # id, it orders pings for the incremental KML updates.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = managers.PingQuerySet.as_manager()
 
     class Meta:
         ordering = ["-reported_at", "-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["beacon", "reported_at"],
+                name="tracking_ping_unique_beacon_reported_at",
+            ),
+        ]
         indexes = [
-            models.Index(fields=["beacon", "reported_at"]),
+            # Asset tracks and charts, filtered on a reported_at range; the
+            # included columns allow index-only scans of the track.
+            models.Index(
+                fields=["asset", "reported_at", "created_at"],
+                include=["beacon", "altitude", "position"],
+                name="tracking_ping_asset_time_idx",
+            ),
+            # Mission-wide listings and KML, in default ordering
+            models.Index(
+                fields=["mission", "reported_at", "created_at"],
+                name="tracking_ping_mission_time_idx",
+            ),
+            # Pings ingested after a cursor, for incremental KML updates
+            models.Index(
+                fields=["mission", "created_at", "id"],
+                name="tracking_ping_mission_ingest_idx",
+            ),
+            # Time range scans across beacons (e.g. archiving); pings are
+            # inserted roughly in reported_at order, so a BRIN index stays
+            # tiny.
+            BrinIndex(
+                fields=["reported_at"],
+                autosummarize=True,
+                name="tracking_ping_reported_brin",
+            ),
         ]
 
     def __str__(self):
         return f"{self.beacon} @ {self.reported_at.isoformat()}"
 
+    @property
+    def raw_payload(self):
+        """
+        Vendor message the ping is parsed from, set on ingest to be stored
+        as a `PingPayload` alongside the ping.
+        """
+        return getattr(self, "_raw_payload", None)
+
+    @raw_payload.setter
+    def raw_payload(self, value):
+        self._raw_payload = value
+
     @property
     def longitude(self):
         return self.position.longitude
@@ -244,9 +360,108 @@ class Ping(models.Model):
             self.mission = self.asset.mission
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        from .changes import delete_ping_side_rows
+
+        delete_ping_side_rows(
+            Ping.objects.filter(pk=self.pk, reported_at=self.reported_at)
+        )
+        return super().delete(*args, **kwargs)
+
+
+class PingPayload(models.Model):
+    """
+    Raw vendor message of a ping, kept out of the ping table so that track
+    scans read narrow rows. Large payloads are compressed by TOAST.
+    """
+
+    # No foreign key constraint, see `Ping`
+    ping = models.OneToOneField(
+        Ping,
+        primary_key=True,
+        related_name="payload",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    data = models.JSONField()
+
+    def __str__(self):
+        return f"Payload of {self.ping_id}"
+
+
+class BeaconLatestPing(models.Model):
+    """
+    Most recent ping of each beacon, maintained on ingest by
+    `bmcc.tracking.latest.update_latest_pings`.
+    """
+
+    beacon = models.OneToOneField(
+        Beacon,
+        primary_key=True,
+        related_name="latest_ping",
+        on_delete=models.CASCADE,
+    )
+    # No foreign key constraint, see `Ping`
+    ping = models.ForeignKey(
+        Ping,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    reported_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.beacon} @ {self.reported_at.isoformat()}"
+
+
+class AssetLatestPing(models.Model):
+    """
+    Most recent ping of each asset, across all of its beacons, maintained on
+    ingest by `bmcc.tracking.latest.update_latest_pings`.
+    """
+
+    asset = models.OneToOneField(
+        Asset,
+        primary_key=True,
+        related_name="latest_ping",
+        on_delete=models.CASCADE,
+    )
+    # No foreign key constraint, see `Ping`
+    ping = models.ForeignKey(
+        Ping,
+        related_name="+",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+    )
+    reported_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.asset} @ {self.reported_at.isoformat()}"
+
+
+class PingArchive(models.Model):
+    """
+    Pings of a finished mission, moved out of the ping table to a compressed
+    file on the default storage (see `bmcc.tracking.archive`).
+    """
 
-class OwnTracksMessage(models.Model):
     id = UUIDAutoField()
+    mission = models.OneToOneField(
+        Mission, related_name="ping_archive", on_delete=models.CASCADE
+    )
+    file = models.FileField(upload_to="ping-archives/")
+    ping_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Pings of {self.mission}"
+
+
+class OwnTracksMessage(models.Model):
+    id = UUIDAutoField(time_ordered=True)
     beacon = models.ForeignKey(
         Beacon, related_name="owntracks_messages", on_delete=models.CASCADE
     )
@@ -259,3 +474,21 @@ class OwnTracksMessage(models.Model):
 
     def __str__(self):
         return f"Message for {self.beacon} ({'sent' if self.sent_at else 'pending'})"
+
+
+class SpotFeedCursor(models.Model):
+    """
+    High-water mark of a SPOT feed, so that each poll only requests the
+    messages reported since the last one we stored.
+    """
+
+    id = UUIDAutoField()
+    feed_id = models.CharField(max_length=64, unique=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_polled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["feed_id"]
+
+    def __str__(self):
+        return self.feed_id
@@ -0,0 +1,158 @@
+"""
+Monthly range partitions of the ``tracking_ping`` table.
+
+Pings are partitioned on ``reported_at`` into one table per calendar month
+(UTC), named ``tracking_ping_pYYYYMM``, plus a default partition catching
+fixes outside of the created months (e.g. from trackers with a broken
+clock). Queries filtering on ``reported_at`` only scan the matching months,
+and vacuum and index maintenance work on small tables.
+
+Partitions are created ahead of time by `ensure_partitions`, from the
+``ping_partitions`` management command and the daily
+``maintain_ping_partitions`` task. Creating a month first moves any of its
+rows out of the default partition, so the default partition never blocks
+new partitions. Old months can be detached with `detach_partitions`; the
+detached tables are kept, so that they can be inspected or dropped. The
+``maintain_ping_partitions`` task archives the missions with pings in them
+first (see `bmcc.tracking.archive`).
+
+The primary key of the partitioned table is ``(id, reported_at)``, as
+PostgreSQL requires the partition key in every unique constraint, so rows
+can no longer be referenced by foreign key constraints. Django still treats
+``id`` as the primary key.
+"""
+
+import re
+from datetime import UTC, date, datetime
+
+from django.db import connection as default_connection, transaction
+
+
+PING_TABLE = "tracking_ping"
+DEFAULT_PARTITION = f"{PING_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{PING_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PING_TABLE}_p{month:%Y%m}"
+
+
+def partition_bounds(month):
+    start, end = month, add_months(month, 1)
+    return (
+        datetime(start.year, start.month, 1, tzinfo=UTC),
+        datetime(end.year, end.month, 1, tzinfo=UTC),
+    )
+
+
+def list_partitions(connection=None):
+    """
+    Return the first day of the month of every attached monthly partition,
+    oldest first.
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PING_TABLE],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def create_partition(month, connection=None):
+    """
+    Create and attach the partition of the given month, moving its rows out
+    of the default partition.
+    """
+    connection = connection or default_connection
+    name = partition_name(month)
+    start, end = partition_bounds(month)
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {name} "
+                f"(LIKE {PING_TABLE} INCLUDING DEFAULTS INCLUDING STORAGE)"
+            )
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE reported_at >= %s AND reported_at < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                """,
+                [start, end],
+            )
+            cursor.execute(
+                f"ALTER TABLE {PING_TABLE} ATTACH PARTITION {name} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+    return name
+
+
+def ensure_partitions(*, ahead=3, start=None, now=None, connection=None):
+    """
+    Create the missing monthly partitions from ``start`` (default: the
+    current month) up to ``ahead`` months after the current one, and return
+    their names.
+    """
+    now = now or datetime.now(UTC)
+    current = month_start(now)
+    month = month_start(start) if start else current
+    existing = set(list_partitions(connection))
+    created = []
+    while month <= add_months(current, ahead):
+        if month not in existing:
+            created.append(create_partition(month, connection))
+        month = add_months(month, 1)
+    return created
+
+
+def partitions_before(before, connection=None):
+    """
+    Return the first day of the month of every attached monthly partition
+    ending on or before ``before``, oldest first.
+    """
+    return [
+        month
+        for month in list_partitions(connection)
+        if partition_bounds(month)[1] <= before
+    ]
+
+
+def detach_partitions(before, connection=None):
+    """
+    Detach the monthly partitions ending on or before ``before``, and return
+    their names. The detached tables are left in place.
+    """
+    connection = connection or default_connection
+    detached = []
+    for month in partitions_before(before, connection):
+        name = partition_name(month)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {PING_TABLE} DETACH PARTITION {name}")
+        detached.append(name)
+    return detached
@@ -0,0 +1,45 @@
+"""
+Storage of the raw vendor messages pings are parsed from, see `PingPayload`.
+"""
+
+import json
+
+from django.db import connection
+
+from . import models
+
+
+INSERT_PING_PAYLOADS = """
+INSERT INTO {payload_table} (ping_id, data)
+SELECT payload.ping_id, payload.data
+FROM unnest(%s::uuid[], %s::timestamptz[], %s::jsonb[])
+    AS payload (ping_id, reported_at, data)
+WHERE EXISTS (
+    SELECT 1 FROM {ping_table} ping
+    WHERE ping.id = payload.ping_id AND ping.reported_at = payload.reported_at
+)
+ON CONFLICT (ping_id) DO NOTHING
+"""
+
+
+def insert_ping_payloads(pings):
+    """
+    Store the raw payloads of the given pings. Pings which were not stored
+    (e.g. duplicates skipped by ``ON CONFLICT DO NOTHING``) are ignored.
+    """
+    pings = [p for p in pings if p.raw_payload is not None]
+    if not pings:
+        return
+    sql = INSERT_PING_PAYLOADS.format(
+        payload_table=models.PingPayload._meta.db_table,
+        ping_table=models.Ping._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [
+                [str(p.pk) for p in pings],
+                [p.reported_at for p in pings],
+                [json.dumps(p.raw_payload) for p in pings],
+            ],
+        )
@@ -0,0 +1,136 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from bmcc.missions.models import LaunchSite, Mission
+from bmcc.predictions.models import Prediction
+
+from . import models
+from .archive import archive_name_key
+from .beacon_cache import beacon_cache
+from .changes import (
+    beacons_changed,
+    delete_ping_side_rows,
+    missions_changed,
+    pings_stored,
+)
+from .latest import update_latest_pings
+from .payloads import insert_ping_payloads
+
+
+@receiver(post_save, sender=models.Beacon)
+@receiver(post_delete, sender=models.Beacon)
+def invalidate_cached_beacon(sender, instance, **kwargs):
+    beacon_cache.invalidate(beacon_id=instance.pk)
+    beacons_changed(
+        [instance.pk],
+        models.Asset.objects.filter(pk=instance.asset_id).values_list(
+            "mission_id", flat=True
+        ),
+    )
+
+
+@receiver(post_save, sender=models.Asset)
+@receiver(post_delete, sender=models.Asset)
+def invalidate_cached_asset_beacons(sender, instance, **kwargs):
+    beacon_cache.invalidate(asset_id=instance.pk)
+    beacons_changed(
+        models.Beacon.objects.filter(asset=instance).values_list(
+            "pk", flat=True
+        ),
+        [instance.mission_id],
+    )
+
+
+@receiver(post_save, sender=models.OwnTracksMessage)
+def invalidate_beacon_pending_messages(sender, instance, **kwargs):
+    beacon_cache.invalidate(beacon_id=instance.beacon_id)
+
+
+@receiver(post_save, sender=models.Ping)
+def update_latest_ping(sender, instance, **kwargs):
+    update_latest_pings([instance])
+
+
+@receiver(post_save, sender=models.Ping)
+def store_ping_payload(sender, instance, created, **kwargs):
+    if created:
+        insert_ping_payloads([instance])
+
+
+@receiver(post_save, sender=models.Ping)
+def invalidate_ping_caches(sender, instance, **kwargs):
+    pings_stored([instance])
+
+
+# Pings are deleted along with their mission, asset or beacon without being
+# loaded, see `bmcc.tracking.changes`.
+@receiver(pre_delete, sender=Mission)
+def delete_mission_ping_side_rows(sender, instance, **kwargs):
+    delete_ping_side_rows(models.Ping.objects.filter(mission=instance))
+
+
+@receiver(pre_delete, sender=models.Asset)
+def delete_asset_ping_side_rows(sender, instance, **kwargs):
+    delete_ping_side_rows(models.Ping.objects.filter(asset=instance))
+
+
+@receiver(pre_delete, sender=models.Beacon)
+def delete_beacon_ping_side_rows(sender, instance, **kwargs):
+    delete_ping_side_rows(models.Ping.objects.filter(beacon=instance))
+
+
+@receiver(post_save, sender=models.PingArchive)
+@receiver(post_delete, sender=models.PingArchive)
+def invalidate_ping_archive_name(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: cache.delete(archive_name_key(instance.mission_id))
+    )
+    missions_changed([instance.mission_id])
+
+
+# Mission, launch site and prediction changes are rendered in the mission KML
+# too, so they bump the same version as the tracking data.
+@receiver(post_save, sender=Mission)
+def bump_mission_version(sender, instance, **kwargs):
+    missions_changed([instance.pk])
+
+
+@receiver(post_save, sender=LaunchSite)
+@receiver(post_delete, sender=LaunchSite)
+def bump_launch_site_mission_version(sender, instance, **kwargs):
+    missions_changed([instance.mission_id])
+
+
+@receiver(m2m_changed, sender=LaunchSite.prediction_history.through)
+def bump_prediction_history_mission_version(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            missions_changed([instance.mission_id])
+        return
+    # Changed from the prediction side, launch sites can only be looked up
+    # before a clear
+    if action in ("post_add", "post_remove"):
+        launch_sites = LaunchSite.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        launch_sites = LaunchSite.objects.filter(prediction_history=instance)
+    else:
+        return
+    missions_changed(launch_sites.values_list("mission_id", flat=True))
+
+
+@receiver(post_save, sender=Prediction)
+def bump_prediction_mission_versions(sender, instance, **kwargs):
+    missions_changed(
+        LaunchSite.objects.filter(prediction_history=instance).values_list(
+            "mission_id", flat=True
+        )
+    )
@@ -1,18 +1,212 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
 from celery import shared_task
 
-from . import constants, models
-from .backends.spot import SpotBackend
+from bmcc.missions.models import Mission
+
+from . import archive, constants, models, partitions
+from .backends.spot import (
+    SPOT_MAX_CONCURRENT_FEEDS,
+    SpotBackend,
+    parse_spot_date,
+)
+from .buffer import PingBuffer, insert_pings
+from .changes import delete_ping_side_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+def store_spot_messages(cursor, backends, messages):
+    by_device = SpotBackend.index_messages(messages)
+    pings = []
+    for backend in backends:
+        pings.extend(backend.build_pings(by_device.get(backend.device_id, [])))
+
+    with transaction.atomic():
+        # Messages at the cursor are requested again on the next poll; the
+        # unique constraint on (beacon, reported_at) turns already stored
+        # ones into no-ops.
+        insert_pings(pings)
+
+        if messages:
+            cursor.last_message_at = max(
+                parse_spot_date(m["dateTime"]) for m in messages
+            )
+        cursor.last_polled_at = timezone.now()
+        cursor.save(update_fields=["last_message_at", "last_polled_at"])
 
 
 @shared_task
 def update_beacon_locations_spot():
-    beacons = models.Beacon.objects.active().filter(
-        backend_class_path=constants.BeaconBackendClass.SPOT
+    beacons = (
+        models.Beacon.objects.active()
+        .filter(backend_class_path=constants.BeaconBackendClass.SPOT)
+        .select_related("asset")
     )
 
-    if not beacons:
+    backends_by_feed = {}
+    for beacon in beacons:
+        backend = beacon.backend
+        feed_id = backend.get_feed_id()
+        if not feed_id:
+            logger.warning(
+                "SPOT beacon has no feed configured",
+                extra={"beacon_id": str(beacon.pk)},
+            )
+            continue
+        backends_by_feed.setdefault(feed_id, []).append(backend)
+
+    if not backends_by_feed:
         return
 
-    messages = SpotBackend.retrieve_messages()
-    for beacon in beacons.iterator():
-        beacon.backend.process_messages(messages)
+    cursors = {
+        feed_id: models.SpotFeedCursor.objects.get_or_create(
+            feed_id=feed_id
+        )[0]
+        for feed_id in backends_by_feed
+    }
+
+    # Feeds are fetched concurrently over a shared connection pool and
+    # stored as soon as they arrive, so a slow or failing feed does not
+    # hold up the others. Database access stays on this thread.
+    session = SpotBackend.create_session()
+    max_workers = min(len(cursors), SPOT_MAX_CONCURRENT_FEEDS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                SpotBackend.retrieve_messages,
+                cursor.last_message_at,
+                feed_id=feed_id,
+                session=session,
+            ): feed_id
+            for feed_id, cursor in cursors.items()
+        }
+        for future in as_completed(futures):
+            feed_id = futures[future]
+            try:
+                messages = future.result()
+            except Exception:
+                logger.exception(
+                    "Could not retrieve SPOT feed",
+                    extra={"feed_id": feed_id},
+                )
+                continue
+            try:
+                store_spot_messages(
+                    cursors[feed_id], backends_by_feed[feed_id], messages
+                )
+            except Exception:
+                # Rolled back along with the cursor, so the messages are
+                # fetched again on the next poll.
+                logger.exception(
+                    "Could not store SPOT feed",
+                    extra={"feed_id": feed_id},
+                )
+
+
+@shared_task
+def flush_ping_buffer():
+    if not settings.TRACKING_PING_BUFFER_ENABLED:
+        return 0
+
+    buffer = PingBuffer()
+    size = settings.TRACKING_PING_BUFFER_FLUSH_SIZE
+    flushed = 0
+    while True:
+        count = buffer.flush(max_rows=size)
+        flushed += count
+        if count < size:
+            return flushed
+
+
+def archive_partition_pings(pings):
+    """
+    Archive the missions with pings in the given queryset, unless they are
+    archived already. Missions are archived as a whole, including their
+    pings in newer partitions.
+    """
+    missions = Mission.objects.filter(
+        pk__in=pings.order_by().values("mission_id"),
+        ping_archive__isnull=True,
+    )
+    for mission in missions:
+        archive.archive_mission(mission)
+        logger.info(
+            "Archived mission pings before detaching their partitions",
+            extra={"mission_id": str(mission.pk)},
+        )
+
+
+@shared_task
+def maintain_ping_partitions(ahead=None, retention=None):
+    """
+    Create upcoming monthly ping partitions and detach the ones past the
+    retention period, after archiving the missions with pings in them.
+    """
+    if ahead is None:
+        ahead = settings.TRACKING_PING_PARTITIONS_AHEAD
+    if retention is None:
+        retention = settings.TRACKING_PING_PARTITIONS_RETENTION
+
+    created = partitions.ensure_partitions(ahead=ahead)
+    detached = []
+    if retention is not None:
+        current = partitions.month_start(timezone.now())
+        before = partitions.partition_bounds(
+            partitions.add_months(current, -retention)
+        )[0]
+        months = partitions.partitions_before(before)
+        if months:
+            pings = models.Ping.objects.filter(
+                reported_at__gte=partitions.partition_bounds(months[0])[0],
+                reported_at__lt=partitions.partition_bounds(months[-1])[1],
+            )
+            archive_partition_pings(pings)
+            with transaction.atomic():
+                # Pings stored since are dropped (e.g. late pings of archived
+                # missions), they are only kept in the detached tables.
+                delete_ping_side_rows(pings)
+                detached = partitions.detach_partitions(before)
+    for name in created:
+        logger.info("Created ping partition", extra={"partition": name})
+    for name in detached:
+        logger.info("Detached ping partition", extra={"partition": name})
+    return {"created": created, "detached": detached}
+
+
+@shared_task
+def archive_mission_pings(mission_id):
+    mission = Mission.objects.get(pk=mission_id)
+    ping_archive = archive.archive_mission(mission)
+    logger.info(
+        "Archived mission pings",
+        extra={
+            "mission_id": str(mission_id),
+            "count": ping_archive.ping_count,
+        },
+    )
+    return ping_archive.ping_count
+
+
+@shared_task
+def archive_finished_missions():
+    """
+    Archive the pings of missions whose window ended more than
+    ``TRACKING_PING_ARCHIVE_AFTER`` ago.
+    """
+    if settings.TRACKING_PING_ARCHIVE_AFTER is None:
+        return
+    missions = Mission.objects.filter(
+        mission_window__endswith__lt=(
+            timezone.now() - settings.TRACKING_PING_ARCHIVE_AFTER
+        ),
+        ping_archive__isnull=True,
+    ).values_list("pk", flat=True)
+    for mission_id in missions:
+        archive_mission_pings.delay(str(mission_id))
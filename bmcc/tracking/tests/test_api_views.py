@@ -0,0 +1,210 @@
+import json
+
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.models import Asset, Beacon, Ping, PingPayload
+
+
+@pytest.fixture()
+def api_beacon():
+    mission = Mission.objects.create(name="API Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    return Beacon.objects.create(
+        asset=asset,
+        identifier="api-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+
+
+@pytest.mark.django_db()
+def test_batch_ping_stores_fixes_with_per_item_status(client, api_beacon):
+    now = timezone.now().replace(microsecond=0)
+    Ping.objects.create(
+        beacon=api_beacon,
+        reported_at=now,
+        position=Coordinate(1.0, 2.0),
+    )
+
+    response = client.post(
+        reverse("tracking:api_batch_ping", kwargs={"pk": api_beacon.pk}),
+        data=json.dumps(
+            {
+                "pings": [
+                    {
+                        "latitude": 42.1,
+                        "longitude": -71.1,
+                        "altitude": 1200,
+                        "reported_at": (
+                            now - timezone.timedelta(minutes=2)
+                        ).isoformat(),
+                    },
+                    {
+                        "latitude": "42.2",
+                        "longitude": "-71.2",
+                        "reported_at": (
+                            now - timezone.timedelta(minutes=1)
+                        ).timestamp(),
+                    },
+                    {
+                        "latitude": 42.3,
+                        "longitude": -71.3,
+                        "reported_at": now.isoformat(),
+                    },
+                    {"latitude": 42.4, "reported_at": now.isoformat()},
+                ]
+            }
+        ),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 2
+    assert [r["status"] for r in data["results"]] == [
+        "created",
+        "created",
+        "duplicate",
+        "invalid",
+    ]
+    pings = list(api_beacon.pings.order_by("reported_at"))
+    assert len(pings) == 3
+    assert pings[0].altitude == 1200
+    assert pings[0].mission_id == api_beacon.asset.mission_id
+    assert pings[1].position.latitude == pytest.approx(42.2)
+
+
+@pytest.mark.django_db()
+def test_batch_ping_rejects_non_list_payload(client, api_beacon):
+    response = client.post(
+        reverse("tracking:api_batch_ping", kwargs={"pk": api_beacon.pk}),
+        data=json.dumps({"latitude": 1, "longitude": 2}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert not api_beacon.pings.exists()
+
+
+@pytest.mark.django_db()
+def test_single_ping_is_normalised_by_backend(client, api_beacon):
+    response = client.post(
+        f"/tracking/api/{api_beacon.pk}/ping/",
+        data=json.dumps(
+            {"latitude": "42.5", "longitude": 288.5, "altitude": 1200.6}
+        ),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    ping = api_beacon.pings.get()
+    assert str(ping.pk) == response.json()["ping"]
+    assert ping.position.longitude == pytest.approx(-71.5)
+    assert ping.altitude == 1201
+    assert ping.asset_id == api_beacon.asset_id
+
+
+@pytest.mark.django_db()
+def test_single_ping_rejects_missing_coordinates(client, api_beacon):
+    response = client.post(
+        f"/tracking/api/{api_beacon.pk}/ping/",
+        data=json.dumps({"latitude": 42.5}),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    assert not api_beacon.pings.exists()
+
+
+@pytest.mark.django_db()
+def test_ping_payload_is_stored_aside_with_typed_fields(client, api_beacon):
+    payload = {
+        "latitude": 42.1,
+        "longitude": -71.1,
+        "battery": 87,
+        "satellites": 9,
+        "rssi": -97,
+        "snr": 7.5,
+        "reported_at": "2025-06-01T12:00:00Z",
+        "firmware": "1.2.3",
+    }
+
+    # The resent duplicate must not leave a second payload behind
+    for status in [201, 200]:
+        response = client.post(
+            reverse("tracking:api_batch_ping", kwargs={"pk": api_beacon.pk}),
+            data=json.dumps([payload]),
+            content_type="application/json",
+        )
+        assert response.status_code == status
+
+    ping = api_beacon.pings.get()
+    assert (ping.battery, ping.satellites, ping.rssi, ping.snr) == (
+        87,
+        9,
+        -97,
+        7.5,
+    )
+    assert PingPayload.objects.get().ping_id == ping.pk
+    assert ping.payload.data == payload
+
+
+@pytest.mark.django_db()
+def test_batch_ping_rejects_overflowing_values_per_item(client, api_beacon):
+    items = [
+        '{"latitude": 42.1, "longitude": -71.1, "altitude": 1e999,'
+        ' "reported_at": "2025-06-01T12:00:00Z"}',
+        '{"latitude": 42.2, "longitude": -71.2, "reported_at": 1e20}',
+        '{"latitude": NaN, "longitude": -71.3,'
+        ' "reported_at": "2025-06-01T12:02:00Z"}',
+        '{"latitude": 42.4, "longitude": -71.4,'
+        ' "reported_at": "2025-06-01T12:03:00Z"}',
+    ]
+
+    response = client.post(
+        reverse("tracking:api_batch_ping", kwargs={"pk": api_beacon.pk}),
+        data=f"[{', '.join(items)}]",
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    assert [r["status"] for r in response.json()["results"]] == [
+        "invalid",
+        "invalid",
+        "invalid",
+        "created",
+    ]
+    assert api_beacon.pings.count() == 1
+
+
+@pytest.mark.django_db()
+def test_batch_ping_rejects_out_of_range_fields_per_item(client, api_beacon):
+    item = {"latitude": 42.1, "longitude": -71.1}
+    response = client.post(
+        reverse("tracking:api_batch_ping", kwargs={"pk": api_beacon.pk}),
+        data=json.dumps(
+            [
+                {**item, "battery": -1, "reported_at": "2025-06-01T12:00Z"},
+                {**item, "rssi": 40000, "reported_at": "2025-06-01T12:01Z"},
+                {**item, "satellites": 9, "reported_at": "2025-06-01T12:02Z"},
+            ]
+        ),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    assert [r["status"] for r in response.json()["results"]] == [
+        "invalid",
+        "invalid",
+        "created",
+    ]
+    assert api_beacon.pings.get().satellites == 9
@@ -0,0 +1,139 @@
+import re
+from datetime import timedelta
+
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants, tasks
+from bmcc.tracking.archive import ArchiveCache
+from bmcc.tracking.models import (
+    Asset,
+    AssetLatestPing,
+    Beacon,
+    Ping,
+    PingArchive,
+)
+
+
+# Link to the live updates of a full KML document, with a cursor of its own
+LIVE_UPDATES = re.compile(rb"<NetworkLink>.*?</NetworkLink>", re.DOTALL)
+
+
+@pytest.fixture()
+def archive_storage(settings):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {
+            "BACKEND": "django.core.files.storage.InMemoryStorage",
+        },
+    }
+
+
+@pytest.fixture()
+def finished_mission():
+    now = timezone.now()
+    mission = Mission.objects.create(
+        name="Finished Mission",
+        mission_window=DateTimeTZRange(
+            now - timedelta(days=3), now - timedelta(days=2)
+        ),
+    )
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacon = Beacon.objects.create(
+        asset=asset,
+        identifier="arch-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+    for i in range(3):
+        ping = Ping(
+            beacon=beacon,
+            reported_at=now - timedelta(days=2, hours=i),
+            position=Coordinate(-71 + i, 42.5),
+            altitude=1000 * (3 - i),
+            battery=90,
+        )
+        ping.raw_payload = {"index": i}
+        ping.save()
+    return mission
+
+
+@pytest.mark.django_db()
+def test_archived_pings_are_read_transparently(
+    client,
+    archive_storage,
+    finished_mission,
+    settings,
+    monkeypatch,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    settings.TRACKING_PING_ARCHIVE_AFTER = timedelta(days=1)
+    monkeypatch.setattr(
+        tasks.archive_mission_pings, "delay", tasks.archive_mission_pings
+    )
+    asset = finished_mission.assets.get()
+    before = b"".join(
+        client.get(
+            reverse("missions:updating_kml", args=[finished_mission.pk])
+        ).streaming_content
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.archive_finished_missions()
+
+    archive = PingArchive.objects.get(mission=finished_mission)
+    assert archive.ping_count == 3
+    assert not Ping.objects.exists()
+    assert not AssetLatestPing.objects.exists()
+
+    after = b"".join(
+        client.get(
+            reverse("missions:updating_kml", args=[finished_mission.pk])
+        ).streaming_content
+    )
+    assert LIVE_UPDATES.sub(b"", after) == LIVE_UPDATES.sub(b"", before)
+    content = client.get(
+        reverse("missions:asset_list", args=[finished_mission.pk])
+    ).content.decode("utf-8")
+    assert "42.50000" in content
+    assert "-71.00000" in content
+    response = client.get(
+        reverse(
+            "missions:asset_detail", args=[finished_mission.pk, asset.pk]
+        )
+    )
+    assert [p.battery for p in response.context["pings"]] == [90, 90, 90]
+    assert [p.raw_payload for p in response.context["pings"]] == [
+        {"index": 0},
+        {"index": 1},
+        {"index": 2},
+    ]
+    with django_assert_num_queries(0):
+        assert {p.beacon.identifier for p in response.context["pings"]} == {
+            "arch-1"
+        }
+    assert len(response.context["path_points"]) == 3
+    assert 'id="asset-track-map"' in response.content.decode()
+
+
+def test_archive_cache_is_bounded_by_ping_count():
+    cache = ArchiveCache(max_pings=5)
+    cache.set("a", (1, 2))
+    cache.set("b", (3, 4))
+    assert cache.get("a") == (1, 2)
+    cache.set("c", (5, 6))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == (1, 2)
+    assert cache.get("c") == (5, 6)
+    cache.set("d", tuple(range(6)))
+    assert cache.get("d") is None
@@ -0,0 +1,126 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.buffer import insert_pings
+from bmcc.tracking.fragments import (
+    beacon_fragments,
+    delete_fragments,
+    get_fragments,
+    refresh_fragments,
+)
+from bmcc.tracking.models import Asset, Beacon, Ping
+from bmcc.utils.kml import TRACK_SEGMENT_SIZE, stream_document
+
+
+START = datetime(2025, 6, 1, 12, tzinfo=UTC)
+
+
+@pytest.fixture()
+def beacon():
+    mission = Mission.objects.create(name="Fragment Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    return Beacon.objects.create(
+        asset=asset,
+        identifier="frag-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+
+
+def make_ping(beacon, minutes, longitude):
+    return Ping(
+        mission_id=beacon.asset.mission_id,
+        asset_id=beacon.asset_id,
+        beacon=beacon,
+        reported_at=START + timedelta(minutes=minutes),
+        position=Coordinate(longitude, 46.0),
+        altitude=1000,
+    )
+
+
+def render(beacon):
+    mission_id = beacon.asset.mission_id
+    refresh_fragments(mission_id, [beacon])
+    folder = beacon_fragments(mission_id, [beacon])[beacon.pk]
+    return b"".join(stream_document("Fragments", [folder])).decode()
+
+
+@pytest.mark.django_db()
+def test_fragments_are_extended_with_new_pings(beacon):
+    insert_pings([make_ping(beacon, 0, 7.1), make_ping(beacon, 1, 7.2)])
+    first = render(beacon)
+    assert "7.100000" in first
+    assert len(get_fragments([beacon.pk])[beacon.pk].points) == 2
+
+    # Unchanged tracks are served from the cache
+    assert render(beacon) == first
+
+    insert_pings([make_ping(beacon, 2, 7.3)])
+    fragment = get_fragments([beacon.pk])[beacon.pk]
+    assert fragment.until == START + timedelta(minutes=1)
+    assert "7.300000" in render(beacon)
+    fragment = get_fragments([beacon.pk])[beacon.pk]
+    assert len(fragment.points) == 3
+    assert fragment.until == START + timedelta(minutes=2)
+
+
+@pytest.mark.django_db()
+def test_long_tracks_are_cached_as_sealed_segments(beacon):
+    count = 2 * TRACK_SEGMENT_SIZE + 1
+    insert_pings([make_ping(beacon, i, 7 + i / 10000) for i in range(count)])
+    render(beacon)
+    fragment = get_fragments([beacon.pk])[beacon.pk]
+    # The tail starts with the last point of the last sealed segment
+    assert fragment.sealed == 2
+    assert len(fragment.points) == 2
+
+    insert_pings([make_ping(beacon, count, 8.0)])
+    content = render(beacon)
+    fragment = get_fragments([beacon.pk])[beacon.pk]
+    assert fragment.sealed == 2
+    assert len(fragment.points) == 3
+    assert content.count("<Document") == 3
+    assert "8.000000" in content
+
+    # Extending the cached entries renders the same as starting over
+    delete_fragments([beacon.pk])
+    assert render(beacon) == content
+
+
+@pytest.mark.django_db()
+def test_late_pings_drop_the_fragment(
+    beacon, django_capture_on_commit_callbacks
+):
+    insert_pings([make_ping(beacon, 0, 7.1), make_ping(beacon, 2, 7.3)])
+    render(beacon)
+
+    # Reported before the cached track ends, only a full render finds it
+    with django_capture_on_commit_callbacks(execute=True):
+        make_ping(beacon, 1, 7.2).save()
+    assert get_fragments([beacon.pk]) == {}
+
+    content = render(beacon)
+    assert content.index("7.100000") < content.index("7.200000")
+    assert content.index("7.200000") < content.index("7.300000")
+
+
+@pytest.mark.django_db()
+def test_beacon_changes_drop_the_fragment(
+    beacon, django_capture_on_commit_callbacks
+):
+    insert_pings([make_ping(beacon, 0, 7.1)])
+    render(beacon)
+
+    beacon.identifier = "frag-renamed"
+    with django_capture_on_commit_callbacks(execute=True):
+        beacon.save()
+
+    assert get_fragments([beacon.pk]) == {}
+    assert "frag-renamed" in render(beacon)
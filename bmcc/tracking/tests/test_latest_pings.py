@@ -0,0 +1,168 @@
+import json
+import threading
+from datetime import UTC, datetime, timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.buffer import insert_pings
+from bmcc.tracking.models import (
+    Asset,
+    AssetLatestPing,
+    Beacon,
+    BeaconLatestPing,
+    Ping,
+    PingPayload,
+)
+
+
+@pytest.fixture()
+def asset():
+    mission = Mission.objects.create(name="Latest Mission")
+    return Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+
+
+def make_beacon(asset, identifier):
+    return Beacon.objects.create(
+        asset=asset,
+        identifier=identifier,
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+
+
+def post_pings(client, beacon, *timestamps):
+    return client.post(
+        f"/tracking/api/{beacon.pk}/pings/",
+        data=json.dumps(
+            [
+                {"latitude": 42, "longitude": -71, "reported_at": ts}
+                for ts in timestamps
+            ]
+        ),
+        content_type="application/json",
+    )
+
+
+@pytest.mark.django_db()
+def test_latest_pings_only_move_forward(client, asset):
+    first = make_beacon(asset, "api-1")
+    second = make_beacon(asset, "api-2")
+
+    post_pings(client, first, "2025-06-01T12:00:00Z", "2025-06-01T12:05:00Z")
+    post_pings(client, second, "2025-06-01T12:03:00Z")
+    # Late, out of order fix
+    post_pings(client, first, "2025-06-01T11:00:00Z")
+
+    assert first.last_ping().reported_at == datetime(
+        2025, 6, 1, 12, 5, tzinfo=UTC
+    )
+    assert BeaconLatestPing.objects.get(beacon=second).reported_at == (
+        datetime(2025, 6, 1, 12, 3, tzinfo=UTC)
+    )
+    assert AssetLatestPing.objects.get(asset=asset).ping.beacon_id == (
+        first.pk
+    )
+
+
+@pytest.mark.django_db()
+def test_latest_pings_are_refreshed_on_delete(
+    client, asset, django_capture_on_commit_callbacks
+):
+    beacon = make_beacon(asset, "api-1")
+    post_pings(client, beacon, "2025-06-01T12:00:00Z", "2025-06-01T12:05:00Z")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        beacon.pings.get(reported_at="2025-06-01T12:05:00Z").delete()
+
+    latest = AssetLatestPing.objects.get(asset=asset)
+    assert latest.ping == Ping.objects.get()
+    assert beacon.last_ping() == latest.ping
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ping.objects.all().delete()
+
+    assert beacon.last_ping() is None
+    assert not AssetLatestPing.objects.exists()
+
+
+@pytest.mark.django_db()
+def test_beacon_deletion_cleans_up_without_loading_pings(
+    client, asset, django_capture_on_commit_callbacks
+):
+    first = make_beacon(asset, "api-1")
+    second = make_beacon(asset, "api-2")
+    post_pings(client, first, "2025-06-01T12:00:00Z", "2025-06-01T12:05:00Z")
+    post_pings(client, second, "2025-06-01T12:03:00Z")
+
+    with (
+        CaptureQueriesContext(connection) as queries,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        first.delete()
+
+    # Pings are deleted with a single statement rather than one by one
+    loads = 'SELECT "tracking_ping"."id"'
+    assert not [q for q in queries if q["sql"].startswith(loads)]
+    assert list(Ping.objects.values_list("beacon_id", flat=True)) == [
+        second.pk
+    ]
+    assert list(PingPayload.objects.values_list("ping_id", flat=True)) == [
+        Ping.objects.get().pk
+    ]
+    latest = AssetLatestPing.objects.get(asset=asset)
+    assert latest.ping.beacon_id == second.pk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_ingests_update_latest_pings(asset):
+    beacon = make_beacon(asset, "api-1")
+    start = datetime(2025, 6, 1, 12, tzinfo=UTC)
+
+    def ping(minutes):
+        return Ping(
+            mission_id=asset.mission_id,
+            asset=asset,
+            beacon=beacon,
+            reported_at=start + timedelta(minutes=minutes),
+            position=Coordinate(-71.0, 42.0),
+        )
+
+    insert_pings([ping(0)])
+    snapshot_taken = threading.Event()
+    other_committed = threading.Event()
+    failures = []
+
+    def ingest():
+        try:
+            with transaction.atomic():
+                # Takes the snapshot of the transaction
+                Beacon.objects.get(pk=beacon.pk)
+                snapshot_taken.set()
+                other_committed.wait(timeout=5)
+                # Updates rows changed since the snapshot
+                insert_pings([ping(2)])
+        except Exception as e:
+            failures.append(e)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=ingest)
+    thread.start()
+    snapshot_taken.wait(timeout=5)
+    insert_pings([ping(1)])
+    other_committed.set()
+    thread.join()
+
+    assert failures == []
+    assert Ping.objects.count() == 3
+    for model in [BeaconLatestPing, AssetLatestPing]:
+        assert model.objects.get().reported_at == start + timedelta(minutes=2)
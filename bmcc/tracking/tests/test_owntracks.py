@@ -0,0 +1,198 @@
+import json
+
+from django.core.cache import cache
+from django.urls import reverse
+
+import pytest
+
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.backends import owntracks
+from bmcc.tracking.models import Asset, Beacon, OwnTracksMessage
+
+
+@pytest.fixture()
+def owntracks_beacon():
+    mission = Mission.objects.create(name="OwnTracks Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Chase car",
+        asset_type=constants.AssetType.VEHICLE,
+    )
+    return Beacon.objects.create(
+        asset=asset,
+        identifier="car-1",
+        backend_class_path=constants.BeaconBackendClass.OWNTRACKS,
+    )
+
+
+def location_message(beacon, tst=1763869517, **kwargs):
+    return {
+        "_type": "location",
+        "topic": f"owntracks/user/{beacon.pk}",
+        "lat": 42.36,
+        "lon": -71.09,
+        "tst": tst,
+        **kwargs,
+    }
+
+
+@pytest.mark.django_db()
+def test_owntracks_ping_stores_location_and_returns_pending(
+    client, owntracks_beacon
+):
+    OwnTracksMessage.objects.create(
+        beacon=owntracks_beacon,
+        message={"_type": "cmd", "action": "reportLocation"},
+    )
+
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, alt=12)),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert response.json() == [{"_type": "cmd", "action": "reportLocation"}]
+    ping = owntracks_beacon.pings.get()
+    assert ping.altitude == 12
+    assert ping.mission_id == owntracks_beacon.asset.mission_id
+    assert not OwnTracksMessage.objects.filter(sent_at__isnull=True).exists()
+
+    # Resent messages are accepted without storing a second ping
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, alt=12)),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert owntracks_beacon.pings.count() == 1
+
+
+@pytest.mark.django_db()
+def test_owntracks_ping_sees_beacon_changes(client, owntracks_beacon):
+    client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, tst=1)),
+        content_type="application/json",
+    )
+    owntracks_beacon.active = False
+    owntracks_beacon.save()
+
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, tst=2)),
+        content_type="application/json",
+    )
+
+    assert response.status_code == 200
+    assert owntracks_beacon.pings.count() == 1
+
+
+@pytest.mark.django_db()
+def test_owntracks_show_all_sends_friend_changes(
+    client, owntracks_beacon, django_capture_on_commit_callbacks
+):
+    owntracks_beacon.backend_config = {"show_all": True}
+    owntracks_beacon.save()
+    friend = Beacon.objects.create(
+        asset=Asset.objects.create(
+            mission=owntracks_beacon.asset.mission,
+            name="Second car",
+            asset_type=constants.AssetType.VEHICLE,
+        ),
+        identifier="car-2",
+        backend_class_path=constants.BeaconBackendClass.OWNTRACKS,
+    )
+    for tst in [10, 20]:
+        client.post(
+            reverse("tracking:owntracks_ping"),
+            data=json.dumps(location_message(friend, tst=tst)),
+            content_type="application/json",
+        )
+
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, tst=30)),
+        content_type="application/json",
+    )
+
+    assert response.json() == [
+        {"_type": "cmd", "action": "clearWaypoints"},
+        {"_type": "card", "tid": "ca", "name": "Second car"},
+        {
+            "_type": "location",
+            "lon": -71.09,
+            "lat": 42.36,
+            "tid": "ca",
+            "deviceId": str(friend.pk),
+            "tst": 20.0,
+        },
+    ]
+
+    # Nothing changed since the last response
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, tst=40)),
+        content_type="application/json",
+    )
+    assert response.json() == []
+
+    # Only the friend's new location is sent
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            reverse("tracking:owntracks_ping"),
+            data=json.dumps(location_message(friend, tst=50)),
+            content_type="application/json",
+        )
+    response = client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(owntracks_beacon, tst=60)),
+        content_type="application/json",
+    )
+    assert [(m["_type"], m.get("tst")) for m in response.json()] == [
+        ("location", 50.0)
+    ]
+
+
+@pytest.mark.django_db()
+def test_owntracks_show_all_resends_everything_periodically(
+    client, owntracks_beacon
+):
+    owntracks_beacon.backend_config = {"show_all": True}
+    owntracks_beacon.save()
+    friend = Beacon.objects.create(
+        asset=Asset.objects.create(
+            mission=owntracks_beacon.asset.mission,
+            name="Second car",
+            asset_type=constants.AssetType.VEHICLE,
+        ),
+        identifier="car-2",
+        backend_class_path=constants.BeaconBackendClass.OWNTRACKS,
+    )
+    client.post(
+        reverse("tracking:owntracks_ping"),
+        data=json.dumps(location_message(friend, tst=10)),
+        content_type="application/json",
+    )
+
+    def ping(tst):
+        return client.post(
+            reverse("tracking:owntracks_ping"),
+            data=json.dumps(location_message(owntracks_beacon, tst=tst)),
+            content_type="application/json",
+        ).json()
+
+    assert len(ping(20)) == 3
+    assert ping(30) == []
+
+    # Active devices keep their state, but not past the resend interval
+    state_key = f"tracking:owntracks-device:{owntracks_beacon.pk}"
+    state = cache.get(state_key)
+    state["full_sent_at"] -= owntracks.DEVICE_FULL_RESEND_INTERVAL
+    cache.set(state_key, state)
+
+    assert [m["_type"] for m in ping(40)] == ["cmd", "card", "location"]
+    assert ping(50) == []
@@ -0,0 +1,114 @@
+from datetime import UTC, date, datetime
+
+from django.db import connection
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants, partitions, tasks
+from bmcc.tracking.archive import archived_pings
+from bmcc.tracking.models import (
+    Asset,
+    Beacon,
+    BeaconLatestPing,
+    Ping,
+    PingArchive,
+    PingPayload,
+)
+
+
+def partition_of(ping):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tableoid::regclass::text FROM tracking_ping WHERE id = %s",
+            [ping.pk],
+        )
+        return cursor.fetchone()[0]
+
+
+@pytest.fixture()
+def beacon():
+    mission = Mission.objects.create(name="Partitioned Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    return Beacon.objects.create(
+        asset=asset,
+        identifier="part-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+
+
+def make_ping(beacon, reported_at):
+    return Ping.objects.create(
+        beacon=beacon,
+        reported_at=reported_at,
+        position=Coordinate(-71, 42),
+    )
+
+
+@pytest.mark.django_db()
+def test_ensure_partitions_moves_rows_out_of_default(beacon):
+    ping = make_ping(beacon, datetime(2001, 2, 15, tzinfo=UTC))
+    assert partition_of(ping) == partitions.DEFAULT_PARTITION
+
+    created = partitions.ensure_partitions(
+        start=datetime(2001, 1, 1, tzinfo=UTC),
+        ahead=0,
+        now=datetime(2001, 3, 10, tzinfo=UTC),
+    )
+
+    assert created == [
+        "tracking_ping_p200101",
+        "tracking_ping_p200102",
+        "tracking_ping_p200103",
+    ]
+    assert partition_of(ping) == "tracking_ping_p200102"
+    assert date(2001, 2, 1) in partitions.list_partitions()
+    # New pings are routed to their month
+    ping = make_ping(beacon, datetime(2001, 3, 1, tzinfo=UTC))
+    assert partition_of(ping) == "tracking_ping_p200103"
+
+
+@pytest.mark.django_db()
+def test_maintain_ping_partitions_archives_and_detaches_old_months(
+    beacon, settings, django_capture_on_commit_callbacks
+):
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "default": {
+            "BACKEND": "django.core.files.storage.InMemoryStorage",
+        },
+    }
+    partitions.ensure_partitions(
+        start=datetime(2001, 1, 1, tzinfo=UTC),
+        ahead=0,
+        now=datetime(2001, 2, 1, tzinfo=UTC),
+    )
+    Ping(
+        beacon=beacon,
+        reported_at=datetime(2001, 1, 15, tzinfo=UTC),
+        position=Coordinate(-71, 42),
+        raw_payload={"index": 0},
+    ).save()
+    assert PingPayload.objects.exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        result = tasks.maintain_ping_partitions(retention=12)
+
+    assert {"tracking_ping_p200101", "tracking_ping_p200102"} <= set(
+        result["detached"]
+    )
+    assert date(2001, 1, 1) not in partitions.list_partitions()
+    assert not Ping.objects.exists()
+    assert not PingPayload.objects.exists()
+    assert not BeaconLatestPing.objects.exists()
+    # Still readable from the archive
+    mission = beacon.asset.mission
+    assert PingArchive.objects.get(mission=mission).ping_count == 1
+    (ping,) = archived_pings(mission.pk)
+    assert ping.reported_at == datetime(2001, 1, 15, tzinfo=UTC)
+    assert ping.raw_payload == {"index": 0}
@@ -0,0 +1,162 @@
+import json
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants, tasks
+from bmcc.tracking.buffer import PingBuffer
+from bmcc.tracking.models import Asset, Beacon, Ping
+from bmcc.tracking.versions import mission_version
+
+
+@pytest.fixture()
+def buffered_ingest(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        "ping-buffer": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ping-buffer-tests",
+        },
+    }
+    settings.TRACKING_PING_BUFFER_ENABLED = True
+    settings.TRACKING_PING_BUFFER_CACHE = "ping-buffer"
+    settings.TRACKING_PING_BUFFER_FLUSH_SIZE = 100
+
+
+@pytest.mark.django_db()
+def test_buffered_pings_are_visible_and_flushed(
+    client, buffered_ingest, django_capture_on_commit_callbacks
+):
+    mission = Mission.objects.create(name="Buffered Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacon = Beacon.objects.create(
+        asset=asset,
+        identifier="buf-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+
+    version = mission_version(mission.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            f"/tracking/api/{beacon.pk}/ping/",
+            data=json.dumps(
+                {"latitude": 42.12345, "longitude": -71.5, "altitude": 321}
+            ),
+            content_type="application/json",
+        )
+
+    assert response.status_code == 201
+    ping_id = response.json()["ping"]
+    assert not Ping.objects.exists()
+    # Cached renderings of the mission are not reused
+    assert mission_version(mission.pk) != version
+
+    response = client.get(
+        reverse("missions:asset_list", kwargs={"mission_id": mission.pk})
+    )
+    content = response.content.decode("utf-8")
+    assert "42.12345" in content
+    assert "buf-1" in content
+
+    assert tasks.flush_ping_buffer() == 1
+    assert tasks.flush_ping_buffer() == 0
+
+    ping = beacon.pings.get()
+    assert str(ping.pk) == ping_id
+    assert ping.altitude == 321
+    assert ping.mission_id == mission.pk
+
+
+@pytest.mark.django_db()
+def test_rejected_buffered_pings_do_not_block_the_buffer(buffered_ingest):
+    mission = Mission.objects.create(name="Buffered Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacons = [
+        Beacon.objects.create(
+            asset=asset,
+            identifier=f"buf-{i}",
+            backend_class_path=constants.BeaconBackendClass.BMCC_API,
+        )
+        for i in range(2)
+    ]
+    now = timezone.now()
+    pings = [
+        Ping(
+            mission=mission,
+            asset=asset,
+            beacon=beacon,
+            reported_at=now,
+            position=Coordinate(-71.5, 42.1),
+        )
+        for beacon in beacons
+    ]
+    pings.append(
+        Ping(
+            mission=mission,
+            asset=asset,
+            beacon=beacons[0],
+            reported_at=now + timedelta(minutes=1),
+            position=Coordinate(-71.5, 42.2),
+            battery=-1,
+        )
+    )
+    PingBuffer().push(pings)
+    beacons[1].delete()
+
+    assert tasks.flush_ping_buffer() == 3
+    assert tasks.flush_ping_buffer() == 0
+
+    assert list(Ping.objects.values_list("beacon_id", "reported_at")) == [
+        (beacons[0].pk, now)
+    ]
+
+
+@pytest.mark.django_db()
+def test_retried_batches_report_buffered_fixes_as_duplicates(
+    client, buffered_ingest
+):
+    mission = Mission.objects.create(name="Buffered Mission")
+    asset = Asset.objects.create(
+        mission=mission,
+        name="Balloon 1",
+        asset_type=constants.AssetType.BALLOON,
+    )
+    beacon = Beacon.objects.create(
+        asset=asset,
+        identifier="buf-1",
+        backend_class_path=constants.BeaconBackendClass.BMCC_API,
+    )
+    reported_at = timezone.now().replace(microsecond=0).isoformat()
+    url = reverse("tracking:api_batch_ping", kwargs={"pk": beacon.pk})
+    data = json.dumps(
+        {
+            "pings": [
+                {
+                    "latitude": 42.1,
+                    "longitude": -71.1,
+                    "reported_at": reported_at,
+                }
+            ]
+        }
+    )
+
+    first = client.post(url, data=data, content_type="application/json")
+    retry = client.post(url, data=data, content_type="application/json")
+
+    assert [r["status"] for r in first.json()["results"]] == ["created"]
+    assert [r["status"] for r in retry.json()["results"]] == ["duplicate"]
+    assert tasks.flush_ping_buffer() == 1
+    assert str(beacon.pings.get().pk) == first.json()["results"][0]["ping"]
@@ -0,0 +1,131 @@
+"""
+Query plan regression tests: every ping query issued by the tracking views
+must be able to use an index. Sequential scans are disabled while planning,
+so that the small test dataset does not make them look cheaper; the planner
+still falls back to one when no index matches a query.
+"""
+
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import pytest
+
+from bmcc.fields import Coordinate
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants
+from bmcc.tracking.latest import update_latest_pings
+from bmcc.tracking.models import Asset, Beacon, Ping
+from bmcc.tracking.tracks import PingCursor
+
+
+# The ping table, quoted by the ORM or not in raw SQL
+PING_TABLE = re.compile(r"\btracking_ping\b")
+
+
+def plan_nodes(plan):
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        yield node
+        nodes.extend(node.get("Plans", []))
+
+
+def sequential_ping_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        (result,) = cursor.fetchone()
+        cursor.execute("RESET enable_seqscan")
+    return [
+        node["Relation Name"]
+        for node in plan_nodes(result[0]["Plan"])
+        if node["Node Type"] == "Seq Scan"
+        and node["Relation Name"].startswith("tracking_ping")
+    ]
+
+
+@pytest.fixture()
+def seeded_mission():
+    now = timezone.now()
+    mission = Mission.objects.create(
+        name="Plan Mission",
+        mission_window=DateTimeTZRange(now - timedelta(days=1), now),
+    )
+    pings = []
+    for asset_index in range(3):
+        asset = Asset.objects.create(
+            mission=mission,
+            name=f"Balloon {asset_index}",
+            asset_type=constants.AssetType.BALLOON,
+        )
+        for beacon_index in range(2):
+            beacon = Beacon.objects.create(
+                asset=asset,
+                identifier=f"plan-{asset_index}-{beacon_index}",
+                backend_class_path=constants.BeaconBackendClass.BMCC_API,
+            )
+            pings.extend(
+                Ping(
+                    mission=mission,
+                    asset=asset,
+                    beacon=beacon,
+                    reported_at=now - timedelta(minutes=i),
+                    position=Coordinate(-71 + i / 1000, 42),
+                    altitude=1000 + i,
+                )
+                for i in range(200)
+            )
+    Ping.objects.bulk_create(pings)
+    update_latest_pings(pings)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE tracking_ping")
+    return mission
+
+
+@pytest.mark.django_db()
+@pytest.mark.parametrize(
+    "url_name",
+    [
+        "detail",
+        "asset_list",
+        "asset_detail",
+        "updating_kml",
+        "incremental_kml",
+    ],
+)
+def test_view_ping_queries_use_indexes(client, seeded_mission, url_name):
+    kwargs = {"mission_id": seeded_mission.pk}
+    if url_name == "asset_detail":
+        kwargs["asset_id"] = seeded_mission.assets.first().pk
+    params = {}
+    if url_name == "incremental_kml":
+        pings = Ping.objects.order_by("created_at", "pk")
+        params["cursor"] = str(PingCursor.of(pings[pings.count() // 2]))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(
+            reverse(f"missions:{url_name}", kwargs=kwargs), params
+        )
+        if response.streaming:
+            # Rendering happens while the content is consumed
+            b"".join(response.streaming_content)
+    assert response.status_code == 200
+
+    ping_queries = [
+        q["sql"]
+        for q in queries.captured_queries
+        if q["sql"].lstrip().upper().startswith(("SELECT", "WITH"))
+        and PING_TABLE.search(q["sql"])
+    ]
+    assert ping_queries
+    if url_name == "incremental_kml":
+        # Raw SQL is checked too
+        assert any("LATERAL" in sql for sql in ping_queries)
+    for sql in ping_queries:
+        assert sequential_ping_scans(sql) == [], sql
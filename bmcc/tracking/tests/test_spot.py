@@ -0,0 +1,181 @@
+from datetime import UTC, datetime, timedelta
+
+from django.db import DatabaseError
+
+import pytest
+import requests
+
+from bmcc.missions.models import Mission
+from bmcc.tracking import constants, tasks
+from bmcc.tracking.backends import spot
+from bmcc.tracking.backends.spot import SpotBackend
+from bmcc.tracking.backends.spot_stub import SpotFeedStub
+from bmcc.tracking.models import Asset, Beacon, Ping, SpotFeedCursor
+
+
+FEED_ID = "test-feed"
+START = datetime(2025, 6, 1, 12, 0, tzinfo=UTC)
+
+
+def spot_message(device_id, minutes, latitude=42.0, longitude=-71.0):
+    reported_at = START + timedelta(minutes=minutes)
+    return {
+        "messengerId": device_id,
+        "messageType": "TRACK",
+        "dateTime": reported_at.strftime("%Y-%m-%dT%H:%M:%S+0000"),
+        "latitude": latitude,
+        "longitude": longitude,
+    }
+
+
+@pytest.fixture()
+def spot_feed(monkeypatch, settings):
+    settings.SPOT_FEED_ID = FEED_ID
+    stub = SpotFeedStub()
+    session = requests.Session()
+    session.mount("https://api.findmespot.com/", stub)
+    monkeypatch.setattr(
+        SpotBackend, "create_session", staticmethod(lambda: session)
+    )
+    return stub
+
+
+@pytest.fixture()
+def spot_beacons():
+    mission = Mission.objects.create(name="SPOT Mission")
+    beacons = []
+    for device_id in ["0-111", "0-222"]:
+        asset = Asset.objects.create(
+            mission=mission,
+            name=f"Balloon {device_id}",
+            asset_type=constants.AssetType.BALLOON,
+        )
+        beacons.append(
+            Beacon.objects.create(
+                asset=asset,
+                identifier=f"spot-{device_id}",
+                backend_class_path=constants.BeaconBackendClass.SPOT,
+                backend_config={"device_id": device_id},
+            )
+        )
+    return beacons
+
+
+@pytest.mark.django_db()
+def test_update_spot_routes_messages_and_skips_stored(
+    spot_feed, spot_beacons
+):
+    spot_feed.add_messages(
+        FEED_ID,
+        [
+            spot_message("0-111", 0),
+            spot_message("0-222", 1),
+            spot_message("0-111", 5),
+            spot_message("0-999", 5),
+        ],
+    )
+
+    tasks.update_beacon_locations_spot()
+    tasks.update_beacon_locations_spot()
+
+    first, second = spot_beacons
+    assert first.pings.count() == 2
+    assert second.pings.count() == 1
+    assert Ping.objects.count() == 3
+    assert second.pings.get().mission_id == second.asset.mission_id
+
+
+@pytest.mark.django_db()
+def test_update_spot_polls_incrementally_and_follows_pages(
+    spot_feed, spot_beacons
+):
+    spot_feed.add_messages(
+        FEED_ID, [spot_message("0-111", i) for i in range(120)]
+    )
+
+    tasks.update_beacon_locations_spot()
+
+    cursor = SpotFeedCursor.objects.get(feed_id=FEED_ID)
+    assert cursor.last_message_at == START + timedelta(minutes=119)
+    assert len(spot_feed.requested_urls) == 3
+    assert spot_beacons[0].pings.count() == 120
+
+    spot_feed.requested_urls.clear()
+    spot_feed.add_messages(FEED_ID, [spot_message("0-222", 130)])
+
+    tasks.update_beacon_locations_spot()
+
+    assert len(spot_feed.requested_urls) == 1
+    assert "startDate=2025-06-01T13%3A59%3A00-0000" in (
+        spot_feed.requested_urls[0]
+    )
+    assert spot_beacons[1].pings.count() == 1
+    cursor.refresh_from_db()
+    assert cursor.last_message_at == START + timedelta(minutes=130)
+
+
+@pytest.mark.django_db()
+def test_update_spot_catches_up_past_the_page_limit(
+    monkeypatch, spot_feed, spot_beacons
+):
+    monkeypatch.setattr(spot, "SPOT_MAX_PAGES", 2)
+    spot_feed.add_messages(
+        FEED_ID, [spot_message("0-111", i) for i in range(120)]
+    )
+
+    # The oldest messages are fetched first, the cursor stops at them
+    tasks.update_beacon_locations_spot()
+
+    cursor = SpotFeedCursor.objects.get(feed_id=FEED_ID)
+    assert cursor.last_message_at == START + timedelta(minutes=99)
+    assert spot_beacons[0].pings.count() == 100
+
+    tasks.update_beacon_locations_spot()
+
+    cursor.refresh_from_db()
+    assert cursor.last_message_at == START + timedelta(minutes=119)
+    assert spot_beacons[0].pings.count() == 120
+
+
+@pytest.mark.django_db()
+def test_update_spot_polls_each_configured_feed(spot_feed, spot_beacons):
+    first, second = spot_beacons
+    second.backend_config = {"device_id": "0-222", "feed_id": "other-feed"}
+    second.save()
+    spot_feed.add_messages(
+        FEED_ID, [spot_message("0-111", 0), spot_message("0-222", 0)]
+    )
+    spot_feed.add_messages(
+        "other-feed", [spot_message("0-111", 1), spot_message("0-222", 1)]
+    )
+
+    tasks.update_beacon_locations_spot()
+
+    assert first.pings.get().reported_at == START
+    assert second.pings.get().reported_at == START + timedelta(minutes=1)
+    assert set(
+        SpotFeedCursor.objects.values_list("feed_id", flat=True)
+    ) == {FEED_ID, "other-feed"}
+
+
+@pytest.mark.django_db()
+def test_update_spot_stores_other_feeds_when_one_fails(
+    monkeypatch, spot_feed, spot_beacons
+):
+    first, second = spot_beacons
+    second.backend_config = {"device_id": "0-222", "feed_id": "other-feed"}
+    second.save()
+    spot_feed.add_messages(FEED_ID, [spot_message("0-111", 0)])
+    spot_feed.add_messages("other-feed", [spot_message("0-222", 1)])
+    store_spot_messages = tasks.store_spot_messages
+
+    def failing_store(cursor, backends, messages):
+        if cursor.feed_id == FEED_ID:
+            raise DatabaseError("Connection lost")
+        store_spot_messages(cursor, backends, messages)
+
+    monkeypatch.setattr(tasks, "store_spot_messages", failing_store)
+    tasks.update_beacon_locations_spot()
+
+    assert not first.pings.exists()
+    assert second.pings.get().reported_at == START + timedelta(minutes=1)
@@ -0,0 +1,172 @@
+"""
+Ping tracks of a whole mission, for the views rendering every beacon at once
+(e.g. the KML network link).
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import UTC, datetime, timedelta
+
+from django.db.models import Q
+
+import attrs
+
+from . import models
+from .buffer import buffered_pings, latest_pings
+
+
+# Ping fields needed to draw a track
+TRACK_FIELDS = ["beacon_id", "reported_at", "position", "altitude"]
+
+# Pings of each beacon already sent (up to a cursor): the last one reported
+# before a time, to continue a track from, and the latest one. Backward scans
+# of the asset index per beacon.
+SENT_PINGS = """
+SELECT ping.*
+FROM unnest(%s::uuid[], %s::uuid[], %s::timestamptz[])
+    AS beacon (id, asset_id, first_at)
+CROSS JOIN LATERAL (
+    (
+        SELECT
+            id, beacon_id, reported_at, position, altitude, 'previous' AS kind
+        FROM {ping_table}
+        WHERE asset_id = beacon.asset_id
+            AND beacon_id = beacon.id
+            AND reported_at < beacon.first_at
+            AND (created_at, id) <= (%s, %s)
+        ORDER BY reported_at DESC
+        LIMIT 1
+    )
+    UNION ALL
+    (
+        SELECT
+            id, beacon_id, reported_at, position, altitude, 'latest' AS kind
+        FROM {ping_table}
+        WHERE asset_id = beacon.asset_id
+            AND beacon_id = beacon.id
+            AND (created_at, id) <= (%s, %s)
+        ORDER BY reported_at DESC
+        LIMIT 1
+    )
+) ping
+"""
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+@attrs.frozen(order=True)
+class PingCursor:
+    """
+    Position in the order pings were ingested in, ``(created_at, id)``.
+
+    Ping ids alone are not ordered: pings stored before ids were time ordered
+    keep random ones. ``created_at`` is set on ingest (not on insert), so
+    that buffered pings keep their place once stored.
+    """
+
+    created_at: datetime
+    id: uuid.UUID
+
+    @classmethod
+    def at(cls, at):
+        """
+        Cursor following all pings ingested up to the given time.
+        """
+        return cls(at, uuid.UUID(int=(1 << 128) - 1))
+
+    @classmethod
+    def of(cls, ping):
+        return cls(ping.created_at, ping.pk)
+
+    @classmethod
+    def parse(cls, value):
+        """
+        Parse a cursor formatted with `str`, raising `ValueError` (or
+        `OverflowError`, for an out of range time) if it is malformed.
+        """
+        micros, _, pk = value.partition("_")
+        return cls(
+            EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(pk)
+        )
+
+    def __str__(self):
+        micros = (self.created_at - EPOCH) // timedelta(microseconds=1)
+        return f"{micros}_{self.id}"
+
+    def following(self):
+        """
+        Filter on the pings ingested after the cursor.
+        """
+        # The first condition alone bounds the index scan
+        return Q(created_at__gte=self.created_at) & (
+            Q(created_at__gt=self.created_at) | Q(pk__gt=self.id)
+        )
+
+
+def mission_track_updates(mission_id, cursor):
+    """
+    Stored and buffered pings of the mission ingested after the `PingCursor`,
+    grouped by beacon id and ordered by time.
+
+    Pings are picked up in the order they were ingested, so that pings
+    stored late with an older ``reported_at`` (e.g. SPOT fixes, replayed
+    batches or an OwnTracks backlog) are still sent. For each of these
+    beacons, also return its pings up to the cursor: the last one reported
+    before its first new ping, to continue its track from, and the latest
+    one. Pings committed after a later one was sent only appear with the
+    next reload of the full document.
+    """
+    tracks = defaultdict(list)
+    pings = (
+        models.Ping.objects.filter(cursor.following(), mission_id=mission_id)
+        .order_by("reported_at")
+        .only("asset_id", "created_at", *TRACK_FIELDS)
+    )
+    assets = {}
+    for ping in pings:
+        tracks[ping.beacon_id].append(ping)
+        assets[ping.beacon_id] = ping.asset_id
+    buffered = buffered_pings(mission_id=mission_id)
+    for ping in buffered:
+        if PingCursor.of(ping) > cursor:
+            tracks[ping.beacon_id].append(ping)
+            assets[ping.beacon_id] = ping.asset_id
+    for pings in tracks.values():
+        pings.sort(key=lambda p: p.reported_at)
+
+    previous, latest = {}, {}
+    if assets:
+        sql = SENT_PINGS.format(ping_table=models.Ping._meta.db_table)
+        sent = defaultdict(list)
+        for ping in models.Ping.objects.raw(
+            sql,
+            [
+                [str(pk) for pk in assets],
+                [str(pk) for pk in assets.values()],
+                [tracks[pk][0].reported_at for pk in assets],
+                cursor.created_at,
+                cursor.id,
+                cursor.created_at,
+                cursor.id,
+            ],
+        ):
+            sent[ping.kind].append(ping)
+        earlier = [
+            p
+            for p in buffered
+            if p.beacon_id in assets and PingCursor.of(p) <= cursor
+        ]
+        previous = latest_pings(
+            [
+                *sent["previous"],
+                *(
+                    p
+                    for p in earlier
+                    if p.reported_at < tracks[p.beacon_id][0].reported_at
+                ),
+            ],
+            "beacon_id",
+        )
+        latest = latest_pings([*sent["latest"], *earlier], "beacon_id")
+    return dict(tracks), previous, latest
@@ -28,4 +28,9 @@ urlpatterns = [
         name="owntracks_configuration_file",
     ),
     path("api/<uuid:pk>/ping/", views.BeaconUpdateView.as_view()),
+    path(
+        "api/<uuid:pk>/pings/",
+        views.BeaconBatchUpdateView.as_view(),
+        name="api_batch_ping",
+    ),
 ]
@@ -0,0 +1,31 @@
+"""
+Per-mission version counters, bumped whenever tracking data of a mission
+changes, to key caches of data derived from it and as ``ETag`` of responses.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def mission_version_key(mission_id):
+    return f"tracking:mission-version:{mission_id}"
+
+
+def mission_version(mission_id):
+    key = mission_version_key(mission_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time so a counter evicted from the cache
+        # never comes back with a value it already had.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_mission_versions(mission_ids):
+    for mission_id in set(mission_ids):
+        key = mission_version_key(mission_id)
+        cache.add(key, time.time_ns(), timeout=None)
+        cache.incr(key)
+
@@ -3,27 +3,27 @@ import json
 import logging
 
 from django import http
+from django.db import transaction
 from django.http import HttpRequest, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView, UpdateView
 from django.views.generic.edit import ModelFormMixin
 
-from bmcc.fields import Coordinate
-
 from . import constants, forms, models
+from .beacon_cache import aresolve_owntracks_beacon, beacon_cache
 
 
 logger = logging.getLogger(__name__)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
 class OwnTracksPingView(View):
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         body = request.body
         try:
             data = json.loads(body.decode("utf-8"))
@@ -69,16 +69,9 @@ class OwnTracksPingView(View):
                 {"error": "Missing beacon identifier"}, status=400
             )
 
-        beacon = (
-            models.Beacon.objects.active()
-            .filter(
-                backend_class_path=constants.BeaconBackendClass.OWNTRACKS,
-                pk=identifier,
-            )
-            .first()
-        )
+        resolved = await aresolve_owntracks_beacon(identifier)
 
-        if not beacon:
+        if not resolved:
             logger.warning(
                 "OwnTracks beacon not found or inactive",
                 extra={
@@ -88,8 +81,11 @@ class OwnTracksPingView(View):
             )
             return http.JsonResponse({}, status=200)
 
+        beacon = resolved.beacon
         try:
-            ping, response = beacon.backend.handle_ping(data)
+            ping, response = await resolved.backend.ahandle_ping(
+                data, check_pending=resolved.has_pending_messages
+            )
         except Exception:
             logger.exception(
                 "OwnTracks backend failed to handle ping",
@@ -103,6 +99,10 @@ class OwnTracksPingView(View):
                 {"error": "Could not process ping"}, status=500
             )
 
+        if resolved.has_pending_messages:
+            # Pending messages have now been sent
+            beacon_cache.invalidate(beacon_id=beacon.pk)
+
         logger.debug(
             "OwnTracks ping processed",
             extra={
@@ -168,35 +168,87 @@ class OwnTracksConfigurationFileView(DetailView):
         return http.JsonResponse(self.get_object().backend.get_config())
 
 
-@method_decorator(csrf_exempt, name="dispatch")
-class BeaconUpdateView(UpdateView):
-    model = models.Beacon
+class BeaconApiView(View):
+    """
+    Base for the BMCC API ingest views. These are async, so they run
+    outside of `ATOMIC_REQUESTS`.
+    """
+
     queryset = models.Beacon.objects.active().filter(
         backend_class_path=constants.BeaconBackendClass.BMCC_API
     )
-    fields = []
 
-    def post(self, request: HttpRequest, *args, **kwargs) -> JsonResponse:
-        self.object = self.get_object()
+    async def get_object(self):
+        beacon = (
+            await self.queryset.select_related("asset")
+            .filter(pk=self.kwargs["pk"])
+            .afirst()
+        )
+        if beacon is None:
+            raise http.Http404("No active API beacon found")
+        return beacon
+
+    def parse_payload(self, request):
+        return json.loads(request.body.decode("utf-8"))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class BeaconUpdateView(BeaconApiView):
+    async def post(self, request: HttpRequest, *args, **kwargs):
+        self.object = await self.get_object()
 
         try:
-            payload = json.loads(request.body.decode("utf-8"))
-        except json.JSONDecodeError:
+            payload = self.parse_payload(request)
+        except (json.JSONDecodeError, UnicodeDecodeError):
             return JsonResponse({"error": "Invalid JSON payload"}, status=400)
 
-        position = Coordinate(
-            float(payload["longitude"]), float(payload["latitude"])
-        )
-        altitude = payload.get("altitude")
-        altitude = float(altitude) if altitude else None
-
-        ping = self.object.pings.create(
-            asset=self.object.asset,
-            mission=self.object.asset.mission,
-            position=position,
-            altitude=altitude,
-            reported_at=timezone.now(),
-            metadata=payload,
-        )
+        try:
+            ping = await self.object.backend.ahandle_ping(payload)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
         return JsonResponse({"status": "ok", "ping": ping.pk}, status=201)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(transaction.non_atomic_requests, name="dispatch")
+class BeaconBatchUpdateView(BeaconApiView):
+    """
+    Accepts an array of timestamped fixes, e.g. replayed by a tracker after
+    being out of coverage, and stores them with a single bulk insert.
+    """
+
+    max_batch_size = 1000
+
+    async def post(self, request: HttpRequest, *args, **kwargs):
+        self.object = await self.get_object()
+
+        try:
+            payload = self.parse_payload(request)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({"error": "Invalid JSON payload"}, status=400)
+
+        if isinstance(payload, dict):
+            payload = payload.get("pings")
+        if not isinstance(payload, list):
+            return JsonResponse(
+                {"error": "Expected a list of pings"}, status=400
+            )
+        if len(payload) > self.max_batch_size:
+            return JsonResponse(
+                {
+                    "error": (
+                        f"Too many pings in batch (max {self.max_batch_size})"
+                    )
+                },
+                status=400,
+            )
+
+        results = await self.object.backend.ahandle_batch(payload)
+        created = sum(1 for r in results if r["status"] == "created")
+
+        return JsonResponse(
+            {"status": "ok", "created": created, "results": results},
+            status=201 if created else 200,
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.core.cache import cache as default_cache
+
+
+def single_flight(
+    key,
+    render,
+    *,
+    timeout,
+    wait=5,
+    lock_timeout=30,
+    poll_interval=0.05,
+    cache=None,
+):
+    """
+    Return the value cached under ``key``, or cache the result of
+    ``render()``.
+
+    Only one caller (in any process sharing the cache) renders a missing
+    value: the others poll the cache for up to ``wait`` seconds and reuse its
+    result, then render it themselves if it still is not there. With
+    ``wait=0``, callers render right away instead of waiting, e.g. where
+    sleeping would tie up a thread shared by async requests. Keys should
+    include a version of the rendered data, so that a value is never reused
+    after the data changed. ``render`` must not return ``None``.
+    """
+    cache = cache or default_cache
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + wait
+    while True:
+        if cache.add(lock_key, 1, timeout=lock_timeout):
+            try:
+                # Rendered by the previous holder since our last check
+                value = cache.get(key)
+                if value is None:
+                    value = render()
+                    cache.set(key, value, timeout=timeout)
+                return value
+            finally:
+                cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            return render()
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        if value is not None:
+            return value
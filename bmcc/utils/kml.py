@@ -1,13 +1,60 @@
+import itertools
+import zipfile
+
+import attrs
+from asgiref.sync import sync_to_async
 from lxml import etree
 from lxml.builder import ElementMaker
 
 
 KML_NS = "http://www.opengis.net/kml/2.2"
 
+KMZ_CONTENT_TYPE = "application/vnd.google-earth.kmz"
+
+# Tracks longer than this many points are split into segments of this size,
+# only drawn in full detail once zoomed in, below an overview of at most
+# TRACK_OVERVIEW_SIZE points.
+TRACK_SEGMENT_SIZE = 500
+TRACK_OVERVIEW_SIZE = 200
+# On-screen size (in pixels) from which a segment region is drawn
+SEGMENT_MIN_LOD_PIXELS = 256
+# Chunks produced at once in a worker thread when streaming asynchronously
+ASYNC_BATCH_SIZE = 32
+
 
 E = ElementMaker(namespace=KML_NS, nsmap={None: KML_NS})
 
 
+@attrs.frozen
+class TrackPoint:
+    """
+    Point of a track, with its KML coordinates formatted once so that cached
+    tracks can be extended without formatting their points again.
+    """
+
+    reported_at: object
+    longitude: float
+    latitude: float
+    altitude: object
+    coordinates: str
+
+    @classmethod
+    def from_ping(cls, ping):
+        return cls(
+            reported_at=ping.reported_at,
+            longitude=ping.position.longitude,
+            latitude=ping.position.latitude,
+            altitude=ping.altitude,
+            coordinates=ping.position.kml(ping.altitude),
+        )
+
+    @property
+    def ground_coordinates(self):
+        from bmcc.fields import Coordinate
+
+        return Coordinate(self.longitude, self.latitude).kml()
+
+
 class KML:
     def __init__(self):
         self.root = E.kml()
@@ -31,3 +78,152 @@ class KML:
             xml_declaration=True,
             encoding="utf-8",
         ).decode("utf-8")
+
+
+class ChunkBuffer:
+    """
+    Write target collecting the output of `etree.xmlfile` until drained.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def write_features(xf, buffer, features):
+    """
+    Write features to an `etree.xmlfile` writing into ``buffer``, yielding
+    the output after each of them.
+
+    Features are elements, already serialized elements (bytes, written as
+    is), ``(name, features)`` pairs written as a folder, or ``(element,
+    features)`` pairs written as the element with the features appended to
+    its children.
+    """
+    for feature in features:
+        if isinstance(feature, bytes):
+            xf.flush()
+            buffer.write(feature)
+        elif isinstance(feature, tuple):
+            head, children = feature
+            if isinstance(head, str):
+                head = E.Folder(E.name(head))
+            with xf.element(head.tag, head.attrib):
+                for child in head:
+                    xf.write(child)
+                yield from write_features(xf, buffer, children)
+        else:
+            xf.write(feature)
+        xf.flush()
+        yield buffer.drain()
+
+
+def stream_document(name, folders):
+    """
+    Serialize a KML document incrementally, yielding bytes as soon as each
+    element is written.
+
+    ``folders`` is an iterable of ``(name, features)`` pairs (see
+    `write_features`), where ``features`` may be a generator, so that each
+    element is only built right before being written and can be freed right
+    after.
+    """
+    buffer = ChunkBuffer()
+    with etree.xmlfile(buffer, encoding="utf-8") as xf:
+        xf.write_declaration()
+        with xf.element(f"{{{KML_NS}}}kml", nsmap={None: KML_NS}):
+            with xf.element(f"{{{KML_NS}}}Document"):
+                xf.write(E.name(name))
+                xf.flush()
+                yield buffer.drain()
+                yield from write_features(xf, buffer, folders)
+    yield buffer.drain()
+
+
+def stream_kmz(chunks, name="doc.kml"):
+    """
+    Compress a KML document given as chunks of bytes into a KMZ archive,
+    yielding the archive as it is written.
+    """
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as kmz:
+        with kmz.open(name, "w") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield buffer.drain()
+    yield buffer.drain()
+
+
+async def astream(chunks, batch_size=ASYNC_BATCH_SIZE):
+    """
+    Iterate asynchronously over the chunks of a synchronous iterator, such as
+    `stream_document`, advancing it (and running the queries it makes) in a
+    worker thread, ``batch_size`` chunks at a time.
+    """
+    chunks = iter(chunks)
+    next_batch = sync_to_async(
+        lambda: list(itertools.islice(chunks, batch_size))
+    )
+    try:
+        while batch := await next_batch():
+            for chunk in batch:
+                yield chunk
+    finally:
+        if hasattr(chunks, "close"):
+            await sync_to_async(chunks.close)()
+
+
+def region(points, min_lod_pixels=SEGMENT_MIN_LOD_PIXELS):
+    """
+    Region bounding the given points, active once it covers at least
+    ``min_lod_pixels`` on screen.
+    """
+    longitudes = [p.longitude for p in points]
+    latitudes = [p.latitude for p in points]
+    return E.Region(
+        E.LatLonAltBox(
+            E.north(str(max(latitudes))),
+            E.south(str(min(latitudes))),
+            E.east(str(max(longitudes))),
+            E.west(str(min(longitudes))),
+        ),
+        E.Lod(
+            E.minLodPixels(str(min_lod_pixels)),
+            E.maxLodPixels("-1"),
+        ),
+    )
+
+
+def track_overview(points):
+    """
+    Every n-th of the given track points, and the last one, so that the
+    overview has at most about ``TRACK_OVERVIEW_SIZE`` points.
+    """
+    step = -(-len(points) // TRACK_OVERVIEW_SIZE)
+    overview = list(points[::step])
+    if overview[-1] is not points[-1]:
+        overview.append(points[-1])
+    return overview
+
+
+def split_track(points):
+    """
+    Return an overview of the given track points and its full-detail
+    segments, each starting at the last point of the previous one.
+    """
+    segments = [
+        points[max(start - 1, 0) : start + TRACK_SEGMENT_SIZE]
+        for start in range(0, len(points), TRACK_SEGMENT_SIZE)
+    ]
+    return track_overview(points), segments